@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Search latency benchmark: exact FTS and typo-tolerant trigram queries.
+
+Builds a synthetic library in a temporary database and times
+RecipeStore.search_summaries for queries answered by the exact FTS
+search and for misspelled queries that fall through to the trigram
+index with edit-distance reranking.
+
+Usage:
+    python benchmarks/bench_search.py                     # 20000 recipes
+    python benchmarks/bench_search.py --recipes 50000
+    python benchmarks/bench_search.py --save base.json
+    python benchmarks/bench_search.py --compare base.json [--tolerance 0.25]
+
+With --compare the script exits non-zero if any query's median got
+slower than the baseline by more than the tolerance.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from makebread.models.database import get_connection, init_db  # noqa: E402
+from makebread.models.recipe import Ingredient, Recipe, RecipeStore  # noqa: E402
+
+STYLES = ["Sourdough", "Rye", "Focaccia", "Brioche", "Ciabatta", "Baguette", "Challah",
+          "Rågbröd", "Pumpernickel", "Multigrain", "Cinnamon", "Potato", "Oatmeal",
+          "Honey Wheat", "Limpa", "Vörtbröd", "Panettone", "Naan", "Bagel", "Pretzel"]
+ADJECTIVES = ["Rustic", "Soft", "Crusty", "Seeded", "Quick", "Sweet", "Dark", "Light",
+              "Country", "Holiday", "Everyday", "Garlic", "Cheesy", "Spiced"]
+INGREDIENTS = ["bread flour", "rye flour", "whole wheat flour", "water", "milk", "butter",
+               "olive oil", "salt", "sugar", "honey", "instant yeast", "eggs", "cinnamon",
+               "raisins", "caraway seeds", "sunflower seeds", "rosemary", "garlic",
+               "cardamom", "fennel", "potato flakes", "oats", "cheddar", "sirap"]
+TAGS = ["sourdough", "holiday", "quick", "swedish", "italian", "sweet", "savory", "vegan"]
+
+QUERIES = {
+    "exact: rye": "rye",
+    "exact: sourdough": "sourdough",
+    "exact: rosemary garlic": "rosemary garlic",
+    "exact: rågbröd": "rågbröd",
+    "fuzzy: focacia": "focacia",
+    "fuzzy: sourdogh": "sourdogh",
+    "fuzzy: ragbrood": "ragbrood",
+    "fuzzy: cinamon rasins": "cinamon rasins",
+    "fuzzy: pumpernikel": "pumpernikel",
+}
+
+
+def build_library(path: Path, count: int, seed: int = 1) -> RecipeStore:
+    rng = random.Random(seed)
+    conn = get_connection(path)
+    conn.execute("PRAGMA synchronous=OFF")
+    init_db(conn)
+    store = RecipeStore(conn)
+    for i in range(count):
+        store.save(Recipe(
+            name=f"{rng.choice(ADJECTIVES)} {rng.choice(STYLES)} {i}",
+            tags=rng.sample(TAGS, rng.randint(0, 3)),
+            ingredients=[Ingredient(name, str(rng.randint(1, 500)), "g")
+                         for name in rng.sample(INGREDIENTS, rng.randint(4, 10))],
+        ))
+    return store
+
+
+def run(store: RecipeStore, repeat: int) -> dict:
+    """Median and p95 latency in milliseconds for each query's first page."""
+    results = {}
+    for label, query in QUERIES.items():
+        store.search_summaries(query, 100)  # warm the page cache
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            store.search_summaries(query, 100)
+            times.append((time.perf_counter() - start) * 1000)
+        times.sort()
+        results[label] = {"median": statistics.median(times),
+                          "p95": times[min(len(times) - 1, int(len(times) * 0.95))],
+                          "hits": len(store.search_summaries(query, 100))}
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--save", type=Path, help="write results as a JSON baseline")
+    parser.add_argument("--compare", type=Path, help="compare against a JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before failing (default 0.25 = 25%%)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        store = build_library(Path(tmp) / "bench.db", args.recipes)
+        print(f"built {args.recipes} recipes in {time.perf_counter() - start:.1f} s")
+        results = run(store, args.repeat)
+        store.conn.close()
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else {}
+    regressions = []
+    for label, r in results.items():
+        line = f"{label:<26} {r['median']:8.2f} ms median {r['p95']:8.2f} ms p95  {r['hits']:4} hits"
+        base = baseline.get(label)
+        if base:
+            change = r["median"] / base["median"] - 1
+            line += f"  ({change:+.0%} vs baseline)"
+            if change > args.tolerance:
+                regressions.append(label)
+        print(line)
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for makebread.utils.units and makebread.utils.amounts.
+
+Usage:
+    python benchmarks/bench_units.py                  # print timings
+    python benchmarks/bench_units.py --save base.json # store as baseline
+    python benchmarks/bench_units.py --compare base.json [--tolerance 0.25]
+
+With --compare the script exits non-zero if any benchmark got slower than
+the baseline by more than the tolerance, so it can gate CI.
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from makebread.utils import amounts, units  # noqa: E402
+
+# Amount strings in roughly the proportions seen in real recipes
+AMOUNTS = ["1", "2", "1 1/2", "2/3", "1/2", "3", "1 1/8", "1/4", "½", "1,5",
+           "1-2", "2 to 3", "350", "0.25", "1-1/2", ""]
+INGREDIENTS = [("3", "cups", "bread flour"), ("1 1/8", "cups", "water"),
+               ("2", "tbsp", "butter"), ("1", "tsp", "salt"),
+               ("500", "g", "flour"), ("7", "g", "instant yeast"),
+               ("2", "", "eggs"), ("1", "pinch", "nutmeg")]
+VALUES = [0.5, 1.0, 1.125, 2.3665, 0.3333, 4.7318, 12.0, 0.0]
+
+
+def _cold(fn):
+    def run():
+        amounts.clear_cache()
+        units._format_amount.cache_clear()
+        fn()
+    return run
+
+
+def bench_parse_amount():
+    for a in AMOUNTS:
+        units.parse_amount(a)
+
+
+def bench_parse_range():
+    for a in AMOUNTS:
+        if a:
+            amounts.parse_range(a)
+
+
+def bench_format_amount():
+    for v in VALUES:
+        units.format_amount(v)
+
+
+def bench_convert_unit():
+    for system in units.SYSTEMS:
+        for amount, unit, _name in INGREDIENTS:
+            units.convert_unit(2.0, unit, system)
+
+
+def bench_convert_ingredient():
+    for system in units.SYSTEMS:
+        for amount, unit, _name in INGREDIENTS:
+            units.convert_ingredient(amount, unit, system)
+
+
+def bench_normalize_quantity():
+    for amount, unit, name in INGREDIENTS:
+        units.normalize_quantity(amount, unit, name)
+
+
+def bench_ingredient_grams():
+    for amount, unit, name in INGREDIENTS:
+        units.ingredient_grams(1.5, unit, name)
+
+
+def bench_normalize_ingredient_name():
+    for _amount, _unit, name in INGREDIENTS:
+        units.normalize_ingredient_name(f"  {name.upper()}  ")
+
+
+BENCHMARKS = {
+    "parse_amount": bench_parse_amount,
+    "parse_amount (cold)": _cold(bench_parse_amount),
+    "parse_range": bench_parse_range,
+    "format_amount": bench_format_amount,
+    "format_amount (cold)": _cold(bench_format_amount),
+    "convert_unit": bench_convert_unit,
+    "convert_ingredient": bench_convert_ingredient,
+    "normalize_quantity": bench_normalize_quantity,
+    "ingredient_grams": bench_ingredient_grams,
+    "normalize_ingredient_name": bench_normalize_ingredient_name,
+}
+
+
+def run(number: int, repeat: int) -> dict:
+    """Best time per call in microseconds for each benchmark."""
+    results = {}
+    for name, fn in BENCHMARKS.items():
+        best = min(timeit.repeat(fn, number=number, repeat=repeat))
+        results[name] = best / number * 1e6
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", type=Path, help="write results as a JSON baseline")
+    parser.add_argument("--compare", type=Path, help="compare against a JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before failing (default 0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = run(args.number, args.repeat)
+    baseline = json.loads(args.compare.read_text()) if args.compare else {}
+    regressions = []
+    for name, us in results.items():
+        line = f"{name:<28} {us:9.2f} µs"
+        base = baseline.get(name)
+        if base:
+            change = us / base - 1
+            line += f"  ({change:+.0%} vs baseline)"
+            if change > args.tolerance:
+                regressions.append(name)
+        print(line)
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,23 @@
-"""makeBread application entry point — GTK4/Adwaita version."""
+"""makeBread application entry point — GTK4/Adwaita version.
+
+With a command (``makebread search rye``) or ``--db``, runs the headless
+CLI without importing GTK; otherwise starts the application.
+"""
 
 import sys
-import gi
-gi.require_version("Gtk", "4.0")
-gi.require_version("Adw", "1")
-from gi.repository import Adw, Gio
 
-from makebread.ui.application import MakeBreadApplication
-from makebread.accessibility import AccessibilityManager
+from makebread import cli
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in (*cli.COMMANDS, "--db", "--version", "-h", "--help"):
+        sys.exit(cli.main(sys.argv[1:]))
+
+    import gi
+    gi.require_version("Gtk", "4.0")
+    gi.require_version("Adw", "1")
+    from makebread.ui.application import MakeBreadApplication
+
     app = MakeBreadApplication()
     app.run(sys.argv)
 
@@ -57,26 +64,3 @@ def _setup_fullscreen(window, app):
         ))
         app.add_action(action)
         app.set_accels_for_action('app.toggle-fullscreen', ['F11'])
-
-
-# --- Plugin system ---
-import importlib.util
-import os as _pos
-
-def _load_plugins(app_name):
-    """Load plugins from ~/.config/<app>/plugins/."""
-    plugin_dir = _pos.path.join(_pos.path.expanduser('~'), '.config', app_name, 'plugins')
-    plugins = []
-    if not _pos.path.isdir(plugin_dir):
-        return plugins
-    for fname in sorted(_pos.listdir(plugin_dir)):
-        if fname.endswith('.py') and not fname.startswith('_'):
-            path = _pos.path.join(plugin_dir, fname)
-            try:
-                spec = importlib.util.spec_from_file_location(fname[:-3], path)
-                mod = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(mod)
-                plugins.append(mod)
-            except Exception as e:
-                print(f"Plugin {fname}: {e}")
-    return plugins
@@ -0,0 +1,473 @@
+"""Command-line interface for makeBread.
+
+Runs without GTK: only the models and utils are imported, so commands
+start quickly and work over SSH or in scripts. Results are written to
+stdout as JSON lines, one object per line; errors go to stderr as
+{"error": ...} and make the command exit non-zero.
+
+    makebread import recipes.json
+    makebread export > library.jsonl
+    makebread export --since 120 > delta.jsonl
+    makebread changes --since 120
+    makebread search "rye" --limit 5
+    makebread stats --ingredient flour
+    makebread pantry "bread flour" yeast salt water butter --missing 1
+    makebread scale 12 --size 1.5lb --units metric
+    makebread shopping 12 15x2 --units us
+    makebread collections add "Quick rye" "name:rye time<90"
+    makebread collections show "Quick rye"
+    makebread vacuum --days 7
+    makebread serve --port 8080
+    makebread sync export --peer <library id> -o changes.jsonl
+    makebread sync connect --socket /run/user/1000/makebread-sync
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+from makebread import __version__
+from makebread.models.database import get_connection, get_connection_path, init_db
+from makebread.models.recipe import RecipeStore
+
+COMMANDS = ("import", "export", "search", "stats", "pantry", "vacuum", "serve", "sync",
+            "changes", "collections", "scale", "shopping")
+
+
+def _emit(obj, stream=None) -> None:
+    (stream or sys.stdout).write(json.dumps(obj, ensure_ascii=False) + "\n")
+
+
+def _error(message: str, **extra) -> None:
+    _emit({"error": message, **extra}, sys.stderr)
+
+
+def _open_store(args) -> RecipeStore:
+    conn = get_connection(Path(args.db) if args.db else None)
+    init_db(conn)
+    return RecipeStore(conn)
+
+
+def cmd_import(store: RecipeStore, args) -> int:
+    from makebread.utils.importer import import_json
+
+    plugins = None
+    if args.plugins:
+        from makebread.plugins import PluginManager
+        plugins = PluginManager()
+        plugins.discover()
+    failed = 0
+    for path in args.files:
+        try:
+            count = import_json(Path(path), store, plugins)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            _error(str(e), file=path)
+            failed += 1
+            continue
+        _emit({"file": path, "imported": count})
+    return 1 if failed else 0
+
+
+def cmd_export(store: RecipeStore, args) -> int:
+    from makebread.utils.importer import export_json, recipe_to_dict
+
+    if args.since is not None:
+        return _export_since(store, args)
+    if args.query:
+        ids = [s.id for s in store.search_summaries(args.query)]
+    else:
+        ids = [s.id for s in store.list_summaries(favorites_only=args.favorites)]
+    if args.output:
+        recipes = [r for r in map(store.get, ids) if r is not None]
+        export_json(recipes, Path(args.output))
+        _emit({"file": args.output, "exported": len(recipes)})
+        return 0
+    # One recipe at a time, so large libraries stream with flat memory use
+    for recipe_id in ids:
+        recipe = store.get(recipe_id)
+        if recipe is not None:
+            _emit({"id": recipe.id, **recipe_to_dict(recipe)})
+    return 0
+
+
+def _export_since(store: RecipeStore, args) -> int:
+    """Only recipes changed after a change sequence number, then the new one."""
+    from makebread.models.changes import ChangeLog
+    from makebread.utils.importer import export_json, recipe_to_dict
+
+    log = ChangeLog(store.conn)
+    seq = log.latest_seq()
+    changed = log.changed_recipes(args.since)
+    if args.output:
+        recipes = [r for r in (store.get(rid) for rid, state in changed.items()
+                               if state == "live") if r is not None]
+        export_json(recipes, Path(args.output))
+        _emit({"file": args.output, "exported": len(recipes),
+               "removed": [rid for rid, state in changed.items() if state != "live"],
+               "seq": seq})
+        return 0
+    for recipe_id, state in changed.items():
+        recipe = store.get(recipe_id) if state == "live" else None
+        if recipe is not None:
+            _emit({"id": recipe.id, **recipe_to_dict(recipe)})
+        else:
+            _emit({"id": recipe_id, "removed": state})
+    _emit({"seq": seq})
+    return 0
+
+
+def cmd_changes(store: RecipeStore, args) -> int:
+    from dataclasses import asdict
+    from makebread.models.changes import ChangeLog
+
+    for change in ChangeLog(store.conn).since(args.since, args.limit):
+        _emit(asdict(change))
+    return 0
+
+
+def cmd_search(store: RecipeStore, args) -> int:
+    for summary in store.search_summaries(args.query, limit=args.limit):
+        _emit({"id": summary.id, "name": summary.name,
+               "favorite": summary.favorite, "rating": summary.rating})
+    return 0
+
+
+def cmd_stats(store: RecipeStore, args) -> int:
+    if args.ingredient:
+        _emit({"ingredient": args.ingredient, **store.ingredient_stats(args.ingredient)})
+        return 0
+    row = store.conn.execute("""
+        SELECT COUNT(*) FILTER (WHERE deleted_at IS NULL) AS recipes,
+               COUNT(*) FILTER (WHERE deleted_at IS NULL AND favorite=1) AS favorites,
+               COUNT(*) FILTER (WHERE deleted_at IS NOT NULL) AS deleted,
+               SUM(times_made) FILTER (WHERE deleted_at IS NULL) AS times_made
+        FROM recipes
+    """).fetchone()
+    stats = dict(zip(row.keys(), row))
+    stats["times_made"] = stats["times_made"] or 0
+    stats["ingredients"] = store.conn.execute("""
+        SELECT COUNT(*) FROM ingredients
+        WHERE recipe_id IN (SELECT id FROM recipes WHERE deleted_at IS NULL)
+    """).fetchone()[0]
+    stats["categories"] = dict(store.conn.execute("""
+        SELECT category, COUNT(*) FROM recipes WHERE deleted_at IS NULL
+        GROUP BY category ORDER BY category
+    """).fetchall())
+    _emit(stats)
+    return 0
+
+
+def cmd_pantry(store: RecipeStore, args) -> int:
+    from makebread.utils.pantry import PantryIndex
+
+    index = PantryIndex.load_or_build(store)
+    for match in index.match(args.items, args.missing, args.limit):
+        _emit({"id": match.recipe_id, "name": match.name, "have": match.have,
+               "missing": list(match.missing)})
+    return 0
+
+
+def cmd_scale(store: RecipeStore, args) -> int:
+    from dataclasses import asdict
+    from makebread.utils.scaling import scale_recipe
+
+    recipe = store.get(args.id)
+    if recipe is None:
+        _error("no such recipe", id=args.id)
+        return 1
+    try:
+        scaled = scale_recipe(recipe, args.size, args.flour, args.units)
+    except ValueError as e:
+        _error(str(e), id=recipe.id)
+        return 1
+    _emit({"id": recipe.id, "name": recipe.name, **asdict(scaled)})
+    return 0
+
+
+def _recipe_multiplier(value: str) -> tuple[int, float]:
+    """'12' or '12x2': a recipe id and how many times to make it."""
+    recipe_id, _, times = value.lower().partition("x")
+    try:
+        return int(recipe_id), float(times) if times else 1.0
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected ID or IDxTIMES, not '{value}'")
+
+
+def cmd_shopping(store: RecipeStore, args) -> int:
+    from dataclasses import asdict
+    from makebread.utils.shopping import build_shopping_list
+
+    multipliers: dict[int, float] = {}
+    for recipe_id, times in args.recipes:
+        if store.get_summary(recipe_id) is None:
+            _error("no such recipe", id=recipe_id)
+            return 1
+        multipliers[recipe_id] = multipliers.get(recipe_id, 0.0) + times
+    for item in build_shopping_list(store, multipliers, args.units):
+        _emit(asdict(item))
+    return 0
+
+
+def cmd_collections(store: RecipeStore, args) -> int:
+    from makebread.models.collection import CollectionError, CollectionStore
+
+    collections = CollectionStore(store.conn)
+    if args.action == "list":
+        for c in collections.all():
+            _emit({"id": c.id, "name": c.name, "expression": c.expression, "count": c.count})
+        return 0
+    if args.action == "add":
+        existing = collections.find(args.name)
+        try:
+            saved = collections.save(args.name, args.expression,
+                                     existing.id if existing else None)
+        except CollectionError as e:
+            _error(str(e))
+            return 1
+        _emit({"id": saved.id, "name": saved.name, "expression": saved.expression,
+               "count": store.count(collection_id=saved.id)})
+        return 0
+    collection = collections.find(args.name)
+    if collection is None:
+        _error("no such collection", name=args.name)
+        return 1
+    if args.action == "remove":
+        collections.delete(collection.id)
+        _emit({"removed": collection.name})
+    else:
+        for summary in store.list_summaries(collection_id=collection.id, limit=args.limit):
+            _emit({"id": summary.id, "name": summary.name,
+                   "favorite": summary.favorite, "rating": summary.rating})
+    return 0
+
+
+def cmd_vacuum(store: RecipeStore, args) -> int:
+    from makebread.models.changes import ChangeLog
+
+    conn = store.conn
+    path = get_connection_path(conn)
+    size_before = path.stat().st_size if path else 0
+    purged = store.purge_deleted(older_than_days=args.days)
+    compacted = ChangeLog(conn).compact(older_than_days=args.days)
+    conn.execute("INSERT INTO recipes_fts(recipes_fts) VALUES('optimize')")
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA optimize")
+    size_after = path.stat().st_size if path else 0
+    _emit({"purged": purged, "changes_compacted": compacted, "bytes_before": size_before, "bytes_after": size_after})
+    return 0
+
+
+def cmd_serve(store: RecipeStore, args) -> int:
+    from makebread.server import serve
+
+    path = get_connection_path(store.conn)
+    if path is None:
+        _error("serve needs a database file")
+        return 1
+    # The server opens its own read-only connections
+    store.conn.close()
+
+    def on_ready(server):
+        _emit({"listening": f"http://{server.host}:{server.port}/"})
+        sys.stdout.flush()
+
+    serve(path, args.host, args.port, args.connections, on_ready)
+    return 0
+
+
+def cmd_sync(store: RecipeStore, args) -> int:
+    import socket
+    from dataclasses import asdict
+    from makebread.models.sync import SyncEngine, SyncError, current_seq, library_id
+
+    engine = SyncEngine(store)
+    try:
+        if args.action == "status":
+            peers = store.conn.execute(
+                "SELECT peer_id, received_seq, sent_seq, synced_at FROM sync_peers ORDER BY peer_id"
+            ).fetchall()
+            _emit({"library": library_id(store.conn), "seq": current_seq(store.conn),
+                   "peers": [dict(zip(p.keys(), p)) for p in peers]})
+        elif args.action == "export":
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as f:
+                    stats = engine.write_batch(f, args.peer, args.since)
+                _emit({"file": args.output, "sent": stats.sent})
+            else:
+                engine.write_batch(sys.stdout, args.peer, args.since)
+        elif args.action == "import":
+            for path in args.files:
+                if path == "-":
+                    header, stats = engine.read_batch(sys.stdin)
+                else:
+                    with open(path, "r", encoding="utf-8") as f:
+                        header, stats = engine.read_batch(f)
+                _emit({"file": path, "peer": header["library"], **asdict(stats)})
+        elif args.action == "serve":
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+                if os.path.exists(args.socket):
+                    os.unlink(args.socket)
+                server.bind(args.socket)
+                server.listen()
+                _emit({"listening": args.socket})
+                sys.stdout.flush()
+                try:
+                    while True:
+                        conn, _ = server.accept()
+                        with conn, conn.makefile("rwb") as stream:
+                            try:
+                                _emit(asdict(engine.exchange(stream, initiator=False)))
+                            except (SyncError, ValueError, OSError) as e:
+                                _error(str(e))
+                        sys.stdout.flush()
+                except KeyboardInterrupt:
+                    pass
+                finally:
+                    os.unlink(args.socket)
+        elif args.action == "connect":
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                conn.connect(args.socket)
+                with conn.makefile("rwb") as stream:
+                    _emit(asdict(engine.exchange(stream, initiator=True)))
+    except (SyncError, ValueError, KeyError) as e:
+        _error(f"sync failed: {e}")
+        return 1
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="makebread", description="Manage the makeBread recipe library from the command line.")
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    parser.add_argument("--db", metavar="PATH",
+                        help="recipe database (default: the application's database)")
+    sub = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+
+    p = sub.add_parser("import", help="import recipes from JSON files")
+    p.add_argument("files", nargs="+", metavar="FILE")
+    p.add_argument("--plugins", action="store_true",
+                   help="run the on_import hook of installed plugins")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("export", help="export recipes as JSON lines, or to a JSON file")
+    p.add_argument("-o", "--output", metavar="FILE",
+                   help="write a JSON file like the application's export")
+    p.add_argument("-q", "--query", help="only recipes matching a search")
+    p.add_argument("--favorites", action="store_true", help="only favorite recipes")
+    p.add_argument("--since", type=int, metavar="SEQ",
+                   help="only recipes changed after this change number; removed ones are "
+                        "listed as such, and a last line gives the number to use next time")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("search", help="search recipes")
+    p.add_argument("query")
+    p.add_argument("-n", "--limit", type=int, default=-1, help="maximum number of results")
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("stats", help="library statistics")
+    p.add_argument("-i", "--ingredient", help="quantities of one ingredient across recipes")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("pantry", help="recipes that can be baked with what you have")
+    p.add_argument("items", nargs="+", metavar="INGREDIENT")
+    p.add_argument("-m", "--missing", type=int, default=0,
+                   help="also list recipes missing up to this many ingredients")
+    p.add_argument("-n", "--limit", type=int, default=50, help="maximum number of recipes")
+    p.set_defaults(func=cmd_pantry)
+
+    p = sub.add_parser("scale", help="scale a recipe with baker's percentages")
+    p.add_argument("id", type=int, metavar="ID")
+    size = p.add_mutually_exclusive_group()
+    size.add_argument("-s", "--size", help="target loaf size, e.g. 1.5lb or 900g")
+    size.add_argument("-f", "--flour", type=float, metavar="GRAMS",
+                      help="target flour weight in grams")
+    p.add_argument("-u", "--units", choices=("us", "metric", "imperial"), default="metric",
+                   help="unit system of the amounts (default: metric)")
+    p.set_defaults(func=cmd_scale)
+
+    p = sub.add_parser("shopping", help="one shopping list for several recipes")
+    p.add_argument("recipes", nargs="+", type=_recipe_multiplier, metavar="ID[xTIMES]",
+                   help="recipe, and how many times to make it, e.g. 12x2")
+    p.add_argument("-u", "--units", choices=("us", "metric", "imperial"), default="metric",
+                   help="unit system of the amounts (default: metric)")
+    p.set_defaults(func=cmd_shopping)
+
+    p = sub.add_parser("collections", help="smart collections: saved filters")
+    p.set_defaults(func=cmd_collections)
+    actions = p.add_subparsers(dest="action", required=True, metavar="ACTION")
+    actions.add_parser("list", help="collections and their number of recipes")
+    a = actions.add_parser("add", help="create a collection, or change its filter")
+    a.add_argument("name")
+    a.add_argument("expression", help='filter, e.g. "tag:gluten-free favorite rating>=4"')
+    a = actions.add_parser("show", help="the recipes in a collection")
+    a.add_argument("name")
+    a.add_argument("-n", "--limit", type=int, default=-1, help="maximum number of recipes")
+    a = actions.add_parser("remove", help="delete a collection, keeping its recipes")
+    a.add_argument("name")
+
+    p = sub.add_parser("changes", help="stream the change log")
+    p.add_argument("--since", type=int, default=0, metavar="SEQ",
+                   help="changes after this change number (default: all)")
+    p.add_argument("-n", "--limit", type=int, default=-1, help="maximum number of changes")
+    p.set_defaults(func=cmd_changes)
+
+    p = sub.add_parser("vacuum", help="purge the trash and compact the database")
+    p.add_argument("--days", type=int, default=30,
+                   help="purge recipes deleted, and compact changes logged, more than this "
+                        "many days ago (default: 30)")
+    p.set_defaults(func=cmd_vacuum)
+
+    p = sub.add_parser("serve", help="serve the library read-only over HTTP/JSON")
+    p.add_argument("--host", default="127.0.0.1",
+                   help="address to listen on (default: 127.0.0.1)")
+    p.add_argument("--port", type=int, default=8080, help="port (default: 8080; 0 picks one)")
+    p.add_argument("--connections", type=int, default=4,
+                   help="read connections, i.e. concurrent queries (default: 4)")
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser("sync", help="exchange changes with another library")
+    p.set_defaults(func=cmd_sync)
+    actions = p.add_subparsers(dest="action", required=True, metavar="ACTION")
+    actions.add_parser("status", help="this library's id, sequence and peers")
+    a = actions.add_parser("export", help="write a batch of changes")
+    a.add_argument("-o", "--output", metavar="FILE", help="file to write (default: stdout)")
+    a.add_argument("--peer", metavar="ID",
+                   help="only what this library hasn't been sent yet, and remember it")
+    a.add_argument("--since", type=int, metavar="SEQ",
+                   help="changes after this sequence number (default: 0 or the peer's)")
+    a = actions.add_parser("import", help="apply batches of changes")
+    a.add_argument("files", nargs="+", metavar="FILE", help="batch files, or - for stdin")
+    a = actions.add_parser("serve", help="wait for peers on a unix socket")
+    a.add_argument("--socket", required=True, metavar="PATH")
+    a = actions.add_parser("connect", help="sync both ways with a peer on a unix socket")
+    a.add_argument("--socket", required=True, metavar="PATH")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        store = _open_store(args)
+        try:
+            return args.func(store, args)
+        finally:
+            store.conn.close()
+    except sqlite3.Error as e:
+        _error(f"database error: {e}")
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into head); stop quietly
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 0
+    except OSError as e:
+        _error(str(e))
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Change data capture: what changed in the library, in order.
+
+Triggers append a row to the changes table for every insert, update and
+delete of a recipe, ingredient or instruction, and for every change of
+a recipe's tags. Consumers keep the last sequence number they processed
+and ask for what came after it.
+
+Recipe ops are insert, update, delete (moved to the trash), restore and
+purge (removed for good). Tag changes carry {"added": [...],
+"removed": [...]} as data.
+"""
+
+import json
+import sqlite3
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+
+@dataclass(frozen=True)
+class Change:
+    seq: int
+    table: str
+    op: str
+    recipe_id: int
+    row_id: Optional[int] = None
+    data: Optional[dict] = None
+    changed_at: str = ""
+
+
+class ChangeLog:
+    """Reads and compacts the changes table."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def latest_seq(self) -> int:
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def since(self, seq: int, limit: int = -1) -> Iterator[Change]:
+        """Changes after a sequence number, oldest first, streamed from the cursor."""
+        cur = self.conn.execute("""
+            SELECT seq, table_name, op, recipe_id, row_id, data, changed_at
+            FROM changes WHERE seq > ? ORDER BY seq LIMIT ?
+        """, (seq, limit))
+        for row in cur:
+            yield Change(row[0], row[1], row[2], row[3], row[4],
+                         json.loads(row[5]) if row[5] else None, row[6])
+
+    def changed_recipes(self, seq: int) -> dict[int, str]:
+        """
+        Recipes changed after a sequence number, with their state now:
+        "live", "deleted" (in the trash) or "purged". Ordered by last change.
+        """
+        rows = self.conn.execute("""
+            SELECT c.recipe_id,
+                   CASE WHEN r.id IS NULL THEN 'purged'
+                        WHEN r.deleted_at IS NOT NULL THEN 'deleted'
+                        ELSE 'live' END
+            FROM (SELECT recipe_id, MAX(seq) AS last FROM changes
+                  WHERE seq > ? GROUP BY recipe_id) c
+            LEFT JOIN recipes r ON r.id = c.recipe_id
+            ORDER BY c.last
+        """, (seq,)).fetchall()
+        return dict(rows)
+
+    def compact(self, older_than_days: int = 30) -> int:
+        """
+        Drop all but the latest entry per recipe among entries older than
+        the given days. changed_recipes() answers stay the same for any
+        sequence number; only the per-row detail of old changes goes.
+        Returns the number of entries removed.
+        """
+        cur = self.conn.execute("""
+            DELETE FROM changes
+            WHERE changed_at < datetime('now', ?)
+              AND seq NOT IN (SELECT MAX(seq) FROM changes GROUP BY recipe_id)
+        """, (f"-{older_than_days} days",))
+        self.conn.commit()
+        return cur.rowcount
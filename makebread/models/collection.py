@@ -0,0 +1,302 @@
+"""Smart collections: saved filters with stored membership.
+
+A collection is a filter expression over recipe fields, tags and
+ingredients:
+
+    category:quick time<=90
+    tag:gluten-free favorite
+    (name:rye or ingredient:"rye flour") and rating>=4
+    not tag:sweet
+
+Terms are field:value (contains, or equals for numbers), field=value,
+field!=value and, for numbers, <, <=, > and >=. A bare word matches
+recipe names, and a bare boolean field is true. Terms next to each
+other must all match; "or", "not" and parentheses work as usual.
+
+Each expression compiles to an SQL condition on the recipes table. The
+recipes matching it are kept in collection_members, which RecipeStore
+updates on every save by evaluating only the saved recipe, so opening a
+collection is an indexed lookup. Membership ignores the trash; queries
+leave out deleted recipes, so deleting and restoring need no update.
+"""
+
+import json
+import re
+import sqlite3
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from makebread.utils.text import like_pattern
+
+_TOKEN = re.compile(r'\s*(?:"([^"]*)"|(!=|<=|>=|[:=<>])|([()])|([^\s()"!=<>:]+))')
+_TEXT_FIELDS = {
+    "name": "name", "description": "description", "notes": "notes", "author": "author",
+    "source": "source_name", "category": "category", "loaf": "loaf_size",
+    "crust": "crust_setting", "brand": "machine_brand", "machine": "machine_model",
+    "program": "machine_program",
+}
+_NUMBER_FIELDS = {"time": "total_time_min", "prep": "prep_time_min", "rating": "rating",
+                  "made": "times_made"}
+_ALIASES = {"favourite": "favorite", "favorites": "favorite", "favourites": "favorite",
+            "tags": "tag", "ingredients": "ingredient"}
+_BOOLEANS = {"yes": 1, "true": 1, "1": 1, "no": 0, "false": 0, "0": 0}
+# Stay below SQLite's limit on terms in a compound SELECT
+_UNION_CHUNK = 100
+
+
+class CollectionError(Exception):
+    """A collection that can't be saved: a bad expression or a taken name."""
+
+
+@dataclass(frozen=True)
+class Collection:
+    id: int
+    name: str
+    expression: str
+    count: int = 0
+
+
+def _tokens(expression: str) -> list[tuple[str, str]]:
+    tokens, pos = [], 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        m = _TOKEN.match(expression, pos)
+        if m is None or m.end() == pos:
+            raise CollectionError(f"unexpected '{expression[pos:].strip()[:1]}'")
+        quoted, op, paren, word = m.groups()
+        if quoted is not None:
+            tokens.append(("text", quoted))
+        elif op:
+            tokens.append(("op", op))
+        elif paren:
+            tokens.append((paren, paren))
+        else:
+            tokens.append(("word", word))
+        pos = m.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive descent over the tokens: or, then and, then not, then terms."""
+
+    def __init__(self, expression: str):
+        self.tokens = _tokens(expression)
+        self.pos = 0
+
+    def _peek(self) -> Optional[tuple[str, str]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _keyword(self, word: str) -> bool:
+        token = self._peek()
+        if token and token[0] == "word" and token[1].lower() == word:
+            self.pos += 1
+            return True
+        return False
+
+    def parse(self) -> tuple[str, list]:
+        if not self.tokens:
+            raise CollectionError("empty expression")
+        sql, params = self._or()
+        if self._peek() is not None:
+            raise CollectionError(f"unexpected '{self._peek()[1]}'")
+        return sql, params
+
+    def _or(self) -> tuple[str, list]:
+        parts = [self._and()]
+        while self._keyword("or"):
+            parts.append(self._and())
+        return " OR ".join(f"({sql})" for sql, _ in parts), [p for _, ps in parts for p in ps]
+
+    def _and(self) -> tuple[str, list]:
+        parts = [self._not()]
+        while True:
+            if self._keyword("and"):
+                parts.append(self._not())
+                continue
+            token = self._peek()
+            if token is None or token[0] == ")" or (
+                    token[0] == "word" and token[1].lower() == "or"):
+                break
+            parts.append(self._not())
+        return " AND ".join(f"({sql})" for sql, _ in parts), [p for _, ps in parts for p in ps]
+
+    def _not(self) -> tuple[str, list]:
+        if self._keyword("not"):
+            sql, params = self._not()
+            return f"NOT ({sql})", params
+        return self._atom()
+
+    def _atom(self) -> tuple[str, list]:
+        token = self._peek()
+        if token is None:
+            raise CollectionError("expression ends too early")
+        kind, value = token
+        self.pos += 1
+        if kind == "(":
+            result = self._or()
+            if self._peek() != (")", ")"):
+                raise CollectionError("missing ')'")
+            self.pos += 1
+            return result
+        if kind in (")", "op"):
+            raise CollectionError(f"unexpected '{value}'")
+        following = self._peek()
+        if kind == "word" and following and following[0] == "op":
+            self.pos += 1
+            operand = self._peek()
+            if operand is None or operand[0] not in ("word", "text"):
+                raise CollectionError(f"'{value}{following[1]}' needs a value")
+            self.pos += 1
+            return _term(value.lower(), following[1], operand[1])
+        if kind == "word" and _ALIASES.get(value.lower(), value.lower()) == "favorite":
+            return "favorite=1", []
+        return "name LIKE ? ESCAPE '\\'", [like_pattern(value)]
+
+
+def _term(field: str, op: str, value: str) -> tuple[str, list]:
+    """The SQL condition for one field comparison."""
+    field = _ALIASES.get(field, field)
+    if field in _NUMBER_FIELDS:
+        try:
+            number = int(value)
+        except ValueError:
+            raise CollectionError(f"'{field}' needs a number, not '{value}'")
+        return f"{_NUMBER_FIELDS[field]} {'=' if op == ':' else op} ?", [number]
+    if op not in (":", "=", "!="):
+        raise CollectionError(f"'{field}' can't be compared with '{op}'")
+    negate = "NOT " if op == "!=" else ""
+    if field in _TEXT_FIELDS:
+        column = _TEXT_FIELDS[field]
+        if op == ":":
+            return f"{column} LIKE ? ESCAPE '\\'", [like_pattern(value)]
+        return f"{column} {op} ? COLLATE NOCASE", [value]
+    if field == "favorite":
+        if value.lower() not in _BOOLEANS:
+            raise CollectionError(f"'favorite' needs yes or no, not '{value}'")
+        return f"{negate}favorite=?", [_BOOLEANS[value.lower()]]
+    if field == "tag":
+        return (f"{negate}EXISTS (SELECT 1 FROM json_each(recipes.tags) "
+                f"WHERE value=? COLLATE NOCASE)", [value])
+    if field == "ingredient":
+        match = "name LIKE ? ESCAPE '\\'" if op != "=" else "name=? COLLATE NOCASE"
+        return (f"{negate}EXISTS (SELECT 1 FROM ingredients "
+                f"WHERE recipe_id=recipes.id AND {match})",
+                [like_pattern(value) if op != "=" else value])
+    raise CollectionError(f"unknown field '{field}'")
+
+
+@lru_cache(maxsize=256)
+def compile_filter(expression: str) -> tuple[str, tuple]:
+    """An expression as an SQL condition on the recipes table, and its parameters."""
+    sql, params = _Parser(expression).parse()
+    return sql, tuple(params)
+
+
+class CollectionStore:
+    """Saved collections and their stored membership."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def all(self) -> list[Collection]:
+        """Every collection with its number of recipes, by name."""
+        return [Collection(*row) for row in self.conn.execute("""
+            SELECT c.id, c.name, c.expression,
+                   (SELECT COUNT(*) FROM collection_members m
+                    JOIN recipes r ON r.id = m.recipe_id
+                    WHERE m.collection_id = c.id AND r.deleted_at IS NULL)
+            FROM collections c ORDER BY c.name COLLATE NOCASE
+        """)]
+
+    def get(self, collection_id: int) -> Optional[Collection]:
+        row = self.conn.execute(
+            "SELECT id, name, expression FROM collections WHERE id=?", (collection_id,)
+        ).fetchone()
+        return Collection(*row) if row else None
+
+    def find(self, name: str) -> Optional[Collection]:
+        row = self.conn.execute(
+            "SELECT id, name, expression FROM collections WHERE name=? COLLATE NOCASE", (name,)
+        ).fetchone()
+        return Collection(*row) if row else None
+
+    def save(self, name: str, expression: str,
+             collection_id: Optional[int] = None) -> Collection:
+        """Create a collection, or change an existing one, and fill in its recipes."""
+        name, expression = name.strip(), expression.strip()
+        if not name:
+            raise CollectionError("a collection needs a name")
+        compile_filter(expression)
+        try:
+            if collection_id is None:
+                collection_id = self.conn.execute(
+                    "INSERT INTO collections (name, expression) VALUES (?, ?)",
+                    (name, expression),
+                ).lastrowid
+            else:
+                self.conn.execute("UPDATE collections SET name=?, expression=? WHERE id=?",
+                                  (name, expression, collection_id))
+        except sqlite3.IntegrityError:
+            self.conn.rollback()
+            raise CollectionError(f"there is already a collection named '{name}'")
+        self._fill(collection_id, expression)
+        self.conn.commit()
+        return self.get(collection_id)
+
+    def delete(self, collection_id: int) -> bool:
+        cur = self.conn.execute("DELETE FROM collections WHERE id=?", (collection_id,))
+        self.conn.commit()
+        return cur.rowcount > 0
+
+    def contains(self, collection_id: int, recipe_id: int) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM collection_members WHERE collection_id=? AND recipe_id=?",
+            (collection_id, recipe_id),
+        ).fetchone() is not None
+
+    def refresh(self) -> None:
+        """Recompute every collection from scratch, e.g. after bulk changes."""
+        for collection_id, expression in self.conn.execute(
+                "SELECT id, expression FROM collections").fetchall():
+            self._fill(collection_id, expression)
+        self.conn.commit()
+
+    def _fill(self, collection_id: int, expression: str) -> None:
+        where, params = compile_filter(expression)
+        self.conn.execute("DELETE FROM collection_members WHERE collection_id=?",
+                          (collection_id,))
+        self.conn.execute(f"""
+            INSERT INTO collection_members (collection_id, recipe_id)
+            SELECT ?, id FROM recipes WHERE {where}
+        """, (collection_id, *params))
+
+    def update_recipe(self, recipe_id: int) -> None:
+        """
+        Re-evaluate one recipe against every collection, in one statement
+        per hundred collections. Leaves committing to the caller.
+        """
+        ids, selects, params = [], [], []
+        for collection_id, expression in self.conn.execute(
+                "SELECT id, expression FROM collections ORDER BY id").fetchall():
+            try:
+                where, where_params = compile_filter(expression)
+            except CollectionError:
+                # Saved by a version that understood it; keep its last members
+                continue
+            ids.append(collection_id)
+            selects.append(f"SELECT ?, id FROM recipes WHERE id=? AND ({where})")
+            params.append((collection_id, recipe_id, *where_params))
+        if not selects:
+            return
+        self.conn.execute("""
+            DELETE FROM collection_members
+            WHERE recipe_id=? AND collection_id IN (SELECT value FROM json_each(?))
+        """, (recipe_id, json.dumps(ids)))
+        for start in range(0, len(selects), _UNION_CHUNK):
+            chunk = slice(start, start + _UNION_CHUNK)
+            self.conn.execute(
+                "INSERT INTO collection_members (collection_id, recipe_id) "
+                + " UNION ALL ".join(selects[chunk]),
+                [p for ps in params[chunk] for p in ps],
+            )
@@ -0,0 +1,119 @@
+"""Persistent log of undoable recipe commands."""
+
+import json
+import sqlite3
+from dataclasses import dataclass
+from typing import Optional
+
+from makebread.models.recipe import RecipeStore
+from makebread.utils.importer import recipe_from_dict, recipe_to_dict
+
+# Command kinds. Each names a store operation whose argument is the
+# command's undo or redo payload, so no closures or recipe copies are
+# needed in memory.
+DELETED = "deleted"      # {"deleted": bool}: delete() or restore()
+FAVORITE = "favorite"    # {"favorite": bool}
+RATING = "rating"        # {"rating": int}
+CONTENT = "content"      # {"recipe": recipe_to_dict(...)}: the editable fields
+
+
+@dataclass
+class Command:
+    """A logged command, without its payloads."""
+    id: int
+    kind: str
+    recipe_id: int
+    description: str
+    size: int
+    undone: bool = False
+
+
+def content_payload(recipe) -> dict:
+    return {"recipe": recipe_to_dict(recipe)}
+
+
+def apply_payload(store: RecipeStore, kind: str, recipe_id: int, data: dict) -> bool:
+    """Run the store operation for one side of a command. Returns False if it no longer applies."""
+    if kind == DELETED:
+        if data["deleted"]:
+            return store.delete(recipe_id)
+        return store.restore(recipe_id)
+    if kind in (FAVORITE, RATING) and store.get_summary(recipe_id) is None:
+        # Purged, or in the trash, where it must stay as it was deleted
+        return False
+    if kind == FAVORITE:
+        return store.set_favorite(recipe_id, data["favorite"]) is not None
+    if kind == RATING:
+        return store.set_rating(recipe_id, data["rating"]) is not None
+    if kind == CONTENT:
+        current = store.get(recipe_id)
+        if current is None:
+            return False
+        recipe = recipe_from_dict(data["recipe"])
+        # Only the edited content is reverted, not favorite or rating
+        recipe.id = recipe_id
+        recipe.favorite = current.favorite
+        recipe.rating = current.rating
+        recipe.times_made = current.times_made
+        recipe.image_path = current.image_path
+        store.save(recipe)
+        return True
+    raise ValueError(f"unknown command kind: {kind}")
+
+
+class CommandLog:
+    """The command_log table: appends, amends, payload lookups and trimming."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def append(self, kind: str, recipe_id: int, description: str,
+               undo: dict, redo: dict) -> Command:
+        undo_data = json.dumps(undo, ensure_ascii=False)
+        redo_data = json.dumps(redo, ensure_ascii=False)
+        size = len(undo_data) + len(redo_data)
+        cur = self.conn.execute("""
+            INSERT INTO command_log (kind, recipe_id, description, undo_data, redo_data, size)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (kind, recipe_id, description, undo_data, redo_data, size))
+        self.conn.commit()
+        return Command(cur.lastrowid, kind, recipe_id, description, size)
+
+    def amend(self, command: Command, redo: dict) -> None:
+        """Replace the redo side of a command, when a newer edit is coalesced into it."""
+        redo_data = json.dumps(redo, ensure_ascii=False)
+        self.conn.execute("""
+            UPDATE command_log SET redo_data=?, size=length(undo_data) + ?,
+                created_at=CURRENT_TIMESTAMP
+            WHERE id=?
+        """, (redo_data, len(redo_data), command.id))
+        self.conn.commit()
+        command.size = self.conn.execute(
+            "SELECT size FROM command_log WHERE id=?", (command.id,)
+        ).fetchone()[0]
+
+    def payload(self, command: Command, undo: bool) -> Optional[dict]:
+        row = self.conn.execute(
+            f"SELECT {'undo_data' if undo else 'redo_data'} FROM command_log WHERE id=?",
+            (command.id,),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_undone(self, command: Command, undone: bool) -> None:
+        command.undone = undone
+        self.conn.execute("UPDATE command_log SET undone=? WHERE id=?",
+                          (int(undone), command.id))
+        self.conn.commit()
+
+    def remove(self, commands: list[Command]) -> None:
+        self.conn.executemany("DELETE FROM command_log WHERE id=?",
+                              [(c.id,) for c in commands])
+        self.conn.commit()
+
+    def load(self) -> list[Command]:
+        """All logged commands, oldest first."""
+        rows = self.conn.execute("""
+            SELECT id, kind, recipe_id, description, size, undone
+            FROM command_log ORDER BY id
+        """).fetchall()
+        return [Command(r[0], r[1], r[2], r[3], r[4], bool(r[5])) for r in rows]
@@ -3,9 +3,13 @@
 import sqlite3
 import json
 import os
+import uuid
 from pathlib import Path
 from typing import Optional
 
+from makebread.utils.text import fold_text
+from makebread.utils.units import ingredient_key, normalize_quantity
+
 def get_db_path() -> Path:
     """Get the database file path (XDG-compatible)."""
     data_dir = Path(os.environ.get("XDG_DATA_HOME", Path.home() / ".local" / "share")) / "makebread"
@@ -24,6 +28,14 @@ def get_connection(db_path: Optional[Path] = None) -> sqlite3.Connection:
     return conn
 
 
+def get_connection_path(conn: sqlite3.Connection) -> Optional[Path]:
+    """The database file behind a connection, or None for in-memory databases."""
+    for row in conn.execute("PRAGMA database_list").fetchall():
+        if row[1] == "main":
+            return Path(row[2]) if row[2] else None
+    return None
+
+
 def init_db(conn: sqlite3.Connection) -> None:
     """Initialize the database schema."""
     conn.executescript("""
@@ -95,3 +107,309 @@ def init_db(conn: sqlite3.Connection) -> None:
         END;
     """)
     conn.commit()
+    _migrate(conn)
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """Apply pending schema migrations, tracked in PRAGMA user_version."""
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, step in enumerate(MIGRATIONS, 1):
+        if version <= current:
+            continue
+        # Each step and its version bump commit together, so a failed step
+        # leaves nothing half-applied and is simply retried next launch
+        try:
+            if callable(step):
+                conn.execute("BEGIN")
+                step(conn)
+                conn.execute(f"PRAGMA user_version={version}")
+                conn.commit()
+            else:
+                conn.executescript(f"BEGIN;\n{step}\nPRAGMA user_version={version};\nCOMMIT;")
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+def _backfill_quantities(conn: sqlite3.Connection) -> None:
+    rows = conn.execute("SELECT id, amount, unit, name FROM ingredients").fetchall()
+    conn.executemany(
+        "UPDATE ingredients SET grams=?, ml=?, parse_status=? WHERE id=?",
+        [(*normalize_quantity(amount or "", unit or "", name), rid)
+         for rid, amount, unit, name in rows],
+    )
+
+
+# A random RFC 4122 version 4 UUID, for rows inserted by SQL triggers
+_SQL_UUID4 = """(lower(hex(randomblob(4))) || '-' || lower(hex(randomblob(2))) || '-4' ||
+    substr(lower(hex(randomblob(2))), 2) || '-' ||
+    substr('89ab', 1 + (abs(random()) % 4), 1) || substr(lower(hex(randomblob(2))), 2) || '-' ||
+    lower(hex(randomblob(6))))"""
+
+
+def _add_recipe_uuids(conn: sqlite3.Connection) -> None:
+    conn.execute("ALTER TABLE recipes ADD COLUMN uuid TEXT")
+    ids = [r[0] for r in conn.execute("SELECT id FROM recipes").fetchall()]
+    conn.executemany("UPDATE recipes SET uuid=? WHERE id=?",
+                     [(str(uuid.uuid4()), rid) for rid in ids])
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_recipes_uuid ON recipes(uuid)")
+
+
+def _add_ingredient_keys(conn: sqlite3.Connection) -> None:
+    conn.execute("ALTER TABLE ingredients ADD COLUMN name_key TEXT NOT NULL DEFAULT ''")
+    rows = conn.execute("SELECT id, name FROM ingredients").fetchall()
+    conn.executemany("UPDATE ingredients SET name_key=? WHERE id=?",
+                     [(ingredient_key(name), row_id) for row_id, name in rows])
+    conn.execute("DROP INDEX IF EXISTS idx_ingredients_name_grams")
+    conn.execute("DROP INDEX IF EXISTS idx_ingredients_name_ml")
+    conn.execute("CREATE INDEX idx_ingredients_name_grams ON ingredients(name_key, grams)")
+    conn.execute("CREATE INDEX idx_ingredients_name_ml ON ingredients(name_key, ml)")
+
+
+def trigram_row(recipe_id: int, name: str, tags: list[str],
+                ingredient_names: list[str]) -> tuple:
+    """A recipes_trgm row: folded text, so 'rågbröd' and 'ragbrod' index alike."""
+    return (recipe_id, fold_text(name), fold_text(" ".join(tags)),
+            fold_text(" ".join(ingredient_names)))
+
+
+def _backfill_trigrams(conn: sqlite3.Connection) -> None:
+    names: dict[int, list[str]] = {}
+    for rid, name in conn.execute("SELECT recipe_id, name FROM ingredients ORDER BY sort_order"):
+        names.setdefault(rid, []).append(name)
+    conn.executemany(
+        "INSERT INTO recipes_trgm (rowid, name, tags, ingredients) VALUES (?, ?, ?, ?)",
+        [trigram_row(rid, name, json.loads(tags) if tags else [], names.get(rid, []))
+         for rid, name, tags in conn.execute("SELECT id, name, tags FROM recipes").fetchall()],
+    )
+
+
+# Schema migrations, applied in order on top of the base schema above.
+# Each entry is either an SQL script or a callable taking the connection.
+MIGRATIONS = [
+    # 1: per-row version, bumped on every save
+    """
+    ALTER TABLE recipes ADD COLUMN version INTEGER DEFAULT 1;
+    """,
+    # 2: canonical quantities for SQL-side ingredient analytics
+    """
+    ALTER TABLE ingredients ADD COLUMN grams REAL;
+    ALTER TABLE ingredients ADD COLUMN ml REAL;
+    ALTER TABLE ingredients ADD COLUMN parse_status INTEGER DEFAULT 0;
+    CREATE INDEX IF NOT EXISTS idx_ingredients_recipe ON ingredients(recipe_id, sort_order);
+    CREATE INDEX IF NOT EXISTS idx_ingredients_name_grams ON ingredients(name, grams);
+    CREATE INDEX IF NOT EXISTS idx_ingredients_name_ml ON ingredients(name, ml);
+    """,
+    # 3: backfill the canonical quantities
+    _backfill_quantities,
+    # 4: only reindex FTS when an indexed column changes, so favorite and
+    #    rating updates stay cheap
+    """
+    DROP TRIGGER IF EXISTS recipes_au;
+    CREATE TRIGGER recipes_au AFTER UPDATE OF name, description, tags, notes ON recipes BEGIN
+        INSERT INTO recipes_fts(recipes_fts, rowid, name, description, tags, notes)
+        VALUES ('delete', old.id, old.name, old.description, old.tags, old.notes);
+        INSERT INTO recipes_fts(rowid, name, description, tags, notes)
+        VALUES (new.id, new.name, new.description, new.tags, new.notes);
+    END;
+    """,
+    # 5: unsaved editor drafts, one per recipe (0 for a new recipe)
+    """
+    CREATE TABLE IF NOT EXISTS drafts (
+        recipe_id INTEGER PRIMARY KEY,
+        data TEXT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+    # 6: soft delete, so deleting a recipe can be undone
+    """
+    ALTER TABLE recipes ADD COLUMN deleted_at TIMESTAMP;
+    CREATE INDEX IF NOT EXISTS idx_recipes_deleted ON recipes(deleted_at);
+    """,
+    # 7: persistent undo history; payloads stay on disk until needed
+    """
+    CREATE TABLE IF NOT EXISTS command_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        recipe_id INTEGER NOT NULL,
+        description TEXT DEFAULT '',
+        undo_data TEXT NOT NULL,
+        redo_data TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        undone INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """,
+    # 8: stable ids for sync, backfilled for existing recipes
+    _add_recipe_uuids,
+    # 9: change sequence, tombstones and sync watermarks
+    """
+    CREATE TABLE IF NOT EXISTS sync_meta (
+        key TEXT PRIMARY KEY,
+        value
+    );
+    INSERT OR IGNORE INTO sync_meta (key, value) VALUES ('seq', 0);
+    INSERT OR IGNORE INTO sync_meta (key, value) VALUES ('library_id', %s);
+
+    ALTER TABLE recipes ADD COLUMN change_seq INTEGER DEFAULT 0;
+    UPDATE recipes SET change_seq=id;
+    UPDATE sync_meta SET value=(SELECT COALESCE(MAX(id), 0) FROM recipes) WHERE key='seq';
+    CREATE INDEX IF NOT EXISTS idx_recipes_change_seq ON recipes(change_seq);
+
+    CREATE TABLE IF NOT EXISTS tombstones (
+        uuid TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        change_seq INTEGER NOT NULL,
+        purged_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_tombstones_change_seq ON tombstones(change_seq);
+
+    CREATE TABLE IF NOT EXISTS sync_peers (
+        peer_id TEXT PRIMARY KEY,
+        received_seq INTEGER DEFAULT 0,
+        sent_seq INTEGER DEFAULT 0,
+        synced_at TIMESTAMP
+    );
+
+    -- Every insert, version bump and hard delete takes the next sequence number
+    CREATE TRIGGER recipes_sync_ai AFTER INSERT ON recipes BEGIN
+        UPDATE sync_meta SET value=value+1 WHERE key='seq';
+        UPDATE recipes SET
+            change_seq=(SELECT value FROM sync_meta WHERE key='seq'),
+            uuid=COALESCE(new.uuid, %s)
+        WHERE id=new.id;
+    END;
+    CREATE TRIGGER recipes_sync_au AFTER UPDATE OF version ON recipes BEGIN
+        UPDATE sync_meta SET value=value+1 WHERE key='seq';
+        UPDATE recipes SET change_seq=(SELECT value FROM sync_meta WHERE key='seq')
+        WHERE id=new.id;
+    END;
+    CREATE TRIGGER recipes_sync_ad AFTER DELETE ON recipes BEGIN
+        UPDATE sync_meta SET value=value+1 WHERE key='seq';
+        INSERT OR REPLACE INTO tombstones (uuid, version, change_seq)
+        VALUES (old.uuid, old.version, (SELECT value FROM sync_meta WHERE key='seq'));
+    END;
+    """ % (_SQL_UUID4, _SQL_UUID4),
+    # 10: change data capture; one row per changed recipe, ingredient,
+    #     instruction or tag set, for incremental exports and rebuilds
+    """
+    CREATE TABLE IF NOT EXISTS changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        op TEXT NOT NULL,
+        recipe_id INTEGER NOT NULL,
+        row_id INTEGER,
+        data TEXT,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_changes_recipe ON changes(recipe_id, seq);
+    INSERT INTO changes (table_name, op, recipe_id, row_id)
+        SELECT 'recipes', 'insert', id, id FROM recipes ORDER BY id;
+
+    CREATE TRIGGER changes_recipes_ai AFTER INSERT ON recipes BEGIN
+        INSERT INTO changes (table_name, op, recipe_id, row_id)
+        VALUES ('recipes', 'insert', new.id, new.id);
+    END;
+    CREATE TRIGGER changes_recipes_au AFTER UPDATE ON recipes
+    WHEN old.version IS NOT new.version OR old.deleted_at IS NOT new.deleted_at BEGIN
+        INSERT INTO changes (table_name, op, recipe_id, row_id)
+        VALUES ('recipes', CASE
+            WHEN old.deleted_at IS NULL AND new.deleted_at IS NOT NULL THEN 'delete'
+            WHEN old.deleted_at IS NOT NULL AND new.deleted_at IS NULL THEN 'restore'
+            ELSE 'update' END, new.id, new.id);
+    END;
+    CREATE TRIGGER changes_recipes_ad AFTER DELETE ON recipes BEGIN
+        INSERT INTO changes (table_name, op, recipe_id, row_id)
+        VALUES ('recipes', 'purge', old.id, old.id);
+    END;
+    CREATE TRIGGER changes_tags_au AFTER UPDATE OF tags ON recipes
+    WHEN old.tags IS NOT new.tags BEGIN
+        INSERT INTO changes (table_name, op, recipe_id, data)
+        VALUES ('tags', 'update', new.id, json_object(
+            'added', (SELECT json_group_array(value) FROM json_each(new.tags)
+                      WHERE value NOT IN (SELECT value FROM json_each(old.tags))),
+            'removed', (SELECT json_group_array(value) FROM json_each(old.tags)
+                        WHERE value NOT IN (SELECT value FROM json_each(new.tags)))));
+    END;
+
+    CREATE TRIGGER changes_ingredients_ai AFTER INSERT ON ingredients BEGIN
+        INSERT INTO changes (table_name, op, recipe_id, row_id)
+        VALUES ('ingredients', 'insert', new.recipe_id, new.id);
+    END;
+    CREATE TRIGGER changes_ingredients_au AFTER UPDATE ON ingredients BEGIN
+        INSERT INTO changes (table_name, op, recipe_id, row_id)
+        VALUES ('ingredients', 'update', new.recipe_id, new.id);
+    END;
+    CREATE TRIGGER changes_ingredients_ad AFTER DELETE ON ingredients BEGIN
+        INSERT INTO changes (table_name, op, recipe_id, row_id)
+        VALUES ('ingredients', 'delete', old.recipe_id, old.id);
+    END;
+    CREATE TRIGGER changes_instructions_ai AFTER INSERT ON instructions BEGIN
+        INSERT INTO changes (table_name, op, recipe_id, row_id)
+        VALUES ('instructions', 'insert', new.recipe_id, new.id);
+    END;
+    CREATE TRIGGER changes_instructions_au AFTER UPDATE ON instructions BEGIN
+        INSERT INTO changes (table_name, op, recipe_id, row_id)
+        VALUES ('instructions', 'update', new.recipe_id, new.id);
+    END;
+    CREATE TRIGGER changes_instructions_ad AFTER DELETE ON instructions BEGIN
+        INSERT INTO changes (table_name, op, recipe_id, row_id)
+        VALUES ('instructions', 'delete', old.recipe_id, old.id);
+    END;
+    """,
+    # 11: trigram index over folded names, tags and ingredients for
+    #     typo-tolerant search; rows are written by RecipeStore.save
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipes_trgm USING fts5(
+        name, tags, ingredients, tokenize='trigram'
+    );
+    CREATE TRIGGER recipes_trgm_ad AFTER DELETE ON recipes BEGIN
+        DELETE FROM recipes_trgm WHERE rowid=old.id;
+    END;
+    """,
+    # 12: fill recipes_trgm for recipes saved before it existed
+    _backfill_trigrams,
+    # 13: precomputed similar recipes, and the ingredient profile
+    #     signatures they were computed from
+    """
+    CREATE TABLE IF NOT EXISTS similar_recipes (
+        recipe_id INTEGER NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+        rank INTEGER NOT NULL,
+        similar_id INTEGER NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+        score REAL NOT NULL,
+        PRIMARY KEY (recipe_id, rank)
+    );
+    CREATE INDEX IF NOT EXISTS idx_similar_recipes_similar ON similar_recipes(similar_id);
+    CREATE TABLE IF NOT EXISTS recipe_signatures (
+        recipe_id INTEGER PRIMARY KEY REFERENCES recipes(id) ON DELETE CASCADE,
+        signature TEXT NOT NULL
+    );
+    """,
+    # 14: smart collections and their materialized membership, kept up to
+    #     date by RecipeStore.save
+    """
+    CREATE TABLE IF NOT EXISTS collections (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+        expression TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS collection_members (
+        collection_id INTEGER NOT NULL REFERENCES collections(id) ON DELETE CASCADE,
+        recipe_id INTEGER NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+        PRIMARY KEY (collection_id, recipe_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_collection_members_recipe
+        ON collection_members(recipe_id);
+    """,
+    # 15: ingredient analytics match names anywhere (LIKE '%...%'), which
+    #     these indexes can't serve; they only slowed down saves
+    """
+    DROP INDEX IF EXISTS idx_ingredients_name_grams;
+    DROP INDEX IF EXISTS idx_ingredients_name_ml;
+    """,
+    # 16: normalized ingredient names, and the grams/ml indexes again, over
+    #     them, so analytics for one ingredient are an index range
+    _add_ingredient_keys,
+]
+
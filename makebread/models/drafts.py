@@ -0,0 +1,135 @@
+"""Journal of unsaved editor drafts, written in the background."""
+
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from makebread.models.database import get_connection, get_connection_path
+from makebread.models.recipe import Recipe
+from makebread.utils.importer import recipe_from_dict, recipe_to_dict
+
+# Draft key for a recipe that hasn't been saved yet
+NEW_RECIPE = 0
+
+# Removal marker in the pending map
+_DISCARD = None
+
+
+@dataclass
+class Draft:
+    recipe_id: int
+    recipe: Recipe
+    updated_at: str
+
+
+class DraftJournal:
+    """
+    Keeps editor drafts safe without touching the recipe tables.
+
+    update() only replaces the latest state in memory, so any number of
+    edits coalesce into one write. A worker thread writes pending drafts
+    to the drafts table in a single transaction, at most once every
+    min_interval seconds, so a crash loses at most that much typing.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, min_interval: float = 2.0):
+        self.conn = conn
+        self.min_interval = min_interval
+        self._db_path = get_connection_path(conn)
+        self._pending: dict[int, Optional[str]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def update(self, recipe_id: Optional[int], recipe: Recipe) -> None:
+        """Record the latest editor state of a recipe."""
+        data = json.dumps(recipe_to_dict(recipe), ensure_ascii=False)
+        self._put(recipe_id or NEW_RECIPE, data)
+
+    def discard(self, recipe_id: Optional[int]) -> None:
+        """Forget the draft of a recipe, e.g. once it has been saved."""
+        self._put(recipe_id or NEW_RECIPE, _DISCARD)
+
+    def _put(self, key: int, data: Optional[str]) -> None:
+        with self._lock:
+            self._pending[key] = data
+        if self._db_path is None:
+            # In-memory databases can't be opened from another thread
+            self._write(self.conn)
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name="makebread-drafts",
+                                            daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def drafts(self) -> list[Draft]:
+        """Stored drafts, most recently edited first."""
+        self.flush()
+        rows = self.conn.execute(
+            "SELECT recipe_id, data, updated_at FROM drafts ORDER BY updated_at DESC"
+        ).fetchall()
+        result = []
+        for recipe_id, data, updated_at in rows:
+            try:
+                recipe = recipe_from_dict(json.loads(data))
+            except (ValueError, TypeError, AttributeError):
+                continue
+            result.append(Draft(recipe_id, recipe, updated_at))
+        return result
+
+    def flush(self) -> None:
+        """Write pending drafts now, on the calling thread."""
+        self._write(self.conn)
+
+    def close(self) -> None:
+        """Stop the worker and write whatever is still pending."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _write(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            with conn:
+                for key, data in pending.items():
+                    if data is _DISCARD:
+                        conn.execute("DELETE FROM drafts WHERE recipe_id=?", (key,))
+                    else:
+                        conn.execute(
+                            "INSERT OR REPLACE INTO drafts (recipe_id, data, updated_at) "
+                            "VALUES (?, ?, CURRENT_TIMESTAMP)",
+                            (key, data),
+                        )
+        except sqlite3.Error:
+            # Keep the drafts for the next attempt, unless superseded meanwhile
+            with self._lock:
+                for key, data in pending.items():
+                    self._pending.setdefault(key, data)
+            raise
+
+    def _worker(self) -> None:
+        conn = get_connection(self._db_path)
+        try:
+            while not self._stop.is_set():
+                self._wake.wait()
+                self._wake.clear()
+                if self._stop.is_set():
+                    break
+                try:
+                    self._write(conn)
+                except sqlite3.Error:
+                    pass
+                # Bound the write rate; edits meanwhile coalesce in memory
+                self._stop.wait(self.min_interval)
+        finally:
+            conn.close()
@@ -2,10 +2,38 @@
 
 import json
 import random
+import re
 import sqlite3
 from dataclasses import dataclass, field
 from typing import Optional
 
+from makebread.models.collection import CollectionStore
+from makebread.models.database import trigram_row
+from makebread.utils.text import fold_text, like_pattern, word_distance
+from makebread.utils.units import QTY_ESTIMATED, QTY_OK, ingredient_key, normalize_quantity
+
+
+_WORD = re.compile(r"\w+")
+# Trigram matches reranked by edit distance when nothing matches exactly
+_FUZZY_CANDIDATES = 200
+
+
+def fts_query(text: str) -> Optional[str]:
+    """
+    Turn free user input into a safe FTS5 query: every word becomes a quoted
+    prefix term, so quotes, operators and stray punctuation can't cause
+    syntax errors. Returns None if the input has no words.
+    """
+    words = _WORD.findall(text)
+    if not words:
+        return None
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def max_edits(word: str) -> int:
+    """Typos tolerated in a query word of this length."""
+    return 1 if len(word) <= 4 else 2 if len(word) <= 8 else 3
+
 
 @dataclass
 class Ingredient:
@@ -46,6 +74,22 @@ class Recipe:
     ingredients: list[Ingredient] = field(default_factory=list)
     instructions: list[Instruction] = field(default_factory=list)
     id: Optional[int] = None
+    version: int = 0
+    # The row's change_seq: unlike version, which sync may set to a peer's
+    # value, it changes whenever the row does, so caches key on it
+    revision: int = 0
+
+
+@dataclass(frozen=True)
+class RecipeSummary:
+    """The few columns needed to list a recipe, without its child rows."""
+    id: int
+    name: str
+    favorite: bool = False
+    rating: int = 0
+    version: int = 0
+    image_path: str = ""
+    revision: int = 0
 
 
 class RecipeStore:
@@ -54,8 +98,11 @@ class RecipeStore:
     def __init__(self, conn: sqlite3.Connection):
         self.conn = conn
 
-    def save(self, recipe: Recipe) -> int:
-        """Insert or update a recipe. Returns the recipe id."""
+    def save(self, recipe: Recipe, commit: bool = True) -> int:
+        """
+        Insert or update a recipe. Returns the recipe id. With commit=False
+        the caller commits, e.g. to make more changes in the same transaction.
+        """
         tags_json = json.dumps(recipe.tags)
         if recipe.id is None:
             cur = self.conn.execute("""
@@ -77,7 +124,7 @@ class RecipeStore:
                     prep_time_min=?, total_time_min=?, machine_brand=?, machine_model=?,
                     machine_program=?, crust_setting=?, source_url=?, source_name=?,
                     author=?, notes=?, tags=?, rating=?, times_made=?, favorite=?,
-                    image_path=?, updated_at=CURRENT_TIMESTAMP
+                    image_path=?, version=version+1, updated_at=CURRENT_TIMESTAMP
                 WHERE id=?
             """, (recipe.name, recipe.description, recipe.category, recipe.loaf_size,
                   recipe.prep_time_min, recipe.total_time_min, recipe.machine_brand,
@@ -89,12 +136,15 @@ class RecipeStore:
             self.conn.execute("DELETE FROM ingredients WHERE recipe_id=?", (recipe.id,))
             self.conn.execute("DELETE FROM instructions WHERE recipe_id=?", (recipe.id,))
 
-        # Save ingredients
+        # Save ingredients, with canonical quantities for analytics
         for i, ing in enumerate(recipe.ingredients):
+            grams, ml, status = normalize_quantity(ing.amount, ing.unit, ing.name)
             self.conn.execute("""
-                INSERT INTO ingredients (recipe_id, sort_order, amount, unit, name, group_name)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (recipe.id, i, ing.amount, ing.unit, ing.name, ing.group_name))
+                INSERT INTO ingredients (recipe_id, sort_order, amount, unit, name, group_name,
+                    grams, ml, parse_status, name_key)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (recipe.id, i, ing.amount, ing.unit, ing.name, ing.group_name,
+                  grams, ml, status, ingredient_key(ing.name)))
 
         # Save instructions
         for inst in recipe.instructions:
@@ -103,55 +153,336 @@ class RecipeStore:
                 VALUES (?, ?, ?)
             """, (recipe.id, inst.step_number, inst.text))
 
-        self.conn.commit()
+        # Folded text for typo-tolerant search
+        self.conn.execute("DELETE FROM recipes_trgm WHERE rowid=?", (recipe.id,))
+        self.conn.execute(
+            "INSERT INTO recipes_trgm (rowid, name, tags, ingredients) VALUES (?, ?, ?, ?)",
+            trigram_row(recipe.id, recipe.name, recipe.tags,
+                        [i.name for i in recipe.ingredients]),
+        )
+        CollectionStore(self.conn).update_recipe(recipe.id)
+        recipe.version, recipe.revision = self.conn.execute(
+            "SELECT version, change_seq FROM recipes WHERE id=?", (recipe.id,)
+        ).fetchone()
+
+        if commit:
+            self.conn.commit()
         return recipe.id
 
-    def get(self, recipe_id: int) -> Optional[Recipe]:
+    def get(self, recipe_id: int, include_deleted: bool = False) -> Optional[Recipe]:
         """Get a recipe by ID."""
-        row = self.conn.execute("SELECT * FROM recipes WHERE id=?", (recipe_id,)).fetchone()
+        sql = "SELECT * FROM recipes WHERE id=?"
+        if not include_deleted:
+            sql += " AND deleted_at IS NULL"
+        row = self.conn.execute(sql, (recipe_id,)).fetchone()
         if row is None:
             return None
         return self._row_to_recipe(row)
 
+    def get_summary(self, recipe_id: int) -> Optional[RecipeSummary]:
+        """Get the list summary of a recipe by ID."""
+        row = self.conn.execute("""
+            SELECT id, name, favorite, rating, version, image_path, change_seq FROM recipes
+            WHERE id=? AND deleted_at IS NULL
+        """, (recipe_id,)).fetchone()
+        return self._row_to_summary(row) if row is not None else None
+
+    def set_favorite(self, recipe_id: int, favorite: bool) -> Optional[RecipeSummary]:
+        """Mark or unmark a favorite without rewriting the recipe. Returns the new summary."""
+        self.conn.execute("""
+            UPDATE recipes SET favorite=?, version=version+1, updated_at=CURRENT_TIMESTAMP
+            WHERE id=?
+        """, (int(favorite), recipe_id))
+        CollectionStore(self.conn).update_recipe(recipe_id)
+        self.conn.commit()
+        return self.get_summary(recipe_id)
+
+    def set_rating(self, recipe_id: int, rating: int) -> Optional[RecipeSummary]:
+        """Rate a recipe (0-5) without rewriting it. Returns the new summary."""
+        self.conn.execute("""
+            UPDATE recipes SET rating=?, version=version+1, updated_at=CURRENT_TIMESTAMP
+            WHERE id=?
+        """, (max(0, min(5, rating)), recipe_id))
+        CollectionStore(self.conn).update_recipe(recipe_id)
+        self.conn.commit()
+        return self.get_summary(recipe_id)
+
     def get_all(self) -> list[Recipe]:
         """Get all recipes."""
-        rows = self.conn.execute("SELECT * FROM recipes ORDER BY name").fetchall()
+        rows = self.conn.execute(
+            "SELECT * FROM recipes WHERE deleted_at IS NULL ORDER BY name"
+        ).fetchall()
         return [self._row_to_recipe(r) for r in rows]
 
+    @staticmethod
+    def _filter_sql(favorites_only: bool, category: Optional[str], tag: Optional[str],
+                    collection_id: Optional[int] = None) -> tuple[str, list]:
+        where, params = ["deleted_at IS NULL"], []
+        if collection_id is not None:
+            where.append("id IN (SELECT recipe_id FROM collection_members "
+                         "WHERE collection_id=?)")
+            params.append(collection_id)
+        if favorites_only:
+            where.append("favorite=1")
+        if category:
+            where.append("category=?")
+            params.append(category)
+        if tag:
+            where.append("EXISTS (SELECT 1 FROM json_each(recipes.tags) WHERE value=?)")
+            params.append(tag)
+        return " AND ".join(where), params
+
+    def list_summaries(self, favorites_only: bool = False, category: Optional[str] = None,
+                       tag: Optional[str] = None, limit: int = -1, offset: int = 0,
+                       collection_id: Optional[int] = None) -> list[RecipeSummary]:
+        """List recipes cheaply, ordered by name, optionally filtered and paged."""
+        where, params = self._filter_sql(favorites_only, category, tag, collection_id)
+        rows = self.conn.execute(f"""
+            SELECT id, name, favorite, rating, version, image_path, change_seq FROM recipes
+            WHERE {where} ORDER BY name, id LIMIT ? OFFSET ?
+        """, (*params, limit, offset)).fetchall()
+        return [self._row_to_summary(r) for r in rows]
+
+    def count(self, favorites_only: bool = False, category: Optional[str] = None,
+              tag: Optional[str] = None, collection_id: Optional[int] = None) -> int:
+        """Number of recipes list_summaries() would return without a limit."""
+        where, params = self._filter_sql(favorites_only, category, tag, collection_id)
+        return self.conn.execute(
+            f"SELECT COUNT(*) FROM recipes WHERE {where}", params
+        ).fetchone()[0]
+
+    def is_listed(self, recipe_id: int, favorites_only: bool = False,
+                  category: Optional[str] = None, tag: Optional[str] = None,
+                  collection_id: Optional[int] = None) -> bool:
+        """Whether list_summaries() with these filters would include a recipe."""
+        where, params = self._filter_sql(favorites_only, category, tag, collection_id)
+        return self.conn.execute(
+            f"SELECT 1 FROM recipes WHERE id=? AND {where}", (recipe_id, *params)
+        ).fetchone() is not None
+
+    def facets(self) -> dict:
+        """Recipe counts per category, tag and rating, for filtering."""
+        live = "SELECT * FROM recipes WHERE deleted_at IS NULL"
+        return {
+            "categories": dict(self.conn.execute(
+                f"SELECT category, COUNT(*) FROM ({live}) GROUP BY category ORDER BY category"
+            ).fetchall()),
+            "tags": dict(self.conn.execute(f"""
+                SELECT t.value, COUNT(*) FROM ({live}) r, json_each(r.tags) t
+                GROUP BY t.value ORDER BY COUNT(*) DESC, t.value
+            """).fetchall()),
+            "ratings": {str(k): v for k, v in self.conn.execute(
+                f"SELECT rating, COUNT(*) FROM ({live}) GROUP BY rating ORDER BY rating"
+            ).fetchall()},
+            "favorites": self.conn.execute(
+                f"SELECT COUNT(*) FROM ({live}) WHERE favorite=1"
+            ).fetchone()[0],
+        }
+
+    # FTS matches ranked by bm25, then recipes that only match on an ingredient
+    _SEARCH_SQL = """
+        SELECT * FROM (
+            SELECT r.*, fts.rank AS score FROM recipes r
+            JOIN recipes_fts fts ON r.id = fts.rowid
+            WHERE recipes_fts MATCH :fts AND r.deleted_at IS NULL
+            UNION ALL
+            SELECT r.*, 0 AS score FROM recipes r
+            WHERE r.id IN (SELECT recipe_id FROM ingredients WHERE name LIKE :like ESCAPE '\\')
+              AND r.id NOT IN (SELECT rowid FROM recipes_fts WHERE recipes_fts MATCH :fts)
+              AND r.deleted_at IS NULL
+        )
+    """
+
+    # Query plan: the exact search above when it finds anything, else
+    # trigram matches on folded text reranked by edit distance
+    def _exact_params(self, query: str) -> Optional[dict]:
+        """Parameters for _SEARCH_SQL, or None if the exact search finds nothing."""
+        fts = fts_query(query)
+        if fts is None:
+            return None
+        params = {"fts": fts, "like": like_pattern(query.strip())}
+        found = self.conn.execute(f"SELECT EXISTS ({self._SEARCH_SQL})", params).fetchone()[0]
+        return params if found else None
+
+    def fuzzy_ids(self, query: str) -> list[int]:
+        """
+        Recipes matching every word of a query within a few typos, best first:
+        fewest edits, then matches in the name, then by name.
+        """
+        words = _WORD.findall(fold_text(query))
+        grams = {w[i:i + 3] for w in words for i in range(len(w) - 2)}
+        if not grams:
+            return []
+        rows = self.conn.execute("""
+            SELECT t.rowid, t.name, t.tags || ' ' || t.ingredients, r.name
+            FROM recipes_trgm t JOIN recipes r ON r.id = t.rowid
+            WHERE recipes_trgm MATCH ? AND r.deleted_at IS NULL
+            ORDER BY t.rank LIMIT ?
+        """, (" OR ".join(f'"{g}"' for g in sorted(grams)), _FUZZY_CANDIDATES)).fetchall()
+        scored = []
+        for rid, name, other, display in rows:
+            name_words, other_words = name.split(), other.split()
+            total, in_name = 0, True
+            for word in words:
+                limit = max_edits(word)
+                best = min((word_distance(word, w, limit) for w in name_words), default=limit + 1)
+                if best > limit:
+                    in_name = False
+                    best = min((word_distance(word, w, limit) for w in other_words),
+                               default=limit + 1)
+                    if best > limit:
+                        break
+                total += best
+            else:
+                scored.append((total, not in_name, display.lower(), rid))
+        scored.sort()
+        return [s[-1] for s in scored]
+
+    def _rows_by_ids(self, ids: list[int]) -> list[sqlite3.Row]:
+        rows = self.conn.execute(
+            "SELECT * FROM recipes WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(ids),),
+        ).fetchall()
+        by_id = {r["id"]: r for r in rows}
+        return [by_id[i] for i in ids if i in by_id]
+
     def search(self, query: str) -> list[Recipe]:
-        """Full-text search recipes."""
+        """Full-text search recipes (names, description, tags, notes, ingredients)."""
+        params = self._exact_params(query)
+        if params is None:
+            rows = self._rows_by_ids(self.fuzzy_ids(query))
+        else:
+            rows = self.conn.execute(self._SEARCH_SQL + " ORDER BY score, name",
+                                     params).fetchall()
+        return [self._row_to_recipe(r) for r in rows]
+
+    def search_summaries(self, query: str, limit: int = -1, offset: int = 0) -> list[RecipeSummary]:
+        """One page of search results, as lightweight summaries."""
+        params = self._exact_params(query)
+        if params is None:
+            ids = self.fuzzy_ids(query)[offset:]
+            rows = self._rows_by_ids(ids if limit < 0 else ids[:limit])
+        else:
+            rows = self.conn.execute(
+                self._SEARCH_SQL + " ORDER BY score, name LIMIT :limit OFFSET :offset",
+                {**params, "limit": limit, "offset": offset},
+            ).fetchall()
+        return [self._row_to_summary(r) for r in rows]
+
+    def search_count(self, query: str) -> int:
+        """Total number of search results."""
+        params = self._exact_params(query)
+        if params is None:
+            return len(self.fuzzy_ids(query))
+        return self.conn.execute(
+            f"SELECT COUNT(*) FROM ({self._SEARCH_SQL})", params
+        ).fetchone()[0]
+
+    @staticmethod
+    def _key_range(name: str) -> tuple[str, str]:
+        """
+        Bounds of the name_key values matching an ingredient: the name
+        itself and longer names starting with it as a word ('salt' matches
+        'salt' and 'salt flakes', not 'salted butter'). Only characters
+        below '!' can follow a key inside the range, i.e. a space.
+        """
+        key = ingredient_key(name)
+        return key, key + "!"
+
+    def find_by_ingredient_amount(self, name: str, min_grams: Optional[float] = None,
+                                  max_grams: Optional[float] = None) -> list[Recipe]:
+        """Find recipes whose total weight of a matching ingredient is within bounds."""
+        low, high = self._key_range(name)
         rows = self.conn.execute("""
             SELECT r.* FROM recipes r
-            JOIN recipes_fts fts ON r.id = fts.rowid
-            WHERE recipes_fts MATCH ?
-            ORDER BY rank
-        """, (query,)).fetchall()
-        # Also search ingredients
-        ing_rows = self.conn.execute("""
-            SELECT DISTINCT r.* FROM recipes r
-            JOIN ingredients i ON r.id = i.recipe_id
-            WHERE i.name LIKE ?
-        """, (f"%{query}%",)).fetchall()
-        seen = {r["id"] for r in rows}
-        combined = list(rows)
-        for r in ing_rows:
-            if r["id"] not in seen:
-                combined.append(r)
-        return [self._row_to_recipe(r) for r in combined]
+            JOIN (SELECT recipe_id, SUM(grams) AS total FROM ingredients
+                  WHERE name_key >= ? AND name_key < ? AND grams IS NOT NULL
+                  GROUP BY recipe_id) i ON r.id = i.recipe_id
+            WHERE (? IS NULL OR i.total >= ?) AND (? IS NULL OR i.total <= ?)
+              AND r.deleted_at IS NULL
+            ORDER BY r.name
+        """, (low, high, min_grams, min_grams, max_grams, max_grams)).fetchall()
+        return [self._row_to_recipe(r) for r in rows]
+
+    def ingredient_stats(self, name: str) -> dict:
+        """
+        Aggregate canonical quantities of a matching ingredient across
+        recipes. Amounts are totalled per recipe first, so averages are per
+        loaf even when a recipe lists the ingredient twice.
+        """
+        low, high = self._key_range(name)
+        row = self.conn.execute("""
+            SELECT COUNT(*) AS recipes,
+                   AVG(grams) AS avg_grams, MIN(grams) AS min_grams, MAX(grams) AS max_grams,
+                   AVG(ml) AS avg_ml, MIN(ml) AS min_ml, MAX(ml) AS max_ml,
+                   SUM(unconverted) AS unconverted
+            FROM (SELECT recipe_id, SUM(grams) AS grams, SUM(ml) AS ml,
+                         SUM(parse_status NOT IN (?, ?)) AS unconverted
+                  FROM ingredients
+                  WHERE name_key >= ? AND name_key < ?
+                  GROUP BY recipe_id) i
+            JOIN recipes r ON r.id = i.recipe_id AND r.deleted_at IS NULL
+        """, (QTY_OK, QTY_ESTIMATED, low, high)).fetchone()
+        return dict(zip(row.keys(), row))
+
+    def get_ingredient_rows(self, recipe_ids: list[int]) -> list[sqlite3.Row]:
+        """
+        Ingredient rows, with canonical quantities, for many recipes in one
+        query. Recipes in the trash are left out.
+        """
+        return self.conn.execute("""
+            SELECT i.recipe_id, i.sort_order, i.amount, i.unit, i.name, i.group_name,
+                   i.grams, i.ml, i.parse_status
+            FROM ingredients i
+            JOIN recipes r ON r.id = i.recipe_id
+            WHERE i.recipe_id IN (SELECT value FROM json_each(?)) AND r.deleted_at IS NULL
+            ORDER BY i.recipe_id, i.sort_order
+        """, (json.dumps(list(recipe_ids)),)).fetchall()
 
     def random(self) -> Optional[Recipe]:
         """Get a random recipe."""
         row = self.conn.execute(
-            "SELECT * FROM recipes ORDER BY RANDOM() LIMIT 1"
+            "SELECT * FROM recipes WHERE deleted_at IS NULL ORDER BY RANDOM() LIMIT 1"
         ).fetchone()
         if row is None:
             return None
         return self._row_to_recipe(row)
 
-    def delete(self, recipe_id: int) -> None:
-        """Delete a recipe."""
-        self.conn.execute("DELETE FROM recipes WHERE id=?", (recipe_id,))
+    def delete(self, recipe_id: int) -> bool:
+        """
+        Move a recipe to the trash; restore() brings it back.
+        Returns True if it existed and wasn't deleted already.
+        """
+        cur = self.conn.execute("""
+            UPDATE recipes SET deleted_at=CURRENT_TIMESTAMP, version=version+1
+            WHERE id=? AND deleted_at IS NULL
+        """, (recipe_id,))
+        self.conn.commit()
+        return cur.rowcount > 0
+
+    def restore(self, recipe_id: int) -> bool:
+        """Bring back a deleted recipe. Returns True if it was in the trash."""
+        cur = self.conn.execute("""
+            UPDATE recipes SET deleted_at=NULL, version=version+1
+            WHERE id=? AND deleted_at IS NOT NULL
+        """, (recipe_id,))
         self.conn.commit()
+        return cur.rowcount > 0
+
+    def purge_deleted(self, older_than_days: int = 30) -> int:
+        """Permanently remove recipes deleted more than the given days ago."""
+        cur = self.conn.execute("""
+            DELETE FROM recipes
+            WHERE deleted_at IS NOT NULL AND deleted_at < datetime('now', ?)
+        """, (f"-{older_than_days} days",))
+        self.conn.commit()
+        return cur.rowcount
+
+    @staticmethod
+    def _row_to_summary(row: sqlite3.Row) -> RecipeSummary:
+        return RecipeSummary(id=row["id"], name=row["name"], favorite=bool(row["favorite"]),
+                             rating=row["rating"], version=row["version"],
+                             image_path=row["image_path"] or "", revision=row["change_seq"])
 
     def _row_to_recipe(self, row: sqlite3.Row) -> Recipe:
         """Convert a database row to a Recipe object."""
@@ -176,6 +507,8 @@ class RecipeStore:
             times_made=row["times_made"],
             favorite=bool(row["favorite"]),
             image_path=row["image_path"] if "image_path" in row.keys() else "",
+            version=row["version"] if "version" in row.keys() else 0,
+            revision=row["change_seq"] if "change_seq" in row.keys() else 0,
         )
         # Load ingredients
         ing_rows = self.conn.execute(
@@ -0,0 +1,285 @@
+"""Incremental sync between makeBread libraries.
+
+Recipes are matched by their uuid. Every insert, version bump and purge
+takes the next number of a library-wide change sequence (kept up to date
+by triggers), so the changes a peer hasn't seen are simply the rows
+above the sequence number it last received. Purged recipes leave a
+tombstone with the same sequence.
+
+A batch is JSON lines: a header, one record per changed recipe and an
+end line. A batch without its end line is applied but doesn't move the
+watermark, so an interrupted sync is resent next time.
+
+    {"sync": 1, "library": "<uuid>", "since": 12, "seq": 40}
+    {"uuid": "...", "version": 3, "updated_at": "...", "deleted_at": null,
+     "hash": "...", "recipe": {...}}
+    {"uuid": "...", "version": 5, "purged": true}
+    {"end": 2}
+
+Conflicts resolve the same way on both sides: the record with the higher
+version wins, then the later updated_at, then the larger content hash.
+"""
+
+import hashlib
+import json
+import sqlite3
+from dataclasses import dataclass
+from typing import IO, Iterable, Iterator, Optional
+
+from makebread.models.recipe import RecipeStore
+from makebread.utils.importer import recipe_from_dict, recipe_to_dict
+
+FORMAT = 1
+
+
+class SyncError(Exception):
+    """A batch that can't be applied, e.g. from an unknown format."""
+
+
+@dataclass
+class SyncStats:
+    received: int = 0
+    applied: int = 0
+    kept: int = 0
+    purged: int = 0
+    sent: int = 0
+
+
+def library_id(conn: sqlite3.Connection) -> str:
+    return conn.execute("SELECT value FROM sync_meta WHERE key='library_id'").fetchone()[0]
+
+
+def current_seq(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT value FROM sync_meta WHERE key='seq'").fetchone()[0]
+
+
+def content_hash(recipe: dict, deleted: bool) -> str:
+    """Hash of everything a record syncs, for the last conflict tie-break."""
+    data = json.dumps([recipe, deleted], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode()).hexdigest()[:32]
+
+
+class SyncEngine:
+    """Writes and applies change batches for one library."""
+
+    def __init__(self, store: RecipeStore):
+        self.store = store
+        self.conn = store.conn
+
+    # --- watermarks ---
+
+    def peer(self, peer_id: str) -> tuple[int, int]:
+        """(received_seq, sent_seq) for a peer; zeros for one never synced with."""
+        row = self.conn.execute(
+            "SELECT received_seq, sent_seq FROM sync_peers WHERE peer_id=?", (peer_id,)
+        ).fetchone()
+        return (row[0], row[1]) if row else (0, 0)
+
+    def _mark(self, peer_id: str, received: Optional[int] = None,
+              sent: Optional[int] = None) -> None:
+        self.conn.execute("""
+            INSERT INTO sync_peers (peer_id, received_seq, sent_seq, synced_at)
+            VALUES (?, COALESCE(?, 0), COALESCE(?, 0), CURRENT_TIMESTAMP)
+            ON CONFLICT(peer_id) DO UPDATE SET
+                received_seq=COALESCE(?, received_seq),
+                sent_seq=COALESCE(?, sent_seq),
+                synced_at=CURRENT_TIMESTAMP
+        """, (peer_id, received, sent, received, sent))
+        self.conn.commit()
+
+    # --- outgoing ---
+
+    def _record(self, row: sqlite3.Row) -> dict:
+        recipe = self.store._row_to_recipe(row)
+        data = recipe_to_dict(recipe)
+        # Image paths are local to each machine and aren't synced
+        data.update(favorite=recipe.favorite, rating=recipe.rating,
+                    times_made=recipe.times_made)
+        deleted = row["deleted_at"] is not None
+        return {"uuid": row["uuid"], "version": row["version"],
+                "updated_at": row["updated_at"], "deleted_at": row["deleted_at"],
+                "hash": content_hash(data, deleted), "recipe": data}
+
+    def changes(self, since: int, until: int) -> Iterator[dict]:
+        """Records for the changes numbered since < seq <= until, in sequence order."""
+        for row in self.conn.execute("""
+            SELECT * FROM recipes WHERE change_seq > ? AND change_seq <= ?
+            ORDER BY change_seq
+        """, (since, until)).fetchall():
+            yield self._record(row)
+        for uuid, version in self.conn.execute("""
+            SELECT uuid, version FROM tombstones WHERE change_seq > ? AND change_seq <= ?
+            ORDER BY change_seq
+        """, (since, until)).fetchall():
+            yield {"uuid": uuid, "version": version, "purged": True}
+
+    def batch(self, since: int, **header) -> Iterator[dict]:
+        """A whole batch, header and end line included, of the changes after since."""
+        seq = current_seq(self.conn)
+        yield {"sync": FORMAT, "library": library_id(self.conn), "since": since,
+               "seq": seq, **header}
+        count = 0
+        for record in self.changes(since, seq):
+            count += 1
+            yield record
+        yield {"end": count}
+
+    def write_batch(self, out: IO[str], peer_id: Optional[str] = None,
+                    since: Optional[int] = None) -> SyncStats:
+        """
+        Write the changes a peer hasn't been sent yet, or those after since.
+        With a peer, its sent watermark moves to the end of the batch.
+        """
+        if since is None:
+            since = self.peer(peer_id)[1] if peer_id else 0
+        stats = SyncStats()
+        seq = since
+        for message in self.batch(since):
+            out.write(json.dumps(message, ensure_ascii=False) + "\n")
+            if "seq" in message:
+                seq = message["seq"]
+            elif "end" in message:
+                stats.sent = message["end"]
+        out.flush()
+        if peer_id:
+            self._mark(peer_id, sent=seq)
+        return stats
+
+    # --- incoming ---
+
+    def read_batch(self, lines: Iterable[str]) -> tuple[dict, SyncStats]:
+        """Apply a batch; returns its header and what happened."""
+        it = iter(lines)
+        header = self._read_header(it)
+        stats, _ = self._apply_records(header, it)
+        return header, stats
+
+    def _read_header(self, it: Iterator[str]) -> dict:
+        try:
+            header = json.loads(next(it))
+        except StopIteration:
+            raise SyncError("empty batch")
+        if header.get("sync") != FORMAT:
+            raise SyncError(f"unsupported sync format: {header.get('sync')!r}")
+        if header.get("library", header.get("hello")) == library_id(self.conn):
+            raise SyncError("batch comes from this library")
+        return header
+
+    def _apply_records(self, header: dict, it: Iterator[str]) -> tuple[SyncStats, bool]:
+        """Apply records up to the end line; False if the batch stopped short."""
+        stats = SyncStats()
+        for line in it:
+            message = json.loads(line)
+            if "end" in message:
+                self._mark(header["library"], received=header["seq"])
+                return stats, True
+            self.apply(message, stats)
+        return stats, False
+
+    def apply(self, record: dict, stats: SyncStats) -> None:
+        """Apply one record unless the local row wins the conflict rules."""
+        stats.received += 1
+        local = self.conn.execute(
+            "SELECT * FROM recipes WHERE uuid=?", (record["uuid"],)
+        ).fetchone()
+        tomb = self.conn.execute(
+            "SELECT version FROM tombstones WHERE uuid=?", (record["uuid"],)
+        ).fetchone()
+        if record.get("purged"):
+            self._apply_purge(record, local, tomb, stats)
+            return
+        if tomb is not None and tomb[0] >= record["version"]:
+            stats.kept += 1
+            return
+        if local is not None and not self._wins(record, local):
+            stats.kept += 1
+            return
+
+        data = record["recipe"]
+        recipe = recipe_from_dict(data)
+        recipe.favorite = bool(data.get("favorite", False))
+        recipe.rating = int(data.get("rating", 0))
+        recipe.times_made = int(data.get("times_made", 0))
+        if local is not None:
+            recipe.id = local["id"]
+            recipe.image_path = local["image_path"] or ""
+        # One transaction: a new row must never be committed with its own
+        # uuid, or a resent record would be inserted a second time
+        try:
+            self.store.save(recipe, commit=False)
+            # Take over the remote row's identity and version instead of bumping ours
+            self.conn.execute("""
+                UPDATE recipes SET uuid=?, version=?, updated_at=?, deleted_at=? WHERE id=?
+            """, (record["uuid"], record["version"], record["updated_at"],
+                  record["deleted_at"], recipe.id))
+            self.conn.execute("DELETE FROM tombstones WHERE uuid=?", (record["uuid"],))
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        stats.applied += 1
+
+    def _apply_purge(self, record: dict, local, tomb, stats: SyncStats) -> None:
+        if local is not None:
+            if local["version"] > record["version"]:
+                # Edited here after the peer purged it
+                stats.kept += 1
+                return
+            self.conn.execute("DELETE FROM recipes WHERE id=?", (local["id"],))
+        elif tomb is None:
+            # Remember it, so a third library can't bring it back
+            self.conn.execute("UPDATE sync_meta SET value=value+1 WHERE key='seq'")
+            self.conn.execute("""
+                INSERT INTO tombstones (uuid, version, change_seq)
+                VALUES (?, ?, (SELECT value FROM sync_meta WHERE key='seq'))
+            """, (record["uuid"], record["version"]))
+        self.conn.commit()
+        stats.purged += 1
+
+    def _wins(self, record: dict, local: sqlite3.Row) -> bool:
+        """Whether a remote record beats the local row: version, then time, then hash."""
+        if record["version"] != local["version"]:
+            return record["version"] > local["version"]
+        if (record["updated_at"] or "") != (local["updated_at"] or ""):
+            return (record["updated_at"] or "") > (local["updated_at"] or "")
+        # Only now is the local recipe worth loading
+        return record["hash"] > self._record(local)["hash"]
+
+    # --- sockets ---
+
+    def exchange(self, stream: IO[bytes], initiator: bool) -> SyncStats:
+        """
+        Two-way sync over a connected stream, e.g. a unix socket's makefile("rwb").
+        The initiator sends its changes first, then the other side answers with its own.
+        """
+        def send(messages: Iterable[dict]):
+            for message in messages:
+                stream.write((json.dumps(message, ensure_ascii=False) + "\n").encode())
+            stream.flush()
+
+        lines = (line.decode() for line in stream)
+        me = library_id(self.conn)
+        if initiator:
+            send([{"sync": FORMAT, "hello": me}])
+            hello = self._read_header(lines)
+            peer_id = hello["hello"]
+            outgoing = list(self.batch(int(hello["want"]), want=self.peer(peer_id)[0]))
+            send(outgoing)
+            header = self._read_header(lines)
+            stats, complete = self._apply_records(header, lines)
+        else:
+            peer_id = self._read_header(lines)["hello"]
+            send([{"sync": FORMAT, "hello": me, "want": self.peer(peer_id)[0]}])
+            header = self._read_header(lines)
+            # Take our side of the exchange before the peer's changes land
+            outgoing = list(self.batch(header["want"]))
+            stats, complete = self._apply_records(header, lines)
+            if complete:
+                send(outgoing)
+        if not complete:
+            raise SyncError("connection closed during sync")
+        if header["library"] != peer_id:
+            raise SyncError("peer changed identity during sync")
+        self._mark(peer_id, sent=outgoing[0]["seq"])
+        stats.sent = outgoing[-1]["end"]
+        return stats
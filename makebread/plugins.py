@@ -0,0 +1,232 @@
+"""Plugin API for makeBread.
+
+Plugins are Python files in ~/.config/makebread/plugins/. A plugin
+declares the hooks it implements at module level, for example:
+
+    PLUGIN_NAME = "Hydration badge"
+    PLUGIN_HOOKS = ["render"]
+
+    def render(recipe):
+        return [("Hydration", "68%")]
+
+Hooks:
+    on_save(recipe)          called after a recipe is saved
+    on_import(recipe)        may return a changed Recipe to import instead
+    render(recipe)           returns extra (title, text) sections to show
+    search(query)            returns ids of recipes matching the query
+
+Declarations are read from the source without running it, and cached,
+so a plugin is only imported the first time one of its hooks is needed.
+Imports and hook calls are timed; plugins that repeatedly exceed the
+budget of a hot-path hook (render, search) are disabled for the session.
+"""
+
+import ast
+import importlib.util
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+log = logging.getLogger(__name__)
+
+HOOKS = ("on_save", "on_import", "render", "search")
+
+# Seconds a single call may take before it is logged as slow
+HOOK_BUDGETS = {"on_save": 0.25, "on_import": 0.25, "render": 0.02, "search": 0.05}
+IMPORT_BUDGET = 0.5
+# Hooks that run while the user waits; slow calls there count as strikes
+HOT_HOOKS = {"render", "search"}
+# Strikes (slow hot-path calls or errors) after which a plugin is disabled
+MAX_STRIKES = 3
+
+_MANIFEST_VERSION = 1
+
+
+def get_plugin_dir() -> Path:
+    config_home = Path(os.environ.get("XDG_CONFIG_HOME", Path.home() / ".config"))
+    return config_home / "makebread" / "plugins"
+
+
+def get_manifest_cache_path() -> Path:
+    cache_dir = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "makebread"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir / "plugin-manifests.json"
+
+
+@dataclass
+class PluginStats:
+    import_time: float = 0.0
+    calls: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    strikes: int = 0
+
+
+@dataclass
+class Plugin:
+    name: str
+    path: str
+    hooks: list[str]
+    module: Any = None
+    disabled: bool = False
+    stats: PluginStats = field(default_factory=PluginStats)
+
+
+def read_manifest(path: Path) -> dict:
+    """
+    A plugin's name and hooks, read from its source without importing it.
+    Without PLUGIN_HOOKS, hooks are the top-level functions with hook names.
+    """
+    tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+    name = path.stem
+    declared = None
+    functions = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.add(node.name)
+        elif isinstance(node, ast.Assign) and len(node.targets) == 1 \
+                and isinstance(node.targets[0], ast.Name):
+            target = node.targets[0].id
+            try:
+                value = ast.literal_eval(node.value)
+            except ValueError:
+                continue
+            if target == "PLUGIN_NAME" and isinstance(value, str):
+                name = value
+            elif target == "PLUGIN_HOOKS" and isinstance(value, (list, tuple)):
+                declared = [str(h) for h in value]
+    hooks = declared if declared is not None else sorted(functions)
+    return {"name": name, "hooks": [h for h in hooks if h in HOOKS]}
+
+
+class PluginManager:
+    """Discovers plugins, imports them on demand and runs their hooks."""
+
+    def __init__(self, plugin_dir: Optional[Path] = None, cache_path: Optional[Path] = None):
+        self.plugin_dir = plugin_dir or get_plugin_dir()
+        self._cache_path = cache_path
+        self.plugins: list[Plugin] = []
+        self._by_hook: dict[str, list[Plugin]] = {hook: [] for hook in HOOKS}
+
+    def discover(self) -> None:
+        """Read the manifests of all plugins, reusing cached ones for unchanged files."""
+        self.plugins = []
+        self._by_hook = {hook: [] for hook in HOOKS}
+        if not self.plugin_dir.is_dir():
+            return
+        cache_path = self._cache_path or get_manifest_cache_path()
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+            if cache.get("version") != _MANIFEST_VERSION:
+                cache = {}
+        except (OSError, ValueError):
+            cache = {}
+        entries = cache.get("plugins", {})
+        fresh = {}
+        for path in sorted(self.plugin_dir.glob("*.py")):
+            if path.name.startswith("_"):
+                continue
+            st = path.stat()
+            key = str(path)
+            entry = entries.get(key)
+            if entry is None or entry["stamp"] != [st.st_mtime_ns, st.st_size]:
+                try:
+                    manifest = read_manifest(path)
+                except (OSError, SyntaxError, UnicodeDecodeError) as e:
+                    log.warning("Plugin %s: can't read manifest: %s", path.name, e)
+                    continue
+                entry = {"stamp": [st.st_mtime_ns, st.st_size], **manifest}
+            fresh[key] = entry
+            plugin = Plugin(entry["name"], key, entry["hooks"])
+            self.plugins.append(plugin)
+            for hook in plugin.hooks:
+                self._by_hook[hook].append(plugin)
+        if fresh != entries:
+            try:
+                tmp = cache_path.with_suffix(".tmp")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"version": _MANIFEST_VERSION, "plugins": fresh}, f)
+                os.replace(tmp, cache_path)
+            except OSError:
+                pass
+
+    def has(self, hook: str) -> bool:
+        """Whether any enabled plugin implements a hook; never imports anything."""
+        return any(not p.disabled for p in self._by_hook[hook])
+
+    def _load(self, plugin: Plugin):
+        if plugin.module is not None or plugin.disabled:
+            return plugin.module
+        start = time.perf_counter()
+        try:
+            spec = importlib.util.spec_from_file_location(
+                f"makebread_plugin_{Path(plugin.path).stem}", plugin.path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        except Exception:
+            log.exception("Plugin %s failed to load; disabled", plugin.name)
+            plugin.disabled = True
+            return None
+        finally:
+            plugin.stats.import_time = time.perf_counter() - start
+        if plugin.stats.import_time > IMPORT_BUDGET:
+            log.warning("Plugin %s took %.0f ms to import", plugin.name,
+                        plugin.stats.import_time * 1000)
+        plugin.module = module
+        return module
+
+    def _strike(self, plugin: Plugin, reason: str) -> None:
+        plugin.stats.strikes += 1
+        if plugin.stats.strikes >= MAX_STRIKES:
+            plugin.disabled = True
+            log.warning("Plugin %s disabled: %s", plugin.name, reason)
+
+    def _run(self, plugin: Plugin, hook: str, args: tuple):
+        module = self._load(plugin)
+        fn = getattr(module, hook, None) if module is not None else None
+        if fn is None:
+            return None
+        stats = plugin.stats
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        except Exception:
+            log.exception("Plugin %s failed in %s", plugin.name, hook)
+            self._strike(plugin, "repeated errors")
+            return None
+        finally:
+            elapsed = time.perf_counter() - start
+            stats.calls += 1
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+            budget = HOOK_BUDGETS[hook]
+            if elapsed > budget:
+                log.warning("Plugin %s took %.0f ms in %s (budget %.0f ms)", plugin.name,
+                            elapsed * 1000, hook, budget * 1000)
+                if hook in HOT_HOOKS:
+                    self._strike(plugin, f"too slow in {hook}")
+
+    def call(self, hook: str, *args) -> list:
+        """Run a hook in every enabled plugin; returns the non-None results."""
+        results = []
+        for plugin in self._by_hook[hook]:
+            if plugin.disabled:
+                continue
+            result = self._run(plugin, hook, args)
+            if result is not None:
+                results.append(result)
+        return results
+
+    def pipe(self, hook: str, value):
+        """Pass a value through a hook in every plugin; each may return a replacement."""
+        for plugin in self._by_hook[hook]:
+            if not plugin.disabled:
+                result = self._run(plugin, hook, (value,))
+                if result is not None:
+                    value = result
+        return value
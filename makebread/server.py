@@ -0,0 +1,373 @@
+"""Read-only HTTP/JSON API over the recipe library.
+
+Started with ``makebread serve``. Endpoints:
+
+    GET /recipes?offset=&limit=&favorites=1&category=&tag=
+    GET /recipes/<id>
+    GET /search?q=&offset=&limit=
+    GET /facets
+
+Every response carries a strong ETag: a recipe's comes from its row's
+change sequence number, lists and facets from the library's change
+sequence and the query. A matching If-None-Match is answered with 304
+before anything else is read. Bodies are gzipped for clients that
+accept it, and encoded bodies are cached by ETag. Queries run on a small pool of read-only
+connections in worker threads, so the event loop only does I/O.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import queue
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from makebread import __version__
+from makebread.models.recipe import RecipeStore, RecipeSummary
+from makebread.models.sync import current_seq, library_id
+from makebread.utils.importer import recipe_to_dict
+
+log = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+GZIP_MIN_BYTES = 512
+CACHE_ENTRIES = 512
+IDLE_TIMEOUT = 15.0
+MAX_HEADER_BYTES = 16 * 1024
+
+_REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 413: "Content Too Large",
+            500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ReadPool:
+    """Read-only connections to one database, used by as many worker threads."""
+
+    def __init__(self, db_path: Path, size: int = 4):
+        self._idle: queue.SimpleQueue = queue.SimpleQueue()
+        self._conns = []
+        for _ in range(size):
+            conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self._conns.append(conn)
+            self._idle.put(conn)
+        # One thread per connection, so a worker never waits for one
+        self._executor = ThreadPoolExecutor(max_workers=size,
+                                            thread_name_prefix="makebread-read")
+
+    def _call(self, fn: Callable, args: tuple):
+        conn = self._idle.get()
+        try:
+            return fn(RecipeStore(conn), *args)
+        finally:
+            self._idle.put(conn)
+
+    async def run(self, fn: Callable, *args):
+        """Run fn(store, *args) on a pooled connection without blocking the loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, fn, args)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        for conn in self._conns:
+            conn.close()
+
+
+def _summary_dict(s: RecipeSummary) -> dict:
+    return {"id": s.id, "name": s.name, "favorite": s.favorite,
+            "rating": s.rating, "version": s.version}
+
+
+def _int_param(params: dict, name: str, default: int, maximum: Optional[int] = None) -> int:
+    value = params.get(name, [""])[0]
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise HTTPError(400, f"{name} must be an integer")
+    if number < 0:
+        raise HTTPError(400, f"{name} must not be negative")
+    return min(number, maximum) if maximum is not None else number
+
+
+def _page(path: str, params: dict, items: list, total: int, offset: int, limit: int) -> dict:
+    next_url = None
+    if offset + len(items) < total:
+        query = {k: v[0] for k, v in params.items()}
+        query["offset"] = offset + len(items)
+        query["limit"] = limit
+        next_url = f"{path}?{urlencode(query)}"
+    return {"items": items, "total": total, "offset": offset, "limit": limit, "next": next_url}
+
+
+def _library_etag(store: RecipeStore, path: str, params: dict) -> str:
+    # Every save, trash, restore and purge bumps the sequence
+    key = json.dumps([library_id(store.conn), current_seq(store.conn), path,
+                      sorted(params.items())])
+    return '"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+
+
+# Endpoints run in a worker thread. Each computes the ETag first and
+# only builds the body when the client (or the cache) doesn't have it.
+
+def _list(store: RecipeStore, path: str, params: dict, known: Callable[[str], bool]):
+    etag = _library_etag(store, path, params)
+    if known(etag):
+        return etag, None
+    offset = _int_param(params, "offset", 0)
+    limit = _int_param(params, "limit", DEFAULT_LIMIT, MAX_LIMIT)
+    filters = {"favorites_only": params.get("favorites", ["0"])[0] in ("1", "true"),
+               "category": params.get("category", [None])[0],
+               "tag": params.get("tag", [None])[0]}
+    items = [_summary_dict(s) for s in
+             store.list_summaries(**filters, limit=limit, offset=offset)]
+    return etag, _page(path, params, items, store.count(**filters), offset, limit)
+
+
+def _search(store: RecipeStore, path: str, params: dict, known: Callable[[str], bool]):
+    query = params.get("q", [""])[0].strip()
+    if not query:
+        raise HTTPError(400, "missing q")
+    etag = _library_etag(store, path, params)
+    if known(etag):
+        return etag, None
+    offset = _int_param(params, "offset", 0)
+    limit = _int_param(params, "limit", DEFAULT_LIMIT, MAX_LIMIT)
+    items = [_summary_dict(s) for s in store.search_summaries(query, limit, offset)]
+    return etag, _page(path, params, items, store.search_count(query), offset, limit)
+
+
+def _facets(store: RecipeStore, path: str, params: dict, known: Callable[[str], bool]):
+    etag = _library_etag(store, path, {})
+    if known(etag):
+        return etag, None
+    return etag, store.facets()
+
+
+def _recipe(store: RecipeStore, recipe_id: int, known: Callable[[str], bool]):
+    row = store.conn.execute(
+        "SELECT change_seq FROM recipes WHERE id=? AND deleted_at IS NULL", (recipe_id,)
+    ).fetchone()
+    if row is None:
+        raise HTTPError(404, "no such recipe")
+    etag = f'"r{recipe_id}-{row[0]}"'
+    if known(etag):
+        return etag, None
+    recipe = store.get(recipe_id)
+    if recipe is None:
+        raise HTTPError(404, "no such recipe")
+    # The revision read with the rows, in case the recipe changed in between
+    etag = f'"r{recipe_id}-{recipe.revision}"'
+    return etag, {"id": recipe.id, "version": recipe.version, **recipe_to_dict(recipe)}
+
+
+_ROUTES = {"/recipes": _list, "/search": _search, "/facets": _facets}
+
+
+class RecipeServer:
+    """Serves the API for one database on a host and port."""
+
+    def __init__(self, db_path: Path, host: str = "127.0.0.1", port: int = 8080,
+                 connections: int = 4):
+        self.pool = ReadPool(db_path, connections)
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        # (etag, gzipped) -> encoded body
+        self._cache: OrderedDict[tuple, bytes] = OrderedDict()
+
+    def _cached(self, etag: str) -> bool:
+        return (etag, False) in self._cache
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port,
+                                                  limit=MAX_HEADER_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.pool.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError,
+                        asyncio.LimitOverrunError):
+                    break
+                keep_alive = await self._respond(head, reader, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, head: bytes, reader: asyncio.StreamReader,
+                       writer: asyncio.StreamWriter) -> bool:
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, http_version = lines[0].split(" ", 2)
+        except ValueError:
+            self._write(writer, 400, {"error": "malformed request"}, keep_alive=False)
+            return False
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if http_version == "HTTP/1.1" \
+            else connection == "keep-alive"
+        gzipped = "gzip" in headers.get("accept-encoding", "")
+        # No request has a use for a body. Rather than read one of any size,
+        # refuse it and close, so it isn't read as the next request either
+        length = headers.get("content-length", "0")
+        if not (length.isascii() and length.isdigit()):
+            self._write(writer, 400, {"error": "bad Content-Length"}, keep_alive=False)
+            return False
+        if int(length) or "transfer-encoding" in headers:
+            self._write(writer, 413, {"error": "request bodies are not accepted"},
+                        keep_alive=False)
+            return False
+
+        if method not in ("GET", "HEAD"):
+            self._write(writer, 405, {"error": "read-only API"}, keep_alive,
+                        extra={"Allow": "GET, HEAD"})
+            return keep_alive
+        if_none_match = {t.strip() for t in headers.get("if-none-match", "").split(",") if t}
+        # Queries run in worker threads, which must not read the cache the
+        # loop changes; they get a snapshot of the ETags known right now
+        known = frozenset(if_none_match).union(
+            etag for etag, gz in self._cache if not gz).__contains__
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        params = parse_qs(url.query)
+        try:
+            etag, payload = await self._query(path, params, known)
+            if payload is None and etag not in if_none_match and not self._cached(etag):
+                # Evicted from the cache while the query ran
+                etag, payload = await self._query(path, params, if_none_match.__contains__)
+        except HTTPError as e:
+            self._write(writer, e.status, {"error": str(e)}, keep_alive)
+            return keep_alive
+        except sqlite3.Error:
+            log.exception("Query failed for %s", target)
+            self._write(writer, 500, {"error": "database error"}, keep_alive)
+            return keep_alive
+        except Exception:
+            log.exception("Request failed for %s", target)
+            self._write(writer, 500, {"error": "internal error"}, keep_alive)
+            return keep_alive
+
+        if etag in if_none_match:
+            self._write(writer, 304, None, keep_alive, etag=etag, gzipped=gzipped)
+        else:
+            body, gzipped = self._encode(etag, payload, gzipped)
+            self._write(writer, 200, body, keep_alive, etag=etag, gzipped=gzipped,
+                        head_only=method == "HEAD")
+        return keep_alive
+
+    async def _query(self, path: str, params: dict, known: Callable[[str], bool]):
+        if path.startswith("/recipes/"):
+            try:
+                recipe_id = int(path[len("/recipes/"):])
+            except ValueError:
+                raise HTTPError(404, "no such recipe")
+            return await self.pool.run(_recipe, recipe_id, known)
+        if path in _ROUTES:
+            return await self.pool.run(_ROUTES[path], path, params, known)
+        raise HTTPError(404, "not found")
+
+    def _encode(self, etag: str, payload: Optional[dict], gzipped: bool) -> tuple[bytes, bool]:
+        """
+        The body for an ETag, and whether it is gzipped.
+        payload is None when the body is known to be cached.
+        """
+        body = self._cache.get((etag, False))
+        if body is None:
+            body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+            self._store(etag, False, body)
+        else:
+            self._cache.move_to_end((etag, False))
+        if not gzipped or len(body) < GZIP_MIN_BYTES:
+            return body, False
+        compressed = self._cache.get((etag, True))
+        if compressed is None:
+            compressed = gzip.compress(body, compresslevel=6, mtime=0)
+            self._store(etag, True, compressed)
+        return compressed, True
+
+    def _store(self, etag: str, gzipped: bool, body: bytes) -> None:
+        self._cache[(etag, gzipped)] = body
+        while len(self._cache) > CACHE_ENTRIES:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _write(writer: asyncio.StreamWriter, status: int, body, keep_alive: bool,
+               etag: Optional[str] = None, gzipped: bool = False,
+               head_only: bool = False, extra: Optional[dict] = None) -> None:
+        if isinstance(body, dict):
+            body = json.dumps(body).encode()
+        body = body or b""
+        headers = [f"HTTP/1.1 {status} {_REASONS[status]}",
+                   f"Server: makebread/{__version__}",
+                   "Cache-Control: no-cache",
+                   "Vary: Accept-Encoding",
+                   f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if etag:
+            headers.append(f"ETag: {etag}")
+        if status != 304:
+            headers.append("Content-Type: application/json; charset=utf-8")
+            headers.append(f"Content-Length: {len(body)}")
+            if gzipped:
+                headers.append("Content-Encoding: gzip")
+        for name, value in (extra or {}).items():
+            headers.append(f"{name}: {value}")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1"))
+        if status != 304 and not head_only:
+            writer.write(body)
+
+
+def serve(db_path: Path, host: str = "127.0.0.1", port: int = 8080, connections: int = 4,
+          on_ready: Optional[Callable[[RecipeServer], None]] = None) -> None:
+    """Run the server until interrupted."""
+    async def run():
+        server = RecipeServer(db_path, host, port, connections)
+        await server.start()
+        if on_ready is not None:
+            on_ready(server)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
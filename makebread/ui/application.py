@@ -8,6 +8,7 @@ from pathlib import Path
 
 from makebread.models.database import get_connection, init_db
 from makebread.models.recipe import RecipeStore
+from makebread.plugins import PluginManager
 from makebread.utils.importer import import_json
 from makebread.i18n import _
 
@@ -19,12 +20,15 @@ class MakeBreadApplication(Adw.Application):
             flags=Gio.ApplicationFlags.DEFAULT_FLAGS,
         )
         self.store = None
+        self.plugins = PluginManager()
 
     def do_activate(self):
         # Init DB
         conn = get_connection()
         init_db(conn)
         self.store = RecipeStore(conn)
+        if not self.plugins.plugins:
+            self.plugins.discover()
 
         # Seed on first run
         if not self.store.get_all():
@@ -1,42 +1,157 @@
 """Main application window — GTK4/Adwaita."""
 
+import bisect
+import logging
+import threading
+
 import gi
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
-from gi.repository import Adw, Gtk, Gio, GLib, Pango
+from gi.repository import Adw, Gtk, Gio, GLib, GObject, Pango
 
 from makebread.i18n import _
-from makebread.models.recipe import Recipe, RecipeStore
+from makebread.models import command_log
+from makebread.models.collection import CollectionError, CollectionStore
+from makebread.models.database import get_connection, get_connection_path
+from makebread.models.drafts import DraftJournal
+from makebread.models.recipe import RecipeStore, RecipeSummary
 from makebread.ui.recipe_view import RecipeViewWidget
+from makebread.ui.prefetch import RecipePrefetcher
 from makebread.ui.recipe_editor import RecipeEditorDialog
+from makebread.ui.search import BackgroundSearch
+from makebread.ui.settings_dialog import get_settings, get_unit_system, save_settings
+from makebread.ui.thumbnails import LIST_SIZE, ThumbnailLoader
+from makebread.ui.undo_redo import UndoRedoManager
+from makebread.utils.conversion_cache import ConversionCache
+from makebread.utils.similarity import SimilarRecipes
+from makebread.utils.thumbnails import ThumbnailCache
+from makebread.utils.trigram_index import TrigramIndex, library_signature
+from makebread.utils.units import SYSTEM_US, SYSTEMS
+
+log = logging.getLogger(__name__)
+
+
+class RecipeItem(GObject.Object):
+    """A lightweight list model item for a recipe."""
+    __gtype_name__ = "MakeBreadRecipeItem"
+
+    recipe_id = GObject.Property(type=int)
+    name = GObject.Property(type=str)
+    favorite = GObject.Property(type=bool, default=False)
+    revision = GObject.Property(type=int)
+    image_path = GObject.Property(type=str, default="")
+
+    def __init__(self, summary: RecipeSummary):
+        super().__init__(recipe_id=summary.id, name=summary.name, favorite=summary.favorite,
+                         revision=summary.revision, image_path=summary.image_path)
 
 
 class RecipeRow(Gtk.Box):
-    """A row in the recipe list."""
-    def __init__(self, recipe: Recipe):
+    """A row in the recipe list, recycled by the list view for many items."""
+    def __init__(self, thumbnails: ThumbnailLoader):
         super().__init__(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
-        self.recipe_id = recipe.id
-        prefix = "★ " if recipe.favorite else ""
-        label = Gtk.Label(label=f"{prefix}{recipe.name}", xalign=0, hexpand=True)
-        label.set_ellipsize(Pango.EllipsizeMode.END)
-        self.append(label)
+        self.recipe_id = None
+        self._item = None
+        self._handler = 0
+        self._thumbnails = thumbnails
+        self._image_path = ""
+        self.image = Gtk.Image(pixel_size=32)
+        self.image.add_css_class("icon-dropshadow")
+        self.append(self.image)
+        self.label = Gtk.Label(xalign=0, hexpand=True)
+        self.label.set_ellipsize(Pango.EllipsizeMode.END)
+        self.append(self.label)
         self.set_margin_top(4)
         self.set_margin_bottom(4)
         self.set_margin_start(8)
         self.set_margin_end(8)
 
+    def bind(self, item: RecipeItem):
+        self._item = item
+        self._handler = item.connect("notify", lambda *_: self._update())
+        self._update()
+
+    def unbind(self):
+        if self._item is not None:
+            self._item.disconnect(self._handler)
+            self._item = None
+        self._image_path = ""
+
+    def _update(self):
+        self.recipe_id = self._item.recipe_id
+        prefix = "★ " if self._item.favorite else ""
+        self.label.set_label(f"{prefix}{self._item.name}")
+        self._set_image(self._item.image_path)
+
+    def _set_image(self, image_path: str):
+        if image_path == self._image_path:
+            return
+        self._image_path = image_path
+        self.image.set_visible(bool(image_path))
+        if not image_path:
+            return
+        texture = self._thumbnails.request(image_path, LIST_SIZE, self._on_thumbnail(image_path))
+        if texture is not None:
+            self.image.set_from_paintable(texture)
+        else:
+            self.image.set_from_icon_name("image-x-generic-symbolic")
+
+    def _on_thumbnail(self, image_path: str):
+        def done(texture):
+            # The row may have been recycled for another recipe meanwhile
+            if texture is not None and self._image_path == image_path:
+                self.image.set_from_paintable(texture)
+        return done
+
+
+class _SortKeys:
+    """(name, id) sort keys of a summary list, as a sequence for bisect."""
+
+    def __init__(self, summaries: list[RecipeSummary]):
+        self._summaries = summaries
+
+    def __len__(self):
+        return len(self._summaries)
+
+    def __getitem__(self, i):
+        s = self._summaries[i]
+        return (s.name, s.id)
+
 
 class MainWindow(Adw.ApplicationWindow):
     def __init__(self, application, store: RecipeStore):
         super().__init__(application=application)
         self.store = store
+        self.plugins = application.plugins
         self.recipes = []
+        self._by_id = {}
+        self._sorted_view = True
         self._filter_favorites = False
+        self.collections = CollectionStore(store.conn)
+        self._collection_ids = [None]
+        self.conversions = ConversionCache()
+        cache_mb = get_settings()["thumbnail_cache_mb"]
+        self.thumbnails = ThumbnailLoader(ThumbnailCache(max_bytes=cache_mb * 1024 * 1024))
+        self.prefetcher = RecipePrefetcher(store, self.conversions)
+        self.search = BackgroundSearch(store, self._on_search_page, self._on_search_done,
+                                       self._on_search_failed)
+        self.drafts = DraftJournal(store.conn)
+        store.purge_deleted()
+        self.history = UndoRedoManager(store=store, on_applied=self._on_history_applied)
+        self.index = None
+        self.similar = SimilarRecipes(store.conn)
+        self._similar_state = None
         self.set_title(_("makeBread"))
         self.set_default_size(1000, 650)
         self._setup_ui()
         self._setup_actions()
+        self._load_collections()
         self._load_recipes()
+        if get_settings()["instant_search"]:
+            self._load_index()
+        self._refresh_similar()
+        self.connect("close-request", self._on_close_request)
+        GLib.idle_add(self._offer_draft_restore)
 
     def _setup_ui(self):
         # Main layout
@@ -52,6 +167,14 @@ class MainWindow(Adw.ApplicationWindow):
 
         # Menu button
         menu_model = Gio.Menu()
+        units_menu = Gio.Menu()
+        for system, label in SYSTEMS.items():
+            units_menu.append(label, f"win.unit-system::{system}")
+        menu_model.append_section(_("Units"), units_menu)
+        export_menu = Gio.Menu()
+        export_menu.append(_("Print Recipe…"), "win.print")
+        export_menu.append(_("Export Cookbook as PDF…"), "win.export-cookbook")
+        menu_model.append_section(None, export_menu)
         menu_model.append(_("About makeBread"), "app.about")
         menu_btn = Gtk.MenuButton(icon_name="open-menu-symbolic", menu_model=menu_model)
         sidebar_header.pack_end(menu_btn)
@@ -88,13 +211,38 @@ class MainWindow(Adw.ApplicationWindow):
 
         sidebar_box.append(filter_box)
 
+        # Smart collections
+        collection_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=4)
+        collection_box.set_margin_start(8)
+        collection_box.set_margin_end(8)
+        collection_box.set_margin_bottom(4)
+        self.collection_names = Gtk.StringList()
+        self.collection_dropdown = Gtk.DropDown(model=self.collection_names, hexpand=True)
+        self.collection_dropdown.set_tooltip_text(_("Smart Collection"))
+        self._collection_handler = self.collection_dropdown.connect(
+            "notify::selected", self._on_collection_selected)
+        collection_box.append(self.collection_dropdown)
+        collection_menu = Gio.Menu()
+        collection_menu.append(_("New Smart Collection…"), "win.new-collection")
+        collection_menu.append(_("Edit Collection…"), "win.edit-collection")
+        collection_menu.append(_("Delete Collection"), "win.delete-collection")
+        collection_box.append(Gtk.MenuButton(icon_name="view-more-symbolic",
+                                             menu_model=collection_menu,
+                                             tooltip_text=_("Collections")))
+        sidebar_box.append(collection_box)
+
         # Recipe list
         scrolled = Gtk.ScrolledWindow(vexpand=True)
-        self.listbox = Gtk.ListBox()
-        self.listbox.set_selection_mode(Gtk.SelectionMode.SINGLE)
-        self.listbox.add_css_class("navigation-sidebar")
-        self.listbox.connect("row-selected", self._on_recipe_selected)
-        scrolled.set_child(self.listbox)
+        self.list_model = Gio.ListStore(item_type=RecipeItem)
+        self.selection = Gtk.SingleSelection(model=self.list_model)
+        self.selection.connect("notify::selected-item", self._on_recipe_selected)
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", lambda f, li: li.set_child(RecipeRow(self.thumbnails)))
+        factory.connect("bind", lambda f, li: li.get_child().bind(li.get_item()))
+        factory.connect("unbind", lambda f, li: li.get_child().unbind())
+        self.listview = Gtk.ListView(model=self.selection, factory=factory)
+        self.listview.add_css_class("navigation-sidebar")
+        scrolled.set_child(self.listview)
         sidebar_box.append(scrolled)
 
         # Status label
@@ -128,7 +276,9 @@ class MainWindow(Adw.ApplicationWindow):
 
         content_box.append(content_header)
 
-        self.recipe_view = RecipeViewWidget()
+        self.recipe_view = RecipeViewWidget(self.conversions, self.thumbnails, self.plugins,
+                                            self.similar, self.prefetcher)
+        self.recipe_view.connect("recipe-activated", self._on_similar_activated)
         content_box.append(self.recipe_view)
 
         content_page.set_child(content_box)
@@ -136,89 +286,338 @@ class MainWindow(Adw.ApplicationWindow):
         self.split_view.set_sidebar(sidebar_page)
         self.split_view.set_content(content_page)
 
-        self.set_content(self.split_view)
+        self.toasts = Adw.ToastOverlay(child=self.split_view)
+        self.set_content(self.toasts)
 
     def _setup_actions(self):
         # Keyboard shortcuts
         app = self.get_application()
         app.set_accels_for_action("win.add", ["<Control>n"])
 
+        rating_action = Gio.SimpleAction.new("set-rating", GLib.VariantType.new("i"))
+        rating_action.connect("activate", self._on_set_rating)
+        self.add_action(rating_action)
+        for stars in range(6):
+            app.set_accels_for_action(f"win.set-rating({stars})", [f"<Alt>{stars}"])
+
+        unit_action = Gio.SimpleAction.new_stateful(
+            "unit-system", GLib.VariantType.new("s"), GLib.Variant("s", get_unit_system()))
+        unit_action.connect("change-state", self._on_unit_system_changed)
+        self.add_action(unit_action)
+
+        for name, callback, accels in (("undo", self._on_undo, ["<Control>z"]),
+                                       ("redo", self._on_redo, ["<Control><Shift>z",
+                                                                "<Control>y"]),
+                                       ("print", self._on_print, ["<Control>p"]),
+                                       ("export-cookbook", self._on_export_cookbook, []),
+                                       ("new-collection", self._on_new_collection, []),
+                                       ("edit-collection", self._on_edit_collection, []),
+                                       ("delete-collection", self._on_delete_collection, [])):
+            action = Gio.SimpleAction.new(name, None)
+            action.connect("activate", callback)
+            self.add_action(action)
+            app.set_accels_for_action(f"win.{name}", accels)
+        self._update_collection_actions()
+
+    def _on_unit_system_changed(self, action, value):
+        system = value.get_string()
+        action.set_state(value)
+        settings = get_settings()
+        if settings["unit_system"] == system:
+            return
+        settings["unit_system"] = system
+        save_settings(settings)
+        self.recipe_view.refresh()
+        self._warm_conversions(system)
+
+    def _warm_conversions(self, system, radius=100):
+        """Convert the recipes around the selection in the background."""
+        db_path = get_connection_path(self.store.conn)
+        if db_path is None:
+            return
+        pos = self.selection.get_selected()
+        if pos == Gtk.INVALID_LIST_POSITION:
+            pos = 0
+        ids = [s.id for s in self.recipes[max(0, pos - radius):pos + radius]]
+
+        def recipes():
+            # Runs in the warm-up thread, which needs its own connection
+            store = RecipeStore(get_connection(db_path))
+            try:
+                for rid in ids:
+                    recipe = store.get(rid)
+                    if recipe:
+                        yield recipe
+            finally:
+                store.conn.close()
+
+        self.conversions.warm(recipes(), system)
+
+    def _load_index(self):
+        """Load or build the type-ahead index without blocking startup."""
+        db_path = get_connection_path(self.store.conn)
+        if db_path is None:
+            self.index = TrigramIndex.build(self.store)
+            return
+
+        def run():
+            conn = get_connection(db_path)
+            try:
+                index = TrigramIndex.load_or_build(RecipeStore(conn))
+            finally:
+                conn.close()
+            GLib.idle_add(self._on_index_loaded, index)
+
+        threading.Thread(target=run, name="makebread-index", daemon=True).start()
+
+    def _on_index_loaded(self, index):
+        if index.signature != library_signature(self.store.conn):
+            # Recipes changed while the index was loading
+            self._load_index()
+        else:
+            self.index = index
+        return GLib.SOURCE_REMOVE
+
+    def _refresh_similar(self):
+        """Update stored similar recipes for changed ingredients, in the background."""
+        db_path = get_connection_path(self.store.conn)
+        if db_path is None:
+            self.similar.refresh()
+            return
+        if self._similar_state is not None:
+            # Already running; run once more when it's done
+            self._similar_state = "again"
+            return
+        self._similar_state = "running"
+
+        def run():
+            try:
+                conn = get_connection(db_path)
+                try:
+                    SimilarRecipes(conn).refresh()
+                finally:
+                    conn.close()
+            except Exception:
+                log.exception("Refreshing similar recipes failed")
+            finally:
+                # Always, so a failed refresh doesn't block the next one
+                GLib.idle_add(self._on_similar_refreshed)
+
+        threading.Thread(target=run, name="makebread-similar", daemon=True).start()
+
+    def _on_similar_refreshed(self):
+        again = self._similar_state == "again"
+        self._similar_state = None
+        if again:
+            self._refresh_similar()
+        self.prefetcher.invalidate_neighbours()
+        self.recipe_view.show_similar()
+        return GLib.SOURCE_REMOVE
+
+    def _on_similar_activated(self, view, recipe_id):
+        if not self._select_recipe_id(recipe_id):
+            # Not in the current list (filtered out or searched away)
+            recipe = self.store.get(recipe_id)
+            if recipe:
+                self.selection.set_selected(Gtk.INVALID_LIST_POSITION)
+                self.recipe_view.show_recipe(recipe)
+
+    def _recipe_changed(self, recipe_id, ingredients=False):
+        """
+        Drop or refresh everything derived from a recipe after it changed.
+        Similar recipes only depend on ingredients; lookups already skip
+        trashed recipes, so ratings, favorites and trash don't refresh them.
+        """
+        self.conversions.invalidate(recipe_id)
+        self.prefetcher.invalidate(recipe_id)
+        if ingredients:
+            self._refresh_similar()
+        if self.index is not None:
+            recipe = self.store.get(recipe_id)
+            if recipe:
+                self.index.update_recipe(recipe)
+            else:
+                self.index.remove(recipe_id)
+
+    def _on_close_request(self, *args):
+        self.thumbnails.shutdown()
+        self.drafts.close()
+        if self.index is not None and self.index.dirty:
+            self.index.signature = library_signature(self.store.conn)
+            try:
+                self.index.save()
+            except OSError:
+                pass
+        return False
+
     def _load_recipes(self, select_id=None):
-        self.recipes = self.store.get_all()
-        if self._filter_favorites:
-            self.recipes = [r for r in self.recipes if r.favorite]
-
-        # Clear listbox
-        while True:
-            row = self.listbox.get_row_at_index(0)
-            if row is None:
-                break
-            self.listbox.remove(row)
-
-        select_row = None
-        for i, r in enumerate(self.recipes):
-            row_widget = RecipeRow(r)
-            self.listbox.append(row_widget)
-            if select_id and r.id == select_id:
-                select_row = i
+        summaries = self.store.list_summaries(favorites_only=self._filter_favorites,
+                                              collection_id=self._collection_id)
+        self._set_items(summaries)
+        self._sorted_view = True
+        self._update_count()
 
         count = len(self.recipes)
-        if self._filter_favorites:
+        if select_id is None or not self._select_recipe_id(select_id):
+            if count > 0 and self.selection.get_selected() == Gtk.INVALID_LIST_POSITION:
+                self.selection.set_selected(0)
+
+    def _set_items(self, summaries: list[RecipeSummary]):
+        """Apply a new recipe list to the model as a single splice of what changed."""
+        old = self.recipes
+        n_old, n_new = len(old), len(summaries)
+        start = 0
+        while start < min(n_old, n_new) and old[start] == summaries[start]:
+            start += 1
+        end = 0
+        while (end < min(n_old, n_new) - start
+               and old[n_old - 1 - end] == summaries[n_new - 1 - end]):
+            end += 1
+        self.recipes = summaries
+        self._by_id = {s.id: s for s in summaries}
+        if start == n_old == n_new:
+            return
+        self.list_model.splice(start, n_old - start - end,
+                               [RecipeItem(s) for s in summaries[start:n_new - end]])
+
+    def _update_count(self):
+        count = len(self.recipes)
+        if self._collection_id is not None:
+            name = self.collection_names.get_string(self.collection_dropdown.get_selected())
+            self.status_label.set_text(
+                _("{count} recipes in {collection}").format(count=count, collection=name))
+        elif self._filter_favorites:
             self.status_label.set_text(_("{count} favorites").format(count=count))
         else:
             self.status_label.set_text(_("{count} recipes").format(count=count))
 
-        if select_row is not None:
-            row = self.listbox.get_row_at_index(select_row)
-            if row:
-                self.listbox.select_row(row)
-        elif count > 0:
-            self.listbox.select_row(self.listbox.get_row_at_index(0))
+    def _position(self, summary: RecipeSummary) -> int:
+        """Position of a listed recipe: a binary search when the list is sorted."""
+        if self._sorted_view:
+            keys = _SortKeys(self.recipes)
+            pos = bisect.bisect_left(keys, (summary.name, summary.id))
+            if pos < len(self.recipes) and self.recipes[pos].id == summary.id:
+                return pos
+        for i, s in enumerate(self.recipes):
+            if s.id == summary.id:
+                return i
+        return -1
+
+    def _apply_summary(self, recipe_id, summary=None):
+        """
+        Update, insert or remove the single list item of a changed recipe,
+        keeping scroll position and selection. summary None means deleted.
+        """
+        old = self._by_id.get(recipe_id)
+        visible = summary is not None and self.store.is_listed(
+            recipe_id, self._filter_favorites, collection_id=self._collection_id)
+        if not self._sorted_view:
+            # Search results: update rows in place, but don't add new ones
+            visible = visible and old is not None
+
+        if old is not None:
+            pos = self._position(old)
+            if visible and (not self._sorted_view or old.name == summary.name):
+                item = self.list_model.get_item(pos)
+                item.set_property("name", summary.name)
+                item.set_property("favorite", summary.favorite)
+                item.set_property("revision", summary.revision)
+                item.set_property("image_path", summary.image_path)
+                self.recipes[pos] = summary
+                self._by_id[recipe_id] = summary
+                return
+            self.list_model.remove(pos)
+            del self.recipes[pos]
+            del self._by_id[recipe_id]
+
+        if visible:
+            pos = bisect.bisect_left(_SortKeys(self.recipes), (summary.name, summary.id))
+            self.list_model.insert(pos, RecipeItem(summary))
+            self.recipes.insert(pos, summary)
+            self._by_id[recipe_id] = summary
+        if self._sorted_view:
+            self._update_count()
+
+    def _select_recipe_id(self, recipe_id) -> bool:
+        summary = self._by_id.get(recipe_id)
+        if summary is None:
+            return False
+        i = self._position(summary)
+        self.selection.set_selected(i)
+        self.listview.scroll_to(i, Gtk.ListScrollFlags.NONE, None)
+        return True
 
     def _get_selected_recipe(self):
-        row = self.listbox.get_selected_row()
-        if row is None:
+        item = self.selection.get_selected_item()
+        if item is None:
             return None
-        child = row.get_child()
-        if child and hasattr(child, "recipe_id"):
-            return self.store.get(child.recipe_id)
-        return None
+        return self.store.get(item.recipe_id)
 
-    def _on_recipe_selected(self, listbox, row):
-        if row is None:
+    def _on_recipe_selected(self, selection, _pspec):
+        item = selection.get_selected_item()
+        if item is None:
             return
-        child = row.get_child()
-        if child and hasattr(child, "recipe_id"):
-            recipe = self.store.get(child.recipe_id)
-            if recipe:
-                self.recipe_view.show_recipe(recipe)
-                icon = "starred-symbolic" if recipe.favorite else "non-starred-symbolic"
-                self.fav_btn.set_icon_name(icon)
+        recipe = self.prefetcher.get(item.recipe_id, item.revision) or self.store.get(item.recipe_id)
+        self._prefetch_neighbours(selection.get_selected())
+        if recipe:
+            self.recipe_view.show_recipe(recipe)
+            icon = "starred-symbolic" if recipe.favorite else "non-starred-symbolic"
+            self.fav_btn.set_icon_name(icon)
+
+    def _prefetch_neighbours(self, pos, radius=2):
+        """Load the rows around the selection, nearest first, in the background."""
+        ids = []
+        for offset in range(1, radius + 1):
+            for i in (pos + offset, pos - offset):
+                if 0 <= i < len(self.recipes):
+                    ids.append(self.recipes[i].id)
+        self.prefetcher.prefetch(ids)
 
     def _on_search(self, entry):
         text = entry.get_text().strip()
         if not text:
+            self.search.cancel()
             self._load_recipes()
             return
-        try:
-            self.recipes = self.store.search(text)
-        except Exception:
-            self.recipes = []
-
-        while True:
-            row = self.listbox.get_row_at_index(0)
-            if row is None:
-                break
-            self.listbox.remove(row)
-
-        for r in self.recipes:
-            self.listbox.append(RecipeRow(r))
+        results = self.index.search(text) if self.index is not None else None
+        if results is not None:
+            self.search.cancel()
+            self._on_search_page(text, results)
+            self._on_search_done(text, results, len(results))
+            return
+        self.search.request(text)
 
+    def _on_search_page(self, text, summaries):
+        self._set_items(summaries)
+        self._sorted_view = False
+        self.prefetcher.prefetch(s.id for s in summaries[:3])
+        self.status_label.set_text(_("Searching for '{query}'…").format(query=text))
+        if self.recipes:
+            self.selection.set_selected(0)
+
+    def _on_search_failed(self, text, error):
+        self.status_label.set_text(_("Search for '{query}' failed").format(query=text))
+        self.toasts.add_toast(Adw.Toast(title=_("Search failed: {error}").format(error=error)))
+
+    def _on_search_done(self, text, summaries, count):
+        if self.plugins.has("search"):
+            # Recipes found by search provider plugins go after our own results
+            found = {s.id for s in summaries}
+            extra = []
+            for ids in self.plugins.call("search", text):
+                for rid in ids if isinstance(ids, (list, tuple, set)) else ():
+                    summary = self.store.get_summary(rid) if rid not in found else None
+                    if summary is not None:
+                        found.add(rid)
+                        extra.append(summary)
+            if extra:
+                summaries = summaries + extra
+                count += len(extra)
+        self._set_items(summaries)
+        self._sorted_view = False
         self.status_label.set_text(
-            _("{count} results for '{query}'").format(count=len(self.recipes), query=text)
+            _("{count} results for '{query}'").format(count=count, query=text)
         )
-        if self.recipes:
-            self.listbox.select_row(self.listbox.get_row_at_index(0))
 
     def _on_add_recipe(self, *args):
         dialog = RecipeEditorDialog(self)
@@ -233,8 +632,55 @@ class MainWindow(Adw.ApplicationWindow):
         dialog.connect("saved", self._on_editor_saved)
         dialog.present(self)
 
+    def _offer_draft_restore(self):
+        """Offer to resume the most recent editor draft left from a previous session."""
+        drafts = self.drafts.drafts()
+        if not drafts:
+            return GLib.SOURCE_REMOVE
+        draft = drafts[0]
+        base = self.store.get(draft.recipe_id) if draft.recipe_id else None
+        if draft.recipe_id and base is None:
+            # The recipe was deleted since
+            self.drafts.discard(draft.recipe_id)
+            return GLib.SOURCE_REMOVE
+
+        name = draft.recipe.name or _("New Recipe")
+        dialog = Adw.AlertDialog(
+            heading=_("Restore Unsaved Changes?"),
+            body=_("'{name}' has changes that were never saved.").format(name=name),
+        )
+        dialog.add_response("discard", _("Discard"))
+        dialog.add_response("restore", _("Restore"))
+        dialog.set_response_appearance("discard", Adw.ResponseAppearance.DESTRUCTIVE)
+        dialog.set_response_appearance("restore", Adw.ResponseAppearance.SUGGESTED)
+        dialog.set_default_response("restore")
+        dialog.connect("response", self._on_draft_response, draft, base)
+        dialog.present(self)
+        return GLib.SOURCE_REMOVE
+
+    def _on_draft_response(self, dialog, response, draft, base):
+        if response == "restore":
+            editor = RecipeEditorDialog(self, recipe=base, draft=draft.recipe)
+            editor.connect("saved", self._on_editor_saved)
+            editor.present(self)
+        elif response == "discard":
+            self.drafts.discard(draft.recipe_id)
+
     def _on_editor_saved(self, dialog, recipe_id):
-        self._load_recipes(select_id=recipe_id)
+        self._recipe_changed(recipe_id, ingredients=True)
+        self._apply_summary(recipe_id, self.store.get_summary(recipe_id))
+        self._select_recipe_id(recipe_id)
+        recipe = self.store.get(recipe_id)
+        if recipe:
+            self.recipe_view.show_recipe(recipe)
+            self.plugins.call("on_save", recipe)
+            if dialog.recipe is None:
+                self.history.record(command_log.DELETED, recipe_id, _("Add Recipe"),
+                                    {"deleted": True}, {"deleted": False})
+            else:
+                self.history.record(command_log.CONTENT, recipe_id, _("Edit Recipe"),
+                                    command_log.content_payload(dialog.recipe),
+                                    command_log.content_payload(recipe))
 
     def _on_delete_recipe(self, *args):
         recipe = self._get_selected_recipe()
@@ -254,28 +700,240 @@ class MainWindow(Adw.ApplicationWindow):
 
     def _on_delete_response(self, dialog, response, recipe_id):
         if response == "delete":
-            self.store.delete(recipe_id)
-            self._load_recipes()
+            name = self._by_id[recipe_id].name if recipe_id in self._by_id else ""
+            if not self.store.delete(recipe_id):
+                return
+            self.drafts.discard(recipe_id)
+            self.history.record(command_log.DELETED, recipe_id, _("Delete Recipe"),
+                                {"deleted": False}, {"deleted": True})
+            self._recipe_changed(recipe_id)
+            self._apply_summary(recipe_id, None)
+            toast = Adw.Toast(title=_("Deleted '{name}'").format(name=name),
+                              button_label=_("Undo"), action_name="win.undo")
+            self.toasts.add_toast(toast)
 
     def _on_random(self, *args):
         recipe = self.store.random()
         if recipe:
             self.recipe_view.show_recipe(recipe)
-            # Select in list
-            for i in range(len(self.recipes)):
-                row = self.listbox.get_row_at_index(i)
-                if row and row.get_child() and row.get_child().recipe_id == recipe.id:
-                    self.listbox.select_row(row)
-                    break
+            self._select_recipe_id(recipe.id)
             self.status_label.set_text(_("Random pick: {name}").format(name=recipe.name))
 
     def _on_toggle_favorite(self, *args):
+        item = self.selection.get_selected_item()
+        if item is None:
+            return
+        favorite = not item.favorite
+        summary = self.store.set_favorite(item.recipe_id, favorite)
+        self.history.record(command_log.FAVORITE, item.recipe_id, _("Toggle Favorite"),
+                            {"favorite": not favorite}, {"favorite": favorite})
+        self._after_row_update(item.recipe_id, summary)
+
+    def _on_set_rating(self, action, param):
+        item = self.selection.get_selected_item()
+        if item is None:
+            return
+        old = self._by_id.get(item.recipe_id)
+        summary = self.store.set_rating(item.recipe_id, param.get_int32())
+        if old is not None and summary is not None:
+            self.history.record(command_log.RATING, item.recipe_id, _("Rate Recipe"),
+                                {"rating": old.rating}, {"rating": summary.rating})
+        self._after_row_update(item.recipe_id, summary)
+
+    def _on_print(self, *args):
         recipe = self._get_selected_recipe()
-        if not recipe:
+        if recipe:
+            from makebread.ui.print_recipe import print_recipe
+            print_recipe(recipe, self)
+
+    def _on_export_cookbook(self, *args):
+        """Export the recipes currently listed (search results or filter) as one PDF."""
+        if not self.recipes:
+            return
+        dialog = Gtk.FileDialog(title=_("Export Cookbook"), initial_name=_("Cookbook") + ".pdf")
+        dialog.save(self, None, self._on_export_file_chosen)
+
+    def _on_export_file_chosen(self, dialog, result):
+        try:
+            file = dialog.save_finish(result)
+        except GLib.Error:
             return
-        recipe.favorite = not recipe.favorite
-        self.store.save(recipe)
-        self._load_recipes(select_id=recipe.id)
+        from makebread.utils.pdf_export import export_cookbook
+        ids = [s.id for s in self.recipes]
+        path = file.get_path()
+        paper = "letter" if get_unit_system() == SYSTEM_US else "a4"
+        db_path = get_connection_path(self.store.conn)
+
+        def progress(done, total):
+            GLib.idle_add(self.status_label.set_text,
+                          _("Exporting… {percent}%").format(percent=100 * done // total))
+
+        def run():
+            # In-memory databases can't be opened from another thread
+            store = RecipeStore(get_connection(db_path)) if db_path else self.store
+            try:
+                pages = export_cookbook(store, ids, path, paper=paper, progress=progress)
+                message = _("Exported {pages} pages").format(pages=pages)
+            except Exception as e:
+                message = _("Export failed: {error}").format(error=e)
+            GLib.idle_add(self._on_export_done, message)
+
+        if db_path is None:
+            run()
+        else:
+            threading.Thread(target=run, name="makebread-export", daemon=True).start()
+
+    def _on_export_done(self, message):
+        self._update_count()
+        self.toasts.add_toast(Adw.Toast(title=message))
+        return GLib.SOURCE_REMOVE
+
+    def _on_undo(self, *args):
+        if not self.history.can_undo():
+            return
+        description = self.history.undo_description()
+        if self.history.undo():
+            self.status_label.set_text(_("Undone: {action}").format(action=description))
+        else:
+            self.toasts.add_toast(Adw.Toast(
+                title=_("Can't undo '{action}': the recipe no longer exists").format(
+                    action=description)))
+
+    def _on_redo(self, *args):
+        if not self.history.can_redo():
+            return
+        description = self.history.redo_description()
+        if self.history.redo():
+            self.status_label.set_text(_("Redone: {action}").format(action=description))
+        else:
+            self.toasts.add_toast(Adw.Toast(
+                title=_("Can't redo '{action}': the recipe no longer exists").format(
+                    action=description)))
+
+    def _on_history_applied(self, recipe_id):
+        # Undoing an edit or a delete can bring ingredients back
+        self._recipe_changed(recipe_id, ingredients=True)
+        summary = self.store.get_summary(recipe_id)
+        self._apply_summary(recipe_id, summary)
+        if summary is not None:
+            self._select_recipe_id(recipe_id)
+            recipe = self.store.get(recipe_id)
+            if recipe:
+                self.recipe_view.show_recipe(recipe)
+                icon = "starred-symbolic" if recipe.favorite else "non-starred-symbolic"
+                self.fav_btn.set_icon_name(icon)
+
+    def _after_row_update(self, recipe_id, summary):
+        self._recipe_changed(recipe_id)
+        self._apply_summary(recipe_id, summary)
+        view = self.recipe_view.recipe
+        if summary is not None and view is not None and view.id == recipe_id:
+            view.favorite = summary.favorite
+            view.rating = summary.rating
+            view.version = summary.version
+            view.revision = summary.revision
+            icon = "starred-symbolic" if summary.favorite else "non-starred-symbolic"
+            self.fav_btn.set_icon_name(icon)
+
+    # --- smart collections ---
+
+    @property
+    def _collection_id(self):
+        return self._collection_ids[self.collection_dropdown.get_selected()]
+
+    def _load_collections(self, select_id=None):
+        """Fill the collection dropdown, keeping or changing the selection."""
+        collections = self.collections.all()
+        self._collection_ids = [None] + [c.id for c in collections]
+        with self.collection_dropdown.handler_block(self._collection_handler):
+            self.collection_names.splice(0, self.collection_names.get_n_items(),
+                                         [_("All Recipes")] + [c.name for c in collections])
+            pos = self._collection_ids.index(select_id) if select_id in self._collection_ids else 0
+            self.collection_dropdown.set_selected(pos)
+        self._update_collection_actions()
+
+    def _update_collection_actions(self):
+        selected = self._collection_id is not None
+        for name in ("edit-collection", "delete-collection"):
+            action = self.lookup_action(name)
+            if action is not None:
+                action.set_enabled(selected)
+
+    def _on_collection_selected(self, dropdown, _pspec):
+        self._update_collection_actions()
+        if self.search_entry.get_text().strip():
+            # Clearing the search reloads the list
+            self.search_entry.set_text("")
+        else:
+            self._load_recipes()
+
+    def _on_new_collection(self, *args):
+        self._show_collection_dialog(None)
+
+    def _on_edit_collection(self, *args):
+        collection = self.collections.get(self._collection_id)
+        if collection is not None:
+            self._show_collection_dialog(collection)
+
+    def _show_collection_dialog(self, collection):
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=8)
+        name_entry = Gtk.Entry(placeholder_text=_("Name"),
+                               text=collection.name if collection else "")
+        box.append(name_entry)
+        expression_entry = Gtk.Entry(placeholder_text=_("Filter"),
+                                     text=collection.expression if collection else "")
+        box.append(expression_entry)
+        hint = Gtk.Label(label=_("For example: category:quick time<90, "
+                                 "tag:gluten-free favorite or rating>=4 name:rye"),
+                         xalign=0, wrap=True)
+        hint.add_css_class("dim-label")
+        box.append(hint)
+
+        dialog = Adw.AlertDialog(
+            heading=_("Edit Collection") if collection else _("New Smart Collection"),
+            extra_child=box,
+        )
+        dialog.add_response("cancel", _("Cancel"))
+        dialog.add_response("save", _("Save"))
+        dialog.set_response_appearance("save", Adw.ResponseAppearance.SUGGESTED)
+        dialog.set_default_response("save")
+        dialog.connect("response", self._on_collection_response, collection,
+                       name_entry, expression_entry)
+        dialog.present(self)
+
+    def _on_collection_response(self, dialog, response, collection, name_entry,
+                                expression_entry):
+        if response != "save":
+            return
+        try:
+            saved = self.collections.save(name_entry.get_text(), expression_entry.get_text(),
+                                          collection.id if collection else None)
+        except CollectionError as e:
+            self.toasts.add_toast(Adw.Toast(
+                title=_("Couldn't save the collection: {error}").format(error=e)))
+            return
+        self._load_collections(select_id=saved.id)
+        self._load_recipes()
+
+    def _on_delete_collection(self, *args):
+        collection = self.collections.get(self._collection_id)
+        if collection is None:
+            return
+        dialog = Adw.AlertDialog(
+            heading=_("Delete Collection"),
+            body=_("Delete '{name}'? Its recipes are kept.").format(name=collection.name),
+        )
+        dialog.add_response("cancel", _("Cancel"))
+        dialog.add_response("delete", _("Delete"))
+        dialog.set_response_appearance("delete", Adw.ResponseAppearance.DESTRUCTIVE)
+        dialog.set_default_response("cancel")
+        dialog.connect("response", self._on_delete_collection_response, collection.id)
+        dialog.present(self)
+
+    def _on_delete_collection_response(self, dialog, response, collection_id):
+        if response == "delete" and self.collections.delete(collection_id):
+            self._load_collections()
+            self._load_recipes()
 
     def _on_filter_favorites(self, btn):
         self._filter_favorites = btn.get_active()
@@ -0,0 +1,112 @@
+"""Background prefetching of recipes the user is likely to open next."""
+
+import queue
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from makebread.models.database import get_connection, get_connection_path
+from makebread.models.recipe import Recipe, RecipeStore
+from makebread.ui.settings_dialog import get_settings
+from makebread.utils.conversion_cache import ConversionCache
+from makebread.utils.similarity import SimilarRecipes
+
+
+class RecipePrefetcher:
+    """
+    Loads recipes on a worker thread into a small LRU cache, and converts
+    their ingredients ahead of time, so selecting them shows instantly.
+    Their similar recipes are loaded and cached alongside.
+    """
+
+    def __init__(self, store: RecipeStore, conversions: ConversionCache, max_entries: int = 32):
+        self._db_path = get_connection_path(store.conn)
+        self._conversions = conversions
+        self._max_entries = max_entries
+        self._cache: "OrderedDict[int, Recipe]" = OrderedDict()
+        # recipe id -> [(id, name, score)] of its similar recipes
+        self._neighbours: "OrderedDict[int, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[list[int]]" = queue.Queue()
+        self._thread = None
+
+    def get(self, recipe_id: int, revision: Optional[int] = None) -> Optional[Recipe]:
+        """A prefetched recipe, if cached (and at the given revision)."""
+        with self._lock:
+            recipe = self._cache.get(recipe_id)
+            if recipe is None or (revision is not None and recipe.revision != revision):
+                return None
+            self._cache.move_to_end(recipe_id)
+            return recipe
+
+    def neighbours(self, recipe_id: int) -> Optional[list]:
+        """The cached similar recipes of a recipe, if any."""
+        with self._lock:
+            neighbours = self._neighbours.get(recipe_id)
+            if neighbours is not None:
+                self._neighbours.move_to_end(recipe_id)
+            return neighbours
+
+    def set_neighbours(self, recipe_id: int, neighbours: list) -> None:
+        """Cache similar recipes looked up elsewhere, e.g. for a recipe not prefetched."""
+        with self._lock:
+            self._put(self._neighbours, recipe_id, neighbours)
+
+    def prefetch(self, recipe_ids: Iterable[int]) -> None:
+        """Queue recipes for loading; replaces any batch not yet started."""
+        if self._db_path is None:
+            # In-memory databases can't be opened from another thread
+            return
+        with self._lock:
+            ids = [rid for rid in dict.fromkeys(recipe_ids) if rid not in self._cache]
+        if not ids:
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name="makebread-prefetch",
+                                            daemon=True)
+            self._thread.start()
+        self._queue.put(ids)
+
+    def invalidate(self, recipe_id: int) -> None:
+        with self._lock:
+            self._cache.pop(recipe_id, None)
+            # Any list may name or link to the changed recipe
+            self._neighbours.clear()
+
+    def invalidate_neighbours(self) -> None:
+        """Drop cached similar recipes, after they were recomputed."""
+        with self._lock:
+            self._neighbours.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._neighbours.clear()
+
+    def _put(self, cache: OrderedDict, key: int, value) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self._max_entries:
+            cache.popitem(last=False)
+
+    def _worker(self) -> None:
+        store = RecipeStore(get_connection(self._db_path))
+        similar = SimilarRecipes(store.conn)
+        while True:
+            ids = self._queue.get()
+            # Only the newest batch matters once the selection has moved on
+            while not self._queue.empty():
+                ids = self._queue.get_nowait()
+            settings = get_settings()
+            for rid in ids:
+                if not self._queue.empty():
+                    break
+                recipe = store.get(rid)
+                if recipe is None:
+                    continue
+                if settings["auto_convert_units"]:
+                    self._conversions.lines(recipe, settings["unit_system"])
+                neighbours = similar.neighbours(rid)
+                with self._lock:
+                    self._put(self._cache, rid, recipe)
+                    self._put(self._neighbours, rid, neighbours)
@@ -1,8 +1,40 @@
-"""Print recipe — stub for GTK4 (printing deferred)."""
+"""Print a recipe with the PDF layout engine."""
+
+import gi
+gi.require_version("Gtk", "4.0")
+from gi.repository import Gtk
 
 from makebread.models.recipe import Recipe
+from makebread.utils.pdf_export import PageGeometry, Paginator, Renderer
+from makebread.utils.thumbnails import ThumbnailCache
+
+# The print context is already the printable area; keep a small inset
+PRINT_MARGIN = 18.0
 
 
 def print_recipe(recipe: Recipe, parent=None):
-    """Placeholder — GTK4 printing to be implemented."""
-    pass
+    """Show the print dialog for a recipe, paginated like the PDF export."""
+    op = Gtk.PrintOperation()
+    op.set_job_name(recipe.name)
+    op.set_unit(Gtk.Unit.POINTS)
+    state = {}
+
+    def on_begin_print(op, context):
+        page = PageGeometry(context.get_width(), context.get_height(), PRINT_MARGIN)
+        renderer = Renderer(context.get_cairo_context(), page)
+        paginator = Paginator(None, page, ThumbnailCache())
+        blocks = paginator.blocks(recipe)
+        state["renderer"] = renderer
+        state["blocks"] = blocks
+        state["pages"] = renderer.layouter.paginate(blocks)
+        op.set_n_pages(len(state["pages"]))
+
+    def on_draw_page(op, context, page_nr):
+        renderer = state["renderer"]
+        renderer.cr = context.get_cairo_context()
+        renderer.draw_page(state["blocks"], state["pages"][page_nr])
+        renderer.draw_footer(recipe.name, page_nr + 1)
+
+    op.connect("begin-print", on_begin_print)
+    op.connect("draw-page", on_draw_page)
+    return op.run(Gtk.PrintOperationAction.PRINT_DIALOG, parent)
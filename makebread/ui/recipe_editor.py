@@ -3,10 +3,11 @@
 import gi
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
-from gi.repository import Adw, Gtk, GObject
+from gi.repository import Adw, Gio, GLib, Gtk, GObject
 
 from makebread.i18n import _
 from makebread.models.recipe import Recipe, Ingredient, Instruction
+from makebread.utils.importer import parse_ingredient_lines
 
 
 CATEGORIES = [
@@ -25,27 +26,115 @@ PROGRAMS = [
 
 CRUST_SETTINGS = ["light", "medium", "dark"]
 
+# Recipe fields the editor has no rows for; saving keeps the stored values
+KEPT_FIELDS = ("id", "version", "revision", "favorite", "rating", "times_made", "source_name",
+               "prep_time_min", "total_time_min", "image_path")
+
+
+class IngredientItem(GObject.Object):
+    """An ingredient being edited."""
+    __gtype_name__ = "MakeBreadIngredientItem"
+
+    amount = GObject.Property(type=str, default="")
+    unit = GObject.Property(type=str, default="")
+    name = GObject.Property(type=str, default="")
+    group_name = GObject.Property(type=str, default="")
+
+
+class StepItem(GObject.Object):
+    """An instruction step being edited."""
+    __gtype_name__ = "MakeBreadStepItem"
+
+    text = GObject.Property(type=str, default="")
+
+
+class EditableRow(Gtk.Box):
+    """
+    A row of entries bound to an item's string properties, recycled by the
+    list view: edits are written straight back to the item.
+    """
+
+    def __init__(self, on_remove, on_edited):
+        super().__init__(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        self.set_margin_top(4)
+        self.set_margin_bottom(4)
+        self.set_margin_start(8)
+        self.set_margin_end(8)
+        self.item = None
+        self._fields = []
+        self._on_edited = on_edited
+        self._rm_btn = Gtk.Button(icon_name="list-remove-symbolic", valign=Gtk.Align.CENTER)
+        self._rm_btn.add_css_class("flat")
+        self._rm_btn.connect("clicked", lambda *_: self.item and on_remove(self.item))
+
+    def add_field(self, prop: str, entry: Gtk.Entry):
+        entry.set_valign(Gtk.Align.CENTER)
+        entry.connect("changed", self._on_changed, prop)
+        self._fields.append((prop, entry))
+        self.append(entry)
+
+    def finish(self):
+        self.append(self._rm_btn)
+
+    def bind(self, item):
+        # Detach first, so loading the entries doesn't write back
+        self.item = None
+        for prop, entry in self._fields:
+            entry.set_text(item.get_property(prop))
+        self.item = item
+
+    def unbind(self):
+        self.item = None
+
+    def _on_changed(self, entry, prop):
+        if self.item is not None:
+            self.item.set_property(prop, entry.get_text())
+            self._on_edited()
+
+
+# Edits are gathered for this long before a draft is handed to the journal
+DRAFT_DELAY_MS = 500
+
 
 class RecipeEditorDialog(Adw.Dialog):
+    """
+    Edits a recipe. Unsaved changes are kept as a draft in the window's
+    DraftJournal until the recipe is saved; pass draft to resume one.
+    """
     __gsignals__ = {
         "saved": (GObject.SignalFlags.RUN_LAST, None, (int,)),
     }
 
-    def __init__(self, window, recipe: Recipe = None):
+    def __init__(self, window, recipe: Recipe = None, draft: Recipe = None):
         super().__init__()
         self.window = window
         self.store = window.store
+        self.journal = window.drafts
         self.recipe = recipe
+        # What the pages are filled from: the draft if resuming one
+        self._source = draft or recipe
+        self._draft_timer = 0
         self.set_title(_("Edit Recipe") if recipe else _("New Recipe"))
         self.set_content_width(650)
         self.set_content_height(600)
 
-        self._ingredient_rows = []
-        self._instruction_rows = []
-
+        # Ingredients and steps live in models; their pages only show them
+        self.ingredients = Gio.ListStore(item_type=IngredientItem)
+        self.steps = Gio.ListStore(item_type=StepItem)
+        source = self._source
+        if source:
+            self.ingredients.splice(0, 0, [
+                IngredientItem(amount=i.amount, unit=i.unit, name=i.name,
+                               group_name=i.group_name)
+                for i in source.ingredients])
+            self.steps.splice(0, 0, [StepItem(text=i.text) for i in source.instructions])
+        self.ingredients.connect("items-changed", lambda *_: self._on_edited())
+        self.steps.connect("items-changed", lambda *_: self._on_edited())
+
+        self._pages = {}
+        self._built = set()
         self._setup_ui()
-        if recipe:
-            self._populate(recipe)
+        self.connect("closed", self._on_closed)
 
     def _setup_ui(self):
         toolbarview = Adw.ToolbarView()
@@ -53,7 +142,7 @@ class RecipeEditorDialog(Adw.Dialog):
         # Header
         header = Adw.HeaderBar()
         cancel_btn = Gtk.Button(label=_("Cancel"))
-        cancel_btn.connect("clicked", lambda *_: self.close())
+        cancel_btn.connect("clicked", self._on_cancel)
         header.pack_start(cancel_btn)
 
         save_btn = Gtk.Button(label=_("Save"))
@@ -63,24 +152,21 @@ class RecipeEditorDialog(Adw.Dialog):
 
         toolbarview.add_top_bar(header)
 
-        # Notebook (ViewStack)
+        # Notebook (ViewStack); each page is built the first time it is shown
         stack = Adw.ViewStack()
-
-        # --- Basic Info page ---
-        basic_page = self._build_basic_page()
-        stack.add_titled(basic_page, "basic", _("Basic Info"))
-
-        # --- Ingredients page ---
-        ing_page = self._build_ingredients_page()
-        stack.add_titled(ing_page, "ingredients", _("Ingredients"))
-
-        # --- Instructions page ---
-        inst_page = self._build_instructions_page()
-        stack.add_titled(inst_page, "instructions", _("Instructions"))
-
-        # --- Notes page ---
-        notes_page = self._build_notes_page()
-        stack.add_titled(notes_page, "notes", _("Notes"))
+        pages = (
+            ("basic", _("Basic Info"), self._build_basic_page),
+            ("ingredients", _("Ingredients"), self._build_ingredients_page),
+            ("instructions", _("Instructions"), self._build_instructions_page),
+            ("notes", _("Notes"), self._build_notes_page),
+        )
+        for name, title, builder in pages:
+            holder = Adw.Bin()
+            stack.add_titled(holder, name, title)
+            self._pages[name] = (holder, builder)
+        stack.connect("notify::visible-child-name",
+                      lambda s, _p: self._ensure_page(s.get_visible_child_name()))
+        self._ensure_page(stack.get_visible_child_name() or "basic")
 
         # Switcher bar
         switcher = Adw.ViewSwitcherBar(stack=stack, reveal=True)
@@ -92,6 +178,13 @@ class RecipeEditorDialog(Adw.Dialog):
         toolbarview.set_content(main_box)
         self.set_child(toolbarview)
 
+    def _ensure_page(self, name):
+        if name in self._built or name not in self._pages:
+            return
+        holder, builder = self._pages[name]
+        holder.set_child(builder())
+        self._built.add(name)
+
     def _build_basic_page(self):
         scrolled = Gtk.ScrolledWindow(vexpand=True)
         clamp = Adw.Clamp(maximum_size=600)
@@ -145,107 +238,120 @@ class RecipeEditorDialog(Adw.Dialog):
 
         clamp.set_child(group)
         scrolled.set_child(clamp)
+        if self._source:
+            self._populate_basic(self._source)
+        for row in (self.name_row, self.desc_row, self.brand_row, self.model_row,
+                    self.author_row, self.source_row, self.tags_row):
+            row.connect("changed", lambda *_: self._on_edited())
+        for row in (self.category_row, self.loaf_row, self.program_row, self.crust_row):
+            row.connect("notify::selected", lambda *_: self._on_edited())
         return scrolled
 
-    def _build_ingredients_page(self):
-        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
-
+    def _make_list(self, model, setup):
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", setup)
+        factory.connect("bind", lambda f, li: li.get_child().bind(li.get_item()))
+        factory.connect("unbind", lambda f, li: li.get_child().unbind())
+        view = Gtk.ListView(model=Gtk.NoSelection(model=model), factory=factory)
+        view.add_css_class("card")
+        view.set_margin_start(12)
+        view.set_margin_end(12)
+        view.set_margin_top(12)
         scrolled = Gtk.ScrolledWindow(vexpand=True)
-        self.ing_list = Gtk.ListBox(selection_mode=Gtk.SelectionMode.NONE)
-        self.ing_list.add_css_class("boxed-list")
-        self.ing_list.set_margin_start(12)
-        self.ing_list.set_margin_end(12)
-        self.ing_list.set_margin_top(12)
-        scrolled.set_child(self.ing_list)
-        box.append(scrolled)
+        scrolled.set_child(view)
+        return scrolled, view
 
+    def _make_buttons(self, *buttons):
         btn_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8,
                           halign=Gtk.Align.CENTER)
         btn_box.set_margin_top(8)
         btn_box.set_margin_bottom(8)
+        for label, callback in buttons:
+            btn = Gtk.Button(label=label)
+            btn.connect("clicked", lambda *_, cb=callback: cb())
+            btn_box.append(btn)
+        return btn_box
 
-        add_btn = Gtk.Button(label=_("+ Add Ingredient"))
-        add_btn.connect("clicked", lambda *_: self._add_ingredient_row())
-        btn_box.append(add_btn)
-
-        box.append(btn_box)
+    def _build_ingredients_page(self):
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
+        scrolled, self.ing_list = self._make_list(self.ingredients, self._setup_ingredient_row)
+        box.append(scrolled)
+        box.append(self._make_buttons(
+            (_("+ Add Ingredient"), self._add_ingredient),
+            (_("Paste Ingredients…"), self._on_paste_ingredients),
+        ))
         return box
 
-    def _add_ingredient_row(self, amount="", unit="", name="", group=""):
-        row = Adw.ActionRow(title=name or _("New ingredient"))
-        
-        # Amount
-        amount_entry = Gtk.Entry(placeholder_text=_("Amount"), text=amount, width_chars=6)
-        amount_entry.set_valign(Gtk.Align.CENTER)
-        row.add_prefix(amount_entry)
-
-        # Unit
-        unit_entry = Gtk.Entry(placeholder_text=_("Unit"), text=unit, width_chars=6)
-        unit_entry.set_valign(Gtk.Align.CENTER)
-        row.add_prefix(unit_entry)
-
-        # Name
-        name_entry = Gtk.Entry(placeholder_text=_("Ingredient"), text=name, hexpand=True)
-        name_entry.set_valign(Gtk.Align.CENTER)
-        name_entry.connect("changed", lambda e: row.set_title(e.get_text() or _("New ingredient")))
-        row.add_suffix(name_entry)
-
-        # Remove button
-        rm_btn = Gtk.Button(icon_name="list-remove-symbolic", valign=Gtk.Align.CENTER)
-        rm_btn.add_css_class("flat")
-        rm_btn.connect("clicked", lambda *_: self._remove_ing_row(row))
-        row.add_suffix(rm_btn)
-
-        self.ing_list.append(row)
-        self._ingredient_rows.append((row, amount_entry, unit_entry, name_entry))
-
-    def _remove_ing_row(self, row):
-        self._ingredient_rows = [(r, a, u, n) for r, a, u, n in self._ingredient_rows if r != row]
-        self.ing_list.remove(row)
+    def _setup_ingredient_row(self, factory, list_item):
+        list_item.set_activatable(False)
+        row = EditableRow(lambda item: self._remove_item(self.ingredients, item),
+                          self._on_edited)
+        row.add_field("amount", Gtk.Entry(placeholder_text=_("Amount"), width_chars=6))
+        row.add_field("unit", Gtk.Entry(placeholder_text=_("Unit"), width_chars=6))
+        row.add_field("name", Gtk.Entry(placeholder_text=_("Ingredient"), hexpand=True))
+        row.finish()
+        list_item.set_child(row)
+
+    def _add_ingredient(self):
+        self.ingredients.append(IngredientItem())
+        self.ing_list.scroll_to(self.ingredients.get_n_items() - 1,
+                                Gtk.ListScrollFlags.FOCUS, None)
+
+    def _remove_item(self, model, item):
+        found, pos = model.find(item)
+        if found:
+            model.remove(pos)
+
+    def _on_paste_ingredients(self):
+        dialog = Adw.AlertDialog(
+            heading=_("Paste Ingredients"),
+            body=_("One ingredient per line, e.g. “1 1/2 cups bread flour”."),
+        )
+        text_view = Gtk.TextView(wrap_mode=Gtk.WrapMode.WORD, monospace=True)
+        scrolled = Gtk.ScrolledWindow(min_content_height=200, min_content_width=360)
+        scrolled.set_child(text_view)
+        dialog.set_extra_child(scrolled)
+        dialog.add_response("cancel", _("Cancel"))
+        dialog.add_response("add", _("Add"))
+        dialog.set_response_appearance("add", Adw.ResponseAppearance.SUGGESTED)
+        dialog.set_default_response("add")
+        dialog.connect("response", self._on_paste_response, text_view.get_buffer())
+        dialog.present(self)
+
+    def _on_paste_response(self, dialog, response, buf):
+        if response != "add":
+            return
+        text = buf.get_text(buf.get_start_iter(), buf.get_end_iter(), False)
+        items = [IngredientItem(amount=i.amount, unit=i.unit, name=i.name,
+                                group_name=i.group_name)
+                 for i in parse_ingredient_lines(text)]
+        if items:
+            self.ingredients.splice(self.ingredients.get_n_items(), 0, items)
 
     def _build_instructions_page(self):
         box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
-
-        scrolled = Gtk.ScrolledWindow(vexpand=True)
-        self.inst_list = Gtk.ListBox(selection_mode=Gtk.SelectionMode.NONE)
-        self.inst_list.add_css_class("boxed-list")
-        self.inst_list.set_margin_start(12)
-        self.inst_list.set_margin_end(12)
-        self.inst_list.set_margin_top(12)
-        scrolled.set_child(self.inst_list)
+        scrolled, self.inst_list = self._make_list(self.steps, self._setup_step_row)
         box.append(scrolled)
-
-        btn_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8,
-                          halign=Gtk.Align.CENTER)
-        btn_box.set_margin_top(8)
-        btn_box.set_margin_bottom(8)
-
-        add_btn = Gtk.Button(label=_("+ Add Step"))
-        add_btn.connect("clicked", lambda *_: self._add_instruction_row())
-        btn_box.append(add_btn)
-
-        box.append(btn_box)
+        box.append(self._make_buttons((_("+ Add Step"), self._add_step)))
         return box
 
-    def _add_instruction_row(self, text=""):
-        step_num = len(self._instruction_rows) + 1
-        row = Adw.ActionRow(title=f"{_('Step')} {step_num}")
-
-        text_entry = Gtk.Entry(placeholder_text=_("Instruction"), text=text, hexpand=True)
-        text_entry.set_valign(Gtk.Align.CENTER)
-        row.add_suffix(text_entry)
-
-        rm_btn = Gtk.Button(icon_name="list-remove-symbolic", valign=Gtk.Align.CENTER)
-        rm_btn.add_css_class("flat")
-        rm_btn.connect("clicked", lambda *_: self._remove_inst_row(row))
-        row.add_suffix(rm_btn)
-
-        self.inst_list.append(row)
-        self._instruction_rows.append((row, text_entry))
-
-    def _remove_inst_row(self, row):
-        self._instruction_rows = [(r, t) for r, t in self._instruction_rows if r != row]
-        self.inst_list.remove(row)
+    def _setup_step_row(self, factory, list_item):
+        list_item.set_activatable(False)
+        row = EditableRow(lambda item: self._remove_item(self.steps, item), self._on_edited)
+        number = Gtk.Label(width_chars=8, xalign=0)
+        number.add_css_class("dim-label")
+        row.append(number)
+        row.add_field("text", Gtk.Entry(placeholder_text=_("Instruction"), hexpand=True))
+        row.finish()
+        # Step numbers follow the position, which changes as steps are removed
+        list_item.connect("notify::position", lambda li, _p: number.set_label(
+            f"{_('Step')} {li.get_position() + 1}"))
+        list_item.set_child(row)
+
+    def _add_step(self):
+        self.steps.append(StepItem())
+        self.inst_list.scroll_to(self.steps.get_n_items() - 1,
+                                 Gtk.ListScrollFlags.FOCUS, None)
 
     def _build_notes_page(self):
         scrolled = Gtk.ScrolledWindow(vexpand=True)
@@ -254,10 +360,13 @@ class RecipeEditorDialog(Adw.Dialog):
         self.notes_view.set_margin_end(12)
         self.notes_view.set_margin_top(12)
         self.notes_view.set_margin_bottom(12)
+        if self._source:
+            self.notes_view.get_buffer().set_text(self._source.notes)
+        self.notes_view.get_buffer().connect("changed", lambda *_: self._on_edited())
         scrolled.set_child(self.notes_view)
         return scrolled
 
-    def _populate(self, r: Recipe):
+    def _populate_basic(self, r: Recipe):
         self.name_row.set_text(r.name)
         self.desc_row.set_text(r.description)
 
@@ -288,24 +397,42 @@ class RecipeEditorDialog(Adw.Dialog):
         self.author_row.set_text(r.author)
         self.source_row.set_text(r.source_url)
         self.tags_row.set_text(", ".join(r.tags))
-        self.notes_view.get_buffer().set_text(r.notes)
 
-        for ing in r.ingredients:
-            self._add_ingredient_row(ing.amount, ing.unit, ing.name, ing.group_name)
+    def _on_edited(self):
+        if self._draft_timer == 0:
+            self._draft_timer = GLib.timeout_add(DRAFT_DELAY_MS, self._write_draft)
 
-        for inst in r.instructions:
-            self._add_instruction_row(inst.text)
+    def _write_draft(self):
+        self._draft_timer = 0
+        self.journal.update(self.recipe.id if self.recipe else None, self._collect())
+        return GLib.SOURCE_REMOVE
 
-    def _on_save(self, *args):
-        name = self.name_row.get_text().strip()
-        if not name:
-            return
+    def _cancel_draft_timer(self):
+        if self._draft_timer:
+            GLib.source_remove(self._draft_timer)
+            self._draft_timer = 0
+
+    def _on_cancel(self, *args):
+        self._cancel_draft_timer()
+        self.journal.discard(self.recipe.id if self.recipe else None)
+        self.close()
 
+    def _on_closed(self, *args):
+        # Closed without saving or cancelling: keep the latest edits
+        if self._draft_timer:
+            self._cancel_draft_timer()
+            self._write_draft()
+
+    def _collect(self) -> Recipe:
+        """The recipe as currently entered in the editor."""
         tags_text = self.tags_row.get_text().strip()
         tags = [t.strip() for t in tags_text.split(",") if t.strip()] if tags_text else []
 
-        buf = self.notes_view.get_buffer()
-        notes = buf.get_text(buf.get_start_iter(), buf.get_end_iter(), False)
+        if "notes" in self._built:
+            buf = self.notes_view.get_buffer()
+            notes = buf.get_text(buf.get_start_iter(), buf.get_end_iter(), False)
+        else:
+            notes = self._source.notes if self._source else ""
 
         def get_combo_text(combo_row, options):
             idx = combo_row.get_selected()
@@ -314,7 +441,7 @@ class RecipeEditorDialog(Adw.Dialog):
             return options[0] if options else ""
 
         recipe = Recipe(
-            name=name,
+            name=self.name_row.get_text().strip(),
             description=self.desc_row.get_text().strip(),
             category=get_combo_text(self.category_row, CATEGORIES),
             loaf_size=get_combo_text(self.loaf_row, LOAF_SIZES),
@@ -328,28 +455,38 @@ class RecipeEditorDialog(Adw.Dialog):
             tags=tags,
         )
         if self.recipe:
-            recipe.id = self.recipe.id
-            recipe.favorite = self.recipe.favorite
+            for attr in KEPT_FIELDS:
+                setattr(recipe, attr, getattr(self.recipe, attr))
 
         # Ingredients
-        for row, amount_e, unit_e, name_e in self._ingredient_rows:
-            ing_name = name_e.get_text().strip()
+        for item in self.ingredients:
+            ing_name = item.name.strip()
             if not ing_name:
                 continue
             recipe.ingredients.append(Ingredient(
-                amount=amount_e.get_text().strip(),
-                unit=unit_e.get_text().strip(),
+                amount=item.amount.strip(),
+                unit=item.unit.strip(),
                 name=ing_name,
+                group_name=item.group_name,
                 sort_order=len(recipe.ingredients),
             ))
 
         # Instructions
-        for i, (row, text_e) in enumerate(self._instruction_rows):
-            text = text_e.get_text().strip()
+        for item in self.steps:
+            text = item.text.strip()
             if not text:
                 continue
-            recipe.instructions.append(Instruction(step_number=i + 1, text=text))
+            # Numbered among the kept steps, so blank ones leave no gaps
+            recipe.instructions.append(Instruction(step_number=len(recipe.instructions) + 1,
+                                                   text=text))
+        return recipe
 
+    def _on_save(self, *args):
+        recipe = self._collect()
+        if not recipe.name:
+            return
+        self._cancel_draft_timer()
         rid = self.store.save(recipe)
+        self.journal.discard(self.recipe.id if self.recipe else None)
         self.emit("saved", rid)
         self.close()
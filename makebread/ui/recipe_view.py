@@ -3,18 +3,133 @@
 import gi
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
-from gi.repository import Gtk, Pango
+from gi.repository import Adw, GLib, GObject, Gtk, Pango
 
 from makebread.i18n import _
 from makebread.models.recipe import Recipe
-from makebread.utils.units import SYSTEM_US
+from makebread.ui.prefetch import RecipePrefetcher
+from makebread.ui.settings_dialog import get_settings
+from makebread.ui.thumbnails import VIEW_SIZE, ThumbnailLoader
+from makebread.utils.conversion_cache import ConversionCache, IngredientLine
+from makebread.utils.similarity import SimilarRecipes
 
+# Sections longer than this are shown in a virtualized list instead of labels
+LONG_SECTION = 80
 
-class RecipeViewWidget(Gtk.ScrolledWindow):
-    """Displays a recipe using native GTK4 widgets."""
+
+class LinePool:
+    """
+    A box of labels that are reused across recipes: showing new lines
+    updates existing labels in place and only creates labels when a recipe
+    has more lines than any shown before.
+    """
+
+    def __init__(self, box: Gtk.Box):
+        self.box = box
+        self.labels: list[Gtk.Label] = []
+
+    def set_lines(self, lines):
+        """Show lines given as (text, use_markup, is_heading) tuples."""
+        for i, (text, markup, heading) in enumerate(lines):
+            if i < len(self.labels):
+                lbl = self.labels[i]
+            else:
+                lbl = Gtk.Label(xalign=0, wrap=True)
+                self.box.append(lbl)
+                self.labels.append(lbl)
+            if markup:
+                lbl.set_markup(text)
+            else:
+                lbl.set_text(text)
+            if heading:
+                lbl.add_css_class("title-4")
+                lbl.set_margin_start(0)
+                lbl.set_margin_top(4)
+            else:
+                lbl.remove_css_class("title-4")
+                lbl.set_margin_start(8)
+                lbl.set_margin_top(0)
+            lbl.set_visible(True)
+        for lbl in self.labels[len(lines):]:
+            lbl.set_visible(False)
+
+
+class LineList(Gtk.ScrolledWindow):
+    """A model-backed, virtualized list of markup lines for very long sections."""
 
     def __init__(self):
+        super().__init__(propagate_natural_height=True, max_content_height=480)
+        self.model = Gtk.StringList()
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self._on_setup)
+        factory.connect("bind", self._on_bind)
+        view = Gtk.ListView(model=Gtk.NoSelection(model=self.model), factory=factory)
+        self.set_child(view)
+
+    def _on_setup(self, factory, list_item):
+        lbl = Gtk.Label(xalign=0, wrap=True)
+        lbl.set_margin_start(8)
+        list_item.set_child(lbl)
+
+    def _on_bind(self, factory, list_item):
+        list_item.get_child().set_markup(list_item.get_item().get_string())
+
+    def set_lines(self, lines):
+        markup = []
+        for text, is_markup, heading in lines:
+            text = text if is_markup else GLib.markup_escape_text(text)
+            markup.append(f"<b>{text}</b>" if heading else text)
+        self.model.splice(0, self.model.get_n_items(), markup)
+
+
+class Section:
+    """A titled list of lines, shown with pooled labels or a LineList when long."""
+
+    def __init__(self, content: Gtk.Box, title: str):
+        self.title = Gtk.Label(label=title, xalign=0)
+        self.title.add_css_class("title-3")
+        self.title.set_margin_top(8)
+        content.append(self.title)
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
+        content.append(box)
+        self.pool = LinePool(box)
+        self.long_list = None
+        self._content = content
+        self._box = box
+
+    def set_lines(self, lines):
+        self.title.set_visible(bool(lines))
+        if len(lines) > LONG_SECTION:
+            if self.long_list is None:
+                self.long_list = LineList()
+                self._content.insert_child_after(self.long_list, self._box)
+            self.long_list.set_lines(lines)
+            self.long_list.set_visible(True)
+            self.pool.set_lines([])
+        else:
+            if self.long_list is not None:
+                self.long_list.set_visible(False)
+            self.pool.set_lines(lines)
+
+
+class RecipeViewWidget(Gtk.ScrolledWindow):
+    """Displays a recipe using native GTK4 widgets, updated in place."""
+
+    __gsignals__ = {
+        # A recipe in the similar recipes panel was clicked
+        "recipe-activated": (GObject.SignalFlags.RUN_FIRST, None, (int,)),
+    }
+
+    def __init__(self, conversions: ConversionCache = None,
+                 thumbnails: ThumbnailLoader = None, plugins=None,
+                 similar: SimilarRecipes = None, prefetcher: RecipePrefetcher = None):
         super().__init__(vexpand=True, hexpand=True)
+        self.plugins = plugins
+        self.similar = similar
+        self.prefetcher = prefetcher
+        self.conversions = conversions or ConversionCache()
+        self.thumbnails = thumbnails
+        self.recipe = None
         self.clamp = Adw.Clamp(maximum_size=700)
         self.clamp.set_margin_start(16)
         self.clamp.set_margin_end(16)
@@ -25,41 +140,168 @@ class RecipeViewWidget(Gtk.ScrolledWindow):
         self.clamp.set_child(self.content)
         self.set_child(self.clamp)
 
-        # Placeholder
+        self._build()
         self._show_placeholder()
 
-    def _show_placeholder(self):
-        self._clear()
-        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=8,
-                      valign=Gtk.Align.CENTER, vexpand=True)
+    def _build(self):
+        """Create the widgets once; show_recipe only updates them."""
+        # Placeholder
+        self.placeholder = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=8,
+                                   valign=Gtk.Align.CENTER, vexpand=True)
         icon = Gtk.Label(label="🍞")
         icon.add_css_class("title-1")
-        box.append(icon)
+        self.placeholder.append(icon)
         label = Gtk.Label(label=_("Select a recipe from the list, or add a new one."))
         label.add_css_class("dim-label")
-        box.append(label)
-        self.content.append(box)
+        self.placeholder.append(label)
+        self.content.append(self.placeholder)
 
-    def _clear(self):
-        while True:
-            child = self.content.get_first_child()
-            if child is None:
-                break
-            self.content.remove(child)
+        self.recipe_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
+        self.content.append(self.recipe_box)
 
-    def show_recipe(self, recipe: Recipe):
-        self._clear()
+        self.photo = Gtk.Picture(content_fit=Gtk.ContentFit.COVER, height_request=240)
+        self.photo.add_css_class("card")
+        self.photo.set_overflow(Gtk.Overflow.HIDDEN)
+        self.photo.set_visible(False)
+        self.recipe_box.append(self.photo)
+
+        self.title = Gtk.Label(xalign=0, wrap=True)
+        self.title.add_css_class("title-1")
+        self.recipe_box.append(self.title)
+
+        self.desc = Gtk.Label(xalign=0, wrap=True)
+        self.desc.add_css_class("dim-label")
+        self.recipe_box.append(self.desc)
+
+        self.meta = Gtk.Label(xalign=0, wrap=True)
+        self.meta.add_css_class("dim-label")
+        self.recipe_box.append(self.meta)
+
+        self.tags_box = Gtk.FlowBox(selection_mode=Gtk.SelectionMode.NONE,
+                                    max_children_per_line=10)
+        self.tags_box.set_margin_top(4)
+        self.recipe_box.append(self.tags_box)
+        self._tag_chips: list[Gtk.Label] = []
+
+        self.ingredients = Section(self.recipe_box, _("Ingredients"))
+        self.instructions = Section(self.recipe_box, _("Instructions"))
+
+        self.notes_title = Gtk.Label(label=_("Notes"), xalign=0)
+        self.notes_title.add_css_class("title-3")
+        self.notes_title.set_margin_top(8)
+        self.recipe_box.append(self.notes_title)
+        self.notes = Gtk.Label(xalign=0, wrap=True)
+        self.notes.set_margin_start(8)
+        self.recipe_box.append(self.notes)
+
+        # Sections added by render plugins
+        extras_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
+        self.recipe_box.append(extras_box)
+        self.extras = LinePool(extras_box)
 
-        # Title
-        title = Gtk.Label(label=recipe.name, xalign=0, wrap=True)
-        title.add_css_class("title-1")
-        self.content.append(title)
+        self.similar_title = Gtk.Label(label=_("Similar Recipes"), xalign=0)
+        self.similar_title.add_css_class("title-3")
+        self.similar_title.set_margin_top(8)
+        self.recipe_box.append(self.similar_title)
+        self.similar_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=2)
+        self.recipe_box.append(self.similar_box)
+        self._similar_buttons: list[Gtk.Button] = []
+        self._similar_ids: list[int] = []
 
-        # Description
-        if recipe.description:
-            desc = Gtk.Label(label=recipe.description, xalign=0, wrap=True)
-            desc.add_css_class("dim-label")
-            self.content.append(desc)
+        self.source = Gtk.Label(xalign=0, use_markup=True)
+        self.source.set_margin_top(8)
+        self.recipe_box.append(self.source)
+
+    def _show_placeholder(self):
+        self.recipe_box.set_visible(False)
+        self.placeholder.set_visible(True)
+
+    def _set_tags(self, tags: list[str]):
+        for i, tag in enumerate(tags):
+            if i < len(self._tag_chips):
+                chip = self._tag_chips[i]
+                chip.set_label(tag)
+            else:
+                chip = Gtk.Label(label=tag)
+                chip.add_css_class("caption")
+                chip.set_margin_start(4)
+                chip.set_margin_end(4)
+                self.tags_box.append(chip)
+                self._tag_chips.append(chip)
+            chip.get_parent().set_visible(True)
+        for chip in self._tag_chips[len(tags):]:
+            chip.get_parent().set_visible(False)
+        self.tags_box.set_visible(bool(tags))
+
+    def _set_photo(self, image_path: str):
+        self.photo.set_visible(False)
+        if not image_path or self.thumbnails is None:
+            return
+
+        def done(texture):
+            if texture is not None and self.recipe and self.recipe.image_path == image_path:
+                self.photo.set_paintable(texture)
+                self.photo.set_visible(True)
+
+        texture = self.thumbnails.request(image_path, VIEW_SIZE, done)
+        if texture is not None:
+            done(texture)
+
+    def _button_for(self, i: int) -> Gtk.Button:
+        if i < len(self._similar_buttons):
+            return self._similar_buttons[i]
+        button = Gtk.Button(has_frame=False, halign=Gtk.Align.START)
+        button.set_child(Gtk.Label(xalign=0, ellipsize=Pango.EllipsizeMode.END))
+        button.connect("clicked",
+                       lambda b: self.emit("recipe-activated", self._similar_ids[i]))
+        self.similar_box.append(button)
+        self._similar_buttons.append(button)
+        return button
+
+    def show_similar(self):
+        """Show the stored neighbours of the current recipe, prefetched where possible."""
+        neighbours = []
+        if self.similar is not None and self.recipe is not None and self.recipe.id:
+            rid = self.recipe.id
+            cached = self.prefetcher.neighbours(rid) if self.prefetcher is not None else None
+            if cached is not None:
+                neighbours = cached
+            else:
+                neighbours = self.similar.neighbours(rid)
+                if self.prefetcher is not None:
+                    self.prefetcher.set_neighbours(rid, neighbours)
+        self._similar_ids = [recipe_id for recipe_id, _name, _score in neighbours]
+        for i, (_recipe_id, name, score) in enumerate(neighbours):
+            button = self._button_for(i)
+            button.get_child().set_text(name)
+            button.set_tooltip_text(_("{percent}% similar ingredients").format(
+                percent=round(score * 100)))
+            button.set_visible(True)
+        for button in self._similar_buttons[len(neighbours):]:
+            button.set_visible(False)
+        self.similar_title.set_visible(bool(neighbours))
+
+    def refresh(self):
+        """Re-render the current recipe, e.g. after the unit system changed."""
+        if self.recipe is not None:
+            self.show_recipe(self.recipe)
+
+    def _ingredient_lines(self, recipe: Recipe):
+        settings = get_settings()
+        if settings["auto_convert_units"]:
+            return self.conversions.lines(recipe, settings["unit_system"])
+        return [IngredientLine(i.name, i.amount, i.unit, i.group_name)
+                for i in recipe.ingredients]
+
+    def show_recipe(self, recipe: Recipe):
+        self.recipe = recipe
+        self.placeholder.set_visible(False)
+        self.recipe_box.set_visible(True)
+
+        self._set_photo(recipe.image_path)
+        self.title.set_label(recipe.name)
+        self.desc.set_label(recipe.description)
+        self.desc.set_visible(bool(recipe.description))
 
         # Meta info
         meta_parts = []
@@ -74,81 +316,50 @@ class RecipeViewWidget(Gtk.ScrolledWindow):
             meta_parts.append(f"{_('Machine')}: {machine}")
         if recipe.category:
             meta_parts.append(f"{_('Category')}: {recipe.category}")
+        self.meta.set_label("  |  ".join(meta_parts))
+        self.meta.set_visible(bool(meta_parts))
 
-        if meta_parts:
-            meta_label = Gtk.Label(label="  |  ".join(meta_parts), xalign=0, wrap=True)
-            meta_label.add_css_class("dim-label")
-            self.content.append(meta_label)
-
-        # Tags
-        if recipe.tags:
-            tags_box = Gtk.FlowBox(selection_mode=Gtk.SelectionMode.NONE,
-                                    max_children_per_line=10)
-            tags_box.set_margin_top(4)
-            for tag in recipe.tags:
-                chip = Gtk.Label(label=tag)
-                chip.add_css_class("caption")
-                chip.set_margin_start(4)
-                chip.set_margin_end(4)
-                tags_box.append(chip)
-            self.content.append(tags_box)
-
-        # Ingredients
-        ing_title = Gtk.Label(label=_("Ingredients"), xalign=0)
-        ing_title.add_css_class("title-3")
-        ing_title.set_margin_top(8)
-        self.content.append(ing_title)
+        self._set_tags(recipe.tags)
 
+        # Ingredients, with group headings
+        lines = []
         current_group = None
-        for ing in recipe.ingredients:
+        for ing in self._ingredient_lines(recipe):
             if ing.group_name and ing.group_name != current_group:
                 current_group = ing.group_name
-                group_label = Gtk.Label(label=ing.group_name, xalign=0)
-                group_label.add_css_class("title-4")
-                group_label.set_margin_top(4)
-                self.content.append(group_label)
+                lines.append((ing.group_name, False, True))
             elif current_group is None:
                 current_group = ""
-
-            amount_str = f"{ing.amount} {ing.unit}".strip()
+            name = GLib.markup_escape_text(ing.name)
+            amount_str = ing.measure
             if amount_str:
-                text = f"• <b>{amount_str}</b>  {ing.name}"
+                text = f"• <b>{GLib.markup_escape_text(amount_str)}</b>  {name}"
             else:
-                text = f"• {ing.name}"
-            lbl = Gtk.Label(xalign=0, use_markup=True, label=text, wrap=True)
-            lbl.set_margin_start(8)
-            self.content.append(lbl)
-
-        # Instructions
-        inst_title = Gtk.Label(label=_("Instructions"), xalign=0)
-        inst_title.add_css_class("title-3")
-        inst_title.set_margin_top(8)
-        self.content.append(inst_title)
-
-        for inst in recipe.instructions:
-            text = f"{inst.step_number}. {inst.text}"
-            lbl = Gtk.Label(label=text, xalign=0, wrap=True)
-            lbl.set_margin_start(8)
-            self.content.append(lbl)
-
-        # Notes
-        if recipe.notes:
-            notes_title = Gtk.Label(label=_("Notes"), xalign=0)
-            notes_title.add_css_class("title-3")
-            notes_title.set_margin_top(8)
-            self.content.append(notes_title)
-            notes_lbl = Gtk.Label(label=recipe.notes, xalign=0, wrap=True)
-            notes_lbl.set_margin_start(8)
-            self.content.append(notes_lbl)
-
-        # Source
-        if recipe.source_url:
-            src_text = recipe.source_name or recipe.source_url
-            src_lbl = Gtk.Label(xalign=0, use_markup=True,
-                                label=f'<a href="{recipe.source_url}">{src_text}</a>')
-            src_lbl.set_margin_top(8)
-            self.content.append(src_lbl)
+                text = f"• {name}"
+            lines.append((text, True, False))
+        self.ingredients.set_lines(lines)
 
+        self.instructions.set_lines([(f"{inst.step_number}. {inst.text}", False, False)
+                                     for inst in recipe.instructions])
+
+        self.notes.set_label(recipe.notes)
+        self.notes_title.set_visible(bool(recipe.notes))
+        self.notes.set_visible(bool(recipe.notes))
+
+        extras = []
+        if self.plugins is not None and self.plugins.has("render"):
+            for sections in self.plugins.call("render", recipe):
+                for section in sections if isinstance(sections, (list, tuple)) else ():
+                    if isinstance(section, (list, tuple)) and len(section) == 2:
+                        extras.append((str(section[0]), False, True))
+                        extras.append((str(section[1]), False, False))
+        self.extras.set_lines(extras)
+        self.show_similar()
+
+        if recipe.source_url:
+            src_text = GLib.markup_escape_text(recipe.source_name or recipe.source_url)
+            href = GLib.markup_escape_text(recipe.source_url)
+            self.source.set_markup(f'<a href="{href}">{src_text}</a>')
+        self.source.set_visible(bool(recipe.source_url))
 
-# Need Adw import for Clamp
-from gi.repository import Adw
+        self.get_vadjustment().set_value(0)
@@ -0,0 +1,115 @@
+"""Debounced search-as-you-type, run off the main thread."""
+
+import logging
+import queue
+import sqlite3
+import threading
+from typing import Callable, Optional
+
+import gi
+gi.require_version("Gtk", "4.0")
+from gi.repository import GLib
+
+from makebread.models.database import get_connection, get_connection_path
+from makebread.models.recipe import RecipeStore, RecipeSummary
+
+log = logging.getLogger(__name__)
+
+
+class BackgroundSearch:
+    """
+    Runs searches on a worker thread with its own database connection.
+
+    Each request gets a generation number; results belonging to an older
+    generation are dropped, so fast typing never shows stale results. The
+    first page is delivered as soon as it is found, the remaining results
+    and the total count follow. A search that fails is reported through
+    on_error instead.
+    """
+
+    def __init__(self, store: RecipeStore,
+                 on_page: Callable[[str, list[RecipeSummary]], None],
+                 on_done: Callable[[str, list[RecipeSummary], int], None],
+                 on_error: Callable[[str, Exception], None],
+                 delay_ms: int = 150, page_size: int = 100):
+        self._store = store
+        self._db_path = get_connection_path(store.conn)
+        self._on_page = on_page
+        self._on_done = on_done
+        self._on_error = on_error
+        self._delay_ms = delay_ms
+        self._page_size = page_size
+        self._generation = 0
+        self._timeout_id = 0
+        self._queue: "queue.Queue[tuple[int, str]]" = queue.Queue()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._thread = None
+
+    def request(self, text: str) -> None:
+        """Schedule a search for text once typing pauses."""
+        self.cancel()
+        generation = self._generation
+        self._timeout_id = GLib.timeout_add(self._delay_ms, self._submit, generation, text)
+
+    def cancel(self) -> None:
+        """Drop the pending search and any results still in flight."""
+        self._generation += 1
+        if self._timeout_id:
+            GLib.source_remove(self._timeout_id)
+            self._timeout_id = 0
+        if self._conn is not None:
+            # Abort a query that is still running for an older generation
+            self._conn.interrupt()
+
+    def _submit(self, generation: int, text: str) -> bool:
+        self._timeout_id = 0
+        if self._db_path is None:
+            # In-memory databases can't be shared with a worker thread
+            self._run(self._store, generation, text)
+            return GLib.SOURCE_REMOVE
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name="makebread-search",
+                                            daemon=True)
+            self._thread.start()
+        self._queue.put((generation, text))
+        return GLib.SOURCE_REMOVE
+
+    def _worker(self) -> None:
+        self._conn = get_connection(self._db_path)
+        store = RecipeStore(self._conn)
+        while True:
+            generation, text = self._queue.get()
+            # Skip ahead to the newest request if several queued up
+            while not self._queue.empty():
+                generation, text = self._queue.get_nowait()
+            if generation == self._generation:
+                self._run(store, generation, text)
+
+    def _run(self, store: RecipeStore, generation: int, text: str) -> None:
+        try:
+            first = store.search_summaries(text, self._page_size)
+            self._post(self._on_page, generation, text, first)
+            if len(first) < self._page_size:
+                self._post(self._on_done, generation, text, first, len(first))
+                return
+            if generation != self._generation:
+                return
+            rest = store.search_summaries(text, offset=self._page_size)
+            results = first + rest
+            self._post(self._on_done, generation, text, results, len(results))
+        except sqlite3.OperationalError as e:
+            if generation != self._generation or str(e) == "interrupted":
+                # Interrupted by a newer request
+                return
+            log.exception("search for %r failed", text)
+            self._post(self._on_error, generation, text, e)
+        except Exception as e:
+            log.exception("search for %r failed", text)
+            self._post(self._on_error, generation, text, e)
+
+    def _post(self, callback, generation, *args) -> None:
+        def deliver():
+            if generation == self._generation:
+                callback(*args)
+            return GLib.SOURCE_REMOVE
+        GLib.idle_add(deliver)
@@ -13,17 +13,32 @@ def _config_path() -> Path:
     return config_dir / "settings.ini"
 
 
+# (mtime, settings) of the last read, so lookups don't re-parse the INI file
+_cached = None
+
+
 def get_settings() -> dict:
     """Read settings as a simple dict."""
+    global _cached
+    path = _config_path()
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        mtime = None
+    if _cached is not None and _cached[0] == mtime:
+        return dict(_cached[1])
+
     defaults = {
         "unit_system": SYSTEM_US,
         "auto_convert_units": True,
         "show_machine_info": True,
         "show_category_badges": True,
+        "instant_search": True,
+        "thumbnail_cache_mb": 64,
     }
-    path = _config_path()
-    if not path.exists():
-        return defaults
+    if mtime is None:
+        _cached = (None, defaults)
+        return dict(defaults)
 
     import configparser
     cp = configparser.ConfigParser()
@@ -34,15 +49,20 @@ def get_settings() -> dict:
         defaults["auto_convert_units"] = s.getboolean("auto_convert_units", True)
         defaults["show_machine_info"] = s.getboolean("show_machine_info", True)
         defaults["show_category_badges"] = s.getboolean("show_category_badges", True)
-    return defaults
+        defaults["instant_search"] = s.getboolean("instant_search", True)
+        defaults["thumbnail_cache_mb"] = s.getint("thumbnail_cache_mb", 64)
+    _cached = (mtime, defaults)
+    return dict(defaults)
 
 
 def save_settings(settings: dict):
+    global _cached
     import configparser
     cp = configparser.ConfigParser()
     cp["makebread"] = {k: str(v) for k, v in settings.items()}
     with open(_config_path(), "w") as f:
         cp.write(f)
+    _cached = None
 
 
 def get_unit_system() -> str:
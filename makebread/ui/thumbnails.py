@@ -0,0 +1,77 @@
+"""Asynchronous delivery of recipe photo thumbnails as textures."""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import gi
+gi.require_version("Gtk", "4.0")
+from gi.repository import Gdk, GLib
+
+from makebread.utils.thumbnails import ThumbnailCache
+
+# Thumbnail sizes used by the UI
+LIST_SIZE = 48
+VIEW_SIZE = 640
+
+
+class ThumbnailLoader:
+    """
+    Decodes and downsamples photos on worker threads through a
+    ThumbnailCache, then hands textures to the UI on the main loop. Recent
+    textures are kept in memory so re-binding a row is free.
+    """
+
+    def __init__(self, cache: ThumbnailCache, workers: int = 2, max_textures: int = 256):
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="makebread-thumb")
+        self._textures: "OrderedDict[tuple[str, int], Gdk.Texture]" = OrderedDict()
+        self._max_textures = max_textures
+        self._pending: dict[tuple[str, int], list[Callable]] = {}
+
+    def lookup(self, image_path: str, size: int) -> Optional[Gdk.Texture]:
+        """A texture already in memory, or None."""
+        texture = self._textures.get((image_path, size))
+        if texture is not None:
+            self._textures.move_to_end((image_path, size))
+        return texture
+
+    def request(self, image_path: str, size: int,
+                callback: Callable[[Optional[Gdk.Texture]], None]) -> Optional[Gdk.Texture]:
+        """
+        Return the texture if it is in memory; otherwise load it in the
+        background and call callback(texture) on the main loop later.
+        The callback gets None if the image can't be loaded.
+        """
+        key = (image_path, size)
+        texture = self.lookup(image_path, size)
+        if texture is not None:
+            return texture
+        waiting = self._pending.get(key)
+        if waiting is not None:
+            waiting.append(callback)
+            return None
+        self._pending[key] = [callback]
+        future = self._executor.submit(self.cache.get, image_path, size)
+        future.add_done_callback(lambda f: GLib.idle_add(self._deliver, key, f))
+        return None
+
+    def _deliver(self, key, future):
+        texture = None
+        try:
+            path = future.result()
+            if path is not None:
+                texture = Gdk.Texture.new_from_filename(str(path))
+        except (GLib.Error, OSError):
+            texture = None
+        if texture is not None:
+            self._textures[key] = texture
+            while len(self._textures) > self._max_textures:
+                self._textures.popitem(last=False)
+        for callback in self._pending.pop(key, []):
+            callback(texture)
+        return GLib.SOURCE_REMOVE
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
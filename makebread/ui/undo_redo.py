@@ -1,37 +1,162 @@
 """Undo/Redo stack for application state changes."""
 
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from makebread.models.command_log import Command, CommandLog, apply_payload
+from makebread.models.recipe import RecipeStore
+
+# Edits of the same kind to the same recipe within this many seconds
+# are undone as one step
+COALESCE_SECONDS = 2.0
+
+
+@dataclass
+class _Entry:
+    description: str
+    size: int
+    key: Optional[tuple] = None
+    at: float = 0.0
+    undo_fn: Optional[Callable] = None
+    redo_fn: Optional[Callable] = None
+    command: Optional[Command] = None
+
 
 class UndoRedoManager:
-    """Simple undo/redo manager with action stack."""
+    """
+    Undo/redo manager bounded by entry count and payload bytes.
 
-    def __init__(self, max_size=50):
-        self._undo_stack = []
-        self._redo_stack = []
+    Actions are either in-memory callbacks given to push(), or recipe
+    commands given to record(). Recorded commands are kept in the
+    command_log table and only their ids live here, so history survives a
+    restart without holding recipe copies in memory.
+    """
+
+    def __init__(self, max_size=50, store: Optional[RecipeStore] = None,
+                 max_bytes: int = 4 * 1024 * 1024,
+                 on_applied: Optional[Callable[[Optional[int]], None]] = None):
+        self._undo_stack: deque[_Entry] = deque()
+        self._redo_stack: list[_Entry] = []
         self._max_size = max_size
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._store = store
+        self._log = CommandLog(store.conn) if store is not None else None
+        self._on_applied = on_applied
+        if self._log is not None:
+            self._load()
+
+    def _load(self):
+        commands = self._log.load()
+        for command in commands:
+            entry = _Entry(command.description, command.size, command=command)
+            if command.undone:
+                # Most recently undone, i.e. oldest, on top
+                self._redo_stack.insert(0, entry)
+            else:
+                self._undo_stack.append(entry)
+                self._bytes += entry.size
+        self._trim()
+
+    def push(self, undo_fn, redo_fn, description="", size=0, key=None):
+        """Push an undoable action; with the same key as the last one, they coalesce."""
+        last = self._undo_stack[-1] if self._undo_stack else None
+        now = time.monotonic()
+        self._clear_redo()
+        if self._coalesces(last, key, now):
+            last.redo_fn = redo_fn
+            last.at = now
+            return
+        self._add(_Entry(description, size, key, now, undo_fn=undo_fn, redo_fn=redo_fn))
+
+    def record(self, kind: str, recipe_id: int, description: str, undo: dict, redo: dict):
+        """Log a recipe command that has just been applied to the store."""
+        key = (kind, recipe_id)
+        last = self._undo_stack[-1] if self._undo_stack else None
+        now = time.monotonic()
+        self._clear_redo()
+        if self._coalesces(last, key, now) and last.command is not None:
+            self._bytes -= last.size
+            self._log.amend(last.command, redo)
+            last.size = last.command.size
+            self._bytes += last.size
+            last.at = now
+            self._trim()
+            return
+        command = self._log.append(kind, recipe_id, description, undo, redo)
+        self._add(_Entry(description, command.size, key, now, command=command))
+
+    @staticmethod
+    def _coalesces(last: Optional[_Entry], key, now: float) -> bool:
+        return (last is not None and key is not None and last.key == key
+                and now - last.at < COALESCE_SECONDS)
 
-    def push(self, undo_fn, redo_fn, description=""):
-        """Push an undoable action."""
-        self._undo_stack.append((undo_fn, redo_fn, description))
-        if len(self._undo_stack) > self._max_size:
-            self._undo_stack.pop(0)
+    def _add(self, entry: _Entry):
+        self._undo_stack.append(entry)
+        self._bytes += entry.size
+        self._trim()
+
+    def _trim(self):
+        dropped = []
+        while self._undo_stack and (len(self._undo_stack) > self._max_size
+                                    or self._bytes > self._max_bytes):
+            entry = self._undo_stack.popleft()
+            self._bytes -= entry.size
+            if entry.command is not None:
+                dropped.append(entry.command)
+        if dropped and self._log is not None:
+            self._log.remove(dropped)
+
+    def _clear_redo(self):
+        commands = [e.command for e in self._redo_stack if e.command is not None]
         self._redo_stack.clear()
+        if commands:
+            self._log.remove(commands)
+
+    def _run(self, entry: _Entry, undo: bool) -> bool:
+        """Apply one side of an entry; False if it no longer applies."""
+        if entry.command is None:
+            (entry.undo_fn if undo else entry.redo_fn)()
+            return True
+        command = entry.command
+        data = self._log.payload(command, undo)
+        if data is None or not apply_payload(self._store, command.kind,
+                                             command.recipe_id, data):
+            # The recipe is gone (e.g. purged); the entry can't be applied either way
+            self._log.remove([command])
+            return False
+        self._log.set_undone(command, undo)
+        if self._on_applied is not None:
+            self._on_applied(command.recipe_id)
+        return True
 
     def undo(self):
-        """Undo the last action. Returns True if successful."""
+        """
+        Undo the last action. Returns True if successful; an action that no
+        longer applies is dropped from the history and False returned.
+        """
         if not self._undo_stack:
             return False
-        undo_fn, redo_fn, desc = self._undo_stack.pop()
-        undo_fn()
-        self._redo_stack.append((undo_fn, redo_fn, desc))
+        entry = self._undo_stack.pop()
+        self._bytes -= entry.size
+        # A later action must never coalesce into one that was undone
+        entry.key = None
+        if not self._run(entry, undo=True):
+            return False
+        self._redo_stack.append(entry)
         return True
 
     def redo(self):
-        """Redo the last undone action. Returns True if successful."""
+        """Redo the last undone action. Returns True if successful, like undo()."""
         if not self._redo_stack:
             return False
-        undo_fn, redo_fn, desc = self._redo_stack.pop()
-        redo_fn()
-        self._undo_stack.append((undo_fn, redo_fn, desc))
+        entry = self._redo_stack.pop()
+        if not self._run(entry, undo=False):
+            return False
+        self._undo_stack.append(entry)
+        self._bytes += entry.size
         return True
 
     def can_undo(self):
@@ -40,6 +165,17 @@ class UndoRedoManager:
     def can_redo(self):
         return bool(self._redo_stack)
 
+    def undo_description(self) -> str:
+        return self._undo_stack[-1].description if self._undo_stack else ""
+
+    def redo_description(self) -> str:
+        return self._redo_stack[-1].description if self._redo_stack else ""
+
     def clear(self):
+        commands = [e.command for e in (*self._undo_stack, *self._redo_stack)
+                    if e.command is not None]
         self._undo_stack.clear()
         self._redo_stack.clear()
+        self._bytes = 0
+        if commands:
+            self._log.remove(commands)
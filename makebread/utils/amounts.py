@@ -0,0 +1,108 @@
+"""Fast parser for free-form ingredient amounts.
+
+Handles whole numbers, decimals (with '.' or ','), simple and mixed
+fractions ('2/3', '1 1/2'), unicode fractions ('½', '1½') and ranges
+('1-2', '2–3', '1 to 2'). Amounts are never negative: a leading hyphen
+makes a string unparseable rather than a range or a negative number.
+Results are memoized, since real recipe data repeats a small set of
+amount strings over and over.
+"""
+
+import re
+from functools import lru_cache
+from typing import Optional
+
+UNICODE_FRACTIONS = {
+    "½": 1 / 2, "⅓": 1 / 3, "⅔": 2 / 3, "¼": 1 / 4, "¾": 3 / 4,
+    "⅕": 1 / 5, "⅖": 2 / 5, "⅗": 3 / 5, "⅘": 4 / 5, "⅙": 1 / 6,
+    "⅚": 5 / 6, "⅐": 1 / 7, "⅛": 1 / 8, "⅜": 3 / 8, "⅝": 5 / 8,
+    "⅞": 7 / 8, "⅑": 1 / 9, "⅒": 1 / 10,
+}
+
+_CACHE_SIZE = 1024
+
+_RANGE_SEP = re.compile(r"\s*(?:-|–|—|\bto\b)\s*", re.IGNORECASE)
+_HYPHEN_MIXED = re.compile(r"^(\d+)-(\d+/\d+)$")
+_THOUSANDS = re.compile(r"^\d{1,3}(?:,\d{3})+$")
+_UNICODE_SPLIT = re.compile("([" + "".join(UNICODE_FRACTIONS) + "])")
+# Plain digits only: float() would also take '-1', '1e3' or 'nan'
+_NUMBER = re.compile(r"\d+(?:\.\d*)?|\.\d+")
+
+
+def _parse_number(token: str) -> Optional[float]:
+    if "/" in token:
+        numer, _, denom = token.partition("/")
+        if not (_NUMBER.fullmatch(numer) and _NUMBER.fullmatch(denom)):
+            return None
+        d = float(denom)
+        return float(numer) / d if d else None
+    if "," in token:
+        # '1,000' is a thousands separator, '1,5' a decimal comma
+        token = token.replace(",", "" if _THOUSANDS.match(token) else ".")
+    return float(token) if _NUMBER.fullmatch(token) else None
+
+
+def _parse_single(text: str) -> Optional[float]:
+    if text.isdigit():
+        return float(text)
+    text = _UNICODE_SPLIT.sub(r" \1 ", text.replace("⁄", "/"))
+    tokens = text.split()
+    if not tokens:
+        return None
+    total = 0.0
+    for token in tokens:
+        value = UNICODE_FRACTIONS.get(token)
+        if value is None:
+            value = _parse_number(token)
+            if value is None:
+                return None
+        total += value
+    return total
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def parse_range(text: str) -> Optional[tuple[float, float]]:
+    """
+    Parse an amount string to a (low, high) pair.
+    Single amounts give low == high. Returns None if unparseable.
+    """
+    text = text.strip()
+    if not text:
+        return None
+    if text.isdigit():
+        value = float(text)
+        return value, value
+    mixed = _HYPHEN_MIXED.match(text)
+    if mixed:
+        # '1-1/2' is how many US recipes write a mixed number
+        text = f"{mixed.group(1)} {mixed.group(2)}"
+    parts = _RANGE_SEP.split(text, maxsplit=1)
+    if len(parts) == 2 and parts[0] and parts[1]:
+        low, high = _parse_single(parts[0]), _parse_single(parts[1])
+        if low is None or high is None:
+            return None
+        return (low, high) if low <= high else (high, low)
+    value = _parse_single(text)
+    if value is None:
+        return None
+    return value, value
+
+
+def parse_value(text: str) -> Optional[float]:
+    """Parse an amount string to a single value (the midpoint of a range)."""
+    if not text:
+        return None
+    parsed = parse_range(text)
+    if parsed is None:
+        return None
+    low, high = parsed
+    return low if low == high else (low + high) / 2
+
+
+def cache_info():
+    """Memoization statistics for the amount parser."""
+    return parse_range.cache_info()
+
+
+def clear_cache() -> None:
+    parse_range.cache_clear()
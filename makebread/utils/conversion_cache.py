@@ -0,0 +1,99 @@
+"""Cache of unit-converted ingredient lines per recipe and unit system."""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable
+
+from makebread.models.recipe import Recipe
+from makebread.utils.units import convert_ingredient
+
+
+@dataclass(frozen=True)
+class IngredientLine:
+    name: str
+    amount: str = ""
+    unit: str = ""
+    group_name: str = ""
+
+    @property
+    def measure(self) -> str:
+        return f"{self.amount} {self.unit}".strip()
+
+
+def convert_lines(recipe: Recipe, system: str) -> tuple[IngredientLine, ...]:
+    """Convert a recipe's ingredients to a unit system."""
+    lines = []
+    for ing in recipe.ingredients:
+        amount, unit = convert_ingredient(ing.amount, ing.unit, system)
+        lines.append(IngredientLine(ing.name, amount, unit, ing.group_name))
+    return tuple(lines)
+
+
+class ConversionCache:
+    """
+    Converted ingredient lines keyed by (recipe id, revision, unit system).
+    Safe to use from a background thread while the UI reads from it.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple[IngredientLine, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._warm_generation = 0
+
+    def lines(self, recipe: Recipe, system: str) -> tuple[IngredientLine, ...]:
+        """Converted lines for a recipe, computed on a miss."""
+        if recipe.id is None:
+            return convert_lines(recipe, system)
+        key = (recipe.id, recipe.revision, system)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                return cached
+        lines = convert_lines(recipe, system)
+        self._put(key, lines)
+        return lines
+
+    def _put(self, key: tuple, lines: tuple[IngredientLine, ...]) -> None:
+        with self._lock:
+            self._entries[key] = lines
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, recipe_id: int) -> None:
+        """Drop all cached conversions of a recipe (call after saving it)."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == recipe_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def warm(self, recipes: Iterable[Recipe], system: str) -> threading.Thread:
+        """
+        Convert recipes in a background thread. Starting a new warm-up
+        supersedes any still running.
+        """
+        with self._lock:
+            self._warm_generation += 1
+            generation = self._warm_generation
+
+        def run():
+            for recipe in recipes:
+                if generation != self._warm_generation:
+                    return
+                if recipe.id is None:
+                    continue
+                key = (recipe.id, recipe.revision, system)
+                with self._lock:
+                    if key in self._entries:
+                        continue
+                self._put(key, convert_lines(recipe, system))
+
+        thread = threading.Thread(target=run, name="makebread-convert", daemon=True)
+        thread.start()
+        return thread
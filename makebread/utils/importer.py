@@ -1,80 +1,174 @@
 """Import/export recipes as JSON."""
 
 import json
+import re
 from pathlib import Path
 from makebread.models.recipe import Recipe, Ingredient, Instruction, RecipeStore
+from makebread.utils.amounts import UNICODE_FRACTIONS, parse_range
+from makebread.utils.units import KEEP_UNITS, PIECE_UNITS, TO_GRAMS, TO_ML
 
+# Size words count as units, so '2 large eggs' is 2 'large' 'eggs'
+_UNITS = {u.lower() for u in (*TO_ML, *TO_GRAMS, *KEEP_UNITS, *PIECE_UNITS)}
+_MAX_AMOUNT_TOKENS = 4
+_BULLET = re.compile(r"^\s*(?:[-*•·▢□]|\d+[.)](?=\s))\s*")
+# '500g' or '1½cups': an amount glued to its unit
+_GLUED = re.compile(r"^([\d.,/" + "".join(UNICODE_FRACTIONS) + r"]+)([^\W\d]+)$")
 
-def import_json(filepath: Path, store: RecipeStore) -> int:
-    """Import recipes from a JSON file. Returns count imported."""
+
+def recipe_from_dict(rd: dict) -> Recipe:
+    """Build a Recipe from its JSON representation."""
+    recipe = Recipe(
+        name=rd.get("name", "Untitled"),
+        description=rd.get("description", ""),
+        category=rd.get("category", "white"),
+        loaf_size=rd.get("loaf_size", "2lb"),
+        prep_time_min=rd.get("prep_time_min", 0),
+        total_time_min=rd.get("total_time_min", 0),
+        machine_brand=rd.get("machine_brand", ""),
+        machine_model=rd.get("machine_model", ""),
+        machine_program=rd.get("machine_program", "Basic/White"),
+        crust_setting=rd.get("crust_setting", "medium"),
+        source_url=rd.get("source_url", ""),
+        source_name=rd.get("source_name", ""),
+        author=rd.get("author", ""),
+        notes=rd.get("notes", ""),
+        tags=rd.get("tags", []),
+    )
+    for ing in rd.get("ingredients", []):
+        recipe.ingredients.append(Ingredient(
+            name=ing.get("name", ""),
+            amount=str(ing.get("amount", "")),
+            unit=ing.get("unit", ""),
+            group_name=ing.get("group", ""),
+            sort_order=len(recipe.ingredients),
+        ))
+    for i, step in enumerate(rd.get("instructions", []), 1):
+        if isinstance(step, str):
+            recipe.instructions.append(Instruction(step_number=i, text=step))
+        else:
+            recipe.instructions.append(Instruction(
+                step_number=step.get("step", i),
+                text=step.get("text", ""),
+            ))
+    return recipe
+
+
+def recipe_to_dict(r: Recipe) -> dict:
+    """The JSON representation of a recipe, as used by export_json."""
+    return {
+        "name": r.name,
+        "description": r.description,
+        "category": r.category,
+        "loaf_size": r.loaf_size,
+        "prep_time_min": r.prep_time_min,
+        "total_time_min": r.total_time_min,
+        "machine_brand": r.machine_brand,
+        "machine_model": r.machine_model,
+        "machine_program": r.machine_program,
+        "crust_setting": r.crust_setting,
+        "source_url": r.source_url,
+        "source_name": r.source_name,
+        "author": r.author,
+        "notes": r.notes,
+        "tags": r.tags,
+        "ingredients": [
+            {"amount": i.amount, "unit": i.unit, "name": i.name, "group": i.group_name}
+            for i in r.ingredients
+        ],
+        "instructions": [inst.text for inst in r.instructions],
+    }
+
+
+def import_json(filepath: Path, store: RecipeStore, plugins=None) -> int:
+    """
+    Import recipes from a JSON file. Returns count imported.
+    With a PluginManager, each recipe goes through the on_import hook first.
+    """
     with open(filepath, "r", encoding="utf-8") as f:
         data = json.load(f)
 
     recipes = data if isinstance(data, list) else [data]
     count = 0
     for rd in recipes:
-        recipe = Recipe(
-            name=rd.get("name", "Untitled"),
-            description=rd.get("description", ""),
-            category=rd.get("category", "white"),
-            loaf_size=rd.get("loaf_size", "2lb"),
-            prep_time_min=rd.get("prep_time_min", 0),
-            total_time_min=rd.get("total_time_min", 0),
-            machine_brand=rd.get("machine_brand", ""),
-            machine_model=rd.get("machine_model", ""),
-            machine_program=rd.get("machine_program", "Basic/White"),
-            crust_setting=rd.get("crust_setting", "medium"),
-            source_url=rd.get("source_url", ""),
-            source_name=rd.get("source_name", ""),
-            author=rd.get("author", ""),
-            notes=rd.get("notes", ""),
-            tags=rd.get("tags", []),
-        )
-        for ing in rd.get("ingredients", []):
-            recipe.ingredients.append(Ingredient(
-                name=ing.get("name", ""),
-                amount=str(ing.get("amount", "")),
-                unit=ing.get("unit", ""),
-                group_name=ing.get("group", ""),
-            ))
-        for i, step in enumerate(rd.get("instructions", []), 1):
-            if isinstance(step, str):
-                recipe.instructions.append(Instruction(step_number=i, text=step))
-            else:
-                recipe.instructions.append(Instruction(
-                    step_number=step.get("step", i),
-                    text=step.get("text", ""),
-                ))
+        recipe = recipe_from_dict(rd)
+        if plugins is not None:
+            recipe = plugins.pipe("on_import", recipe)
         store.save(recipe)
         count += 1
     return count
 
 
+def _split_amount(tokens: list[str]) -> tuple[str, list[str]]:
+    first = tokens[0]
+    if not (first[0].isdigit() or first[0] in UNICODE_FRACTIONS):
+        return "", tokens
+    glued = _GLUED.match(first)
+    if glued and parse_range(glued.group(1)) is not None:
+        return glued.group(1), [glued.group(2), *tokens[1:]]
+    for n in range(min(len(tokens), _MAX_AMOUNT_TOKENS), 0, -1):
+        amount = " ".join(tokens[:n])
+        if parse_range(amount) is not None:
+            return amount, tokens[n:]
+    return "", tokens
+
+
+def _split_note(tokens: list[str]) -> tuple[str, list[str]]:
+    """A leading parenthetical: '(0.25 oz) packet yeast', '(14 oz) tomatoes'."""
+    if tokens and tokens[0].startswith("("):
+        for n, token in enumerate(tokens):
+            if token.endswith(")"):
+                return " ".join(tokens[:n + 1]), tokens[n + 1:]
+    return "", tokens
+
+
+def _split_unit(tokens: list[str]) -> tuple[str, list[str]]:
+    if len(tokens) >= 2:
+        pair = f"{tokens[0]} {tokens[1]}".lower().rstrip(".")
+        if pair in _UNITS:
+            return f"{tokens[0]} {tokens[1]}".rstrip("."), tokens[2:]
+    if tokens and tokens[0].lower().rstrip(".") in _UNITS:
+        return tokens[0].rstrip("."), tokens[1:]
+    return "", tokens
+
+
+def parse_ingredient_lines(text: str) -> list[Ingredient]:
+    """
+    Parse pasted ingredient text, one ingredient per line, such as
+    '1 1/2 cups bread flour' or '500g water'. A line ending in ':' starts
+    a group ('For the topping:'). Lines without an amount keep the whole
+    line as the name. A parenthetical before or after the unit
+    ('1 (0.25 oz) packet yeast', '1 can (14 oz) tomatoes') moves to the
+    end of the name, where ingredient matching ignores it.
+    """
+    ingredients = []
+    group = ""
+    for line in text.splitlines():
+        line = _BULLET.sub("", line).strip()
+        if not line:
+            continue
+        if line.endswith(":"):
+            group = line[:-1].strip()
+            continue
+        tokens = line.split()
+        amount, rest = _split_amount(tokens)
+        note, rest = _split_note(rest) if amount else ("", rest)
+        unit, rest = _split_unit(rest) if amount else ("", rest)
+        if unit and not note:
+            note, rest = _split_note(rest)
+        if rest and rest[0].lower() == "of":
+            rest = rest[1:]
+        name = " ".join(rest)
+        if not name:
+            continue
+        if note:
+            name = f"{name} {note}"
+        ingredients.append(Ingredient(name=name, amount=amount, unit=unit,
+                                      group_name=group, sort_order=len(ingredients)))
+    return ingredients
+
+
 def export_json(recipes: list[Recipe], filepath: Path) -> None:
     """Export recipes to JSON."""
-    data = []
-    for r in recipes:
-        data.append({
-            "name": r.name,
-            "description": r.description,
-            "category": r.category,
-            "loaf_size": r.loaf_size,
-            "prep_time_min": r.prep_time_min,
-            "total_time_min": r.total_time_min,
-            "machine_brand": r.machine_brand,
-            "machine_model": r.machine_model,
-            "machine_program": r.machine_program,
-            "crust_setting": r.crust_setting,
-            "source_url": r.source_url,
-            "source_name": r.source_name,
-            "author": r.author,
-            "notes": r.notes,
-            "tags": r.tags,
-            "ingredients": [
-                {"amount": i.amount, "unit": i.unit, "name": i.name, "group": i.group_name}
-                for i in r.ingredients
-            ],
-            "instructions": [inst.text for inst in r.instructions],
-        })
+    data = [recipe_to_dict(r) for r in recipes]
     with open(filepath, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,198 @@
+"""Inverted ingredient index: which recipes can be baked from a pantry."""
+
+import json
+import os
+import sqlite3
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+from itertools import chain
+from pathlib import Path
+from typing import Iterable, Optional
+
+from makebread.models.changes import ChangeLog
+from makebread.models.recipe import Recipe, RecipeStore
+from makebread.models.sync import library_id
+from makebread.utils.units import ingredient_key
+
+_CACHE_VERSION = 1
+
+
+def get_cache_path(conn: sqlite3.Connection) -> Path:
+    cache_dir = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "makebread"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir / f"pantry-{library_id(conn)}.json"
+
+
+@dataclass(frozen=True)
+class PantryMatch:
+    recipe_id: int
+    name: str
+    have: int
+    missing: tuple[str, ...]
+
+    @property
+    def total(self) -> int:
+        return self.have + len(self.missing)
+
+
+class PantryIndex:
+    """
+    Postings from ingredient keys to sorted arrays of recipe ids.
+
+    A pantry item covers every key that contains all of its words, so
+    "flour" covers "bread flour" and "rye flour", while "rye flour" only
+    covers itself. Matching counts covered ingredients per recipe with
+    one pass over the postings of the covered keys.
+
+    Saving a recipe doesn't touch the index: it is kept in a cache file
+    and, when loaded, catches up on the recipes the change log lists as
+    changed since it was written.
+    """
+
+    def __init__(self):
+        self._postings: dict[str, array] = {}
+        self._keys: dict[int, tuple[str, ...]] = {}
+        self._names: dict[int, str] = {}
+        self.seq = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    # --- building ---
+
+    @classmethod
+    def build(cls, store: RecipeStore) -> "PantryIndex":
+        """Build the index from the database in two queries."""
+        index = cls()
+        index.seq = ChangeLog(store.conn).latest_seq()
+        keys: dict[int, set[str]] = {}
+        for rid, name in store.conn.execute("""
+            SELECT recipe_id, name FROM ingredients
+            WHERE recipe_id IN (SELECT id FROM recipes WHERE deleted_at IS NULL)
+        """):
+            key = ingredient_key(name)
+            if key:
+                keys.setdefault(rid, set()).add(key)
+        postings: dict[str, list[int]] = {}
+        for rid, name in store.conn.execute(
+                "SELECT id, name FROM recipes WHERE deleted_at IS NULL ORDER BY id"):
+            recipe_keys = tuple(sorted(keys.get(rid, ())))
+            index._keys[rid] = recipe_keys
+            index._names[rid] = name
+            for key in recipe_keys:
+                postings.setdefault(key, []).append(rid)
+        index._postings = {key: array("I", ids) for key, ids in postings.items()}
+        return index
+
+    @classmethod
+    def load_or_build(cls, store: RecipeStore, path: Optional[Path] = None) -> "PantryIndex":
+        """Load the cached index and catch up on changes since, else rebuild it."""
+        path = path or get_cache_path(store.conn)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != _CACHE_VERSION:
+                raise ValueError("old cache")
+            index = cls._from_dict(data)
+        except (OSError, ValueError, KeyError, TypeError):
+            index = cls.build(store)
+            index.save(path)
+            return index
+        if index.catch_up(store):
+            index.save(path)
+        return index
+
+    def save(self, path: Path) -> None:
+        data = {"version": _CACHE_VERSION, "seq": self.seq,
+                "recipes": [[rid, self._names[rid], list(keys)]
+                            for rid, keys in self._keys.items()]}
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def _from_dict(cls, data: dict) -> "PantryIndex":
+        index = cls()
+        postings: dict[str, list[int]] = {}
+        for rid, name, keys in sorted(data["recipes"]):
+            index._keys[rid] = tuple(keys)
+            index._names[rid] = name
+            for key in keys:
+                postings.setdefault(key, []).append(rid)
+        index._postings = {key: array("I", ids) for key, ids in postings.items()}
+        index.seq = data["seq"]
+        return index
+
+    # --- incremental updates ---
+
+    def catch_up(self, store: RecipeStore) -> int:
+        """Re-index the recipes changed since the index was built. Returns how many."""
+        log = ChangeLog(store.conn)
+        seq = log.latest_seq()
+        changed = log.changed_recipes(self.seq)
+        for recipe_id, state in changed.items():
+            recipe = store.get(recipe_id) if state == "live" else None
+            if recipe is not None:
+                self.update_recipe(recipe)
+            else:
+                self.remove(recipe_id)
+        self.seq = seq
+        return len(changed)
+
+    def update_recipe(self, recipe: Recipe) -> None:
+        """Re-index a saved recipe; catch_up() does this for each changed one."""
+        self.remove(recipe.id)
+        keys = tuple(sorted({k for k in (ingredient_key(i.name) for i in recipe.ingredients)
+                             if k}))
+        self._keys[recipe.id] = keys
+        self._names[recipe.id] = recipe.name
+        for key in keys:
+            ids = self._postings.setdefault(key, array("I"))
+            ids.insert(bisect_left(ids, recipe.id), recipe.id)
+
+    def remove(self, recipe_id: int) -> None:
+        keys = self._keys.pop(recipe_id, None)
+        if keys is None:
+            return
+        del self._names[recipe_id]
+        for key in keys:
+            ids = self._postings[key]
+            del ids[bisect_left(ids, recipe_id)]
+            if not ids:
+                del self._postings[key]
+
+    # --- queries ---
+
+    def covered_keys(self, pantry: Iterable[str]) -> set[str]:
+        """The ingredient keys a pantry provides."""
+        covered = set()
+        for item in pantry:
+            words = ingredient_key(item).split()
+            if not words:
+                continue
+            key = " ".join(words)
+            if key in self._postings:
+                covered.add(key)
+            wanted = set(words)
+            covered.update(k for k in self._postings if wanted.issubset(k.split()))
+        return covered
+
+    def match(self, pantry: Iterable[str], max_missing: int = 0,
+              limit: int = 50) -> list[PantryMatch]:
+        """
+        Recipes using at least one pantry item and missing at most
+        max_missing ingredients: fewest missing first, then those using
+        the most of the pantry, then by name.
+        """
+        covered = self.covered_keys(pantry)
+        have = Counter(chain.from_iterable(self._postings[k] for k in covered))
+        keys = self._keys
+        hits = [(len(keys[rid]) - count, -count, self._names[rid].lower(), rid)
+                for rid, count in have.items() if len(keys[rid]) - count <= max_missing]
+        hits.sort()
+        return [PantryMatch(rid, self._names[rid], -neg_have,
+                            tuple(k for k in keys[rid] if k not in covered))
+                for _missing, neg_have, _name, rid in hits[:limit]]
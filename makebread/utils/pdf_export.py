@@ -0,0 +1,487 @@
+"""Headless recipe layout and cookbook PDF export with cairo and Pango.
+
+Recipes are turned into blocks (title, metadata, photo, ingredient and
+step lines, notes), and the blocks are paginated by measuring them with
+Pango, splitting long paragraphs between lines. For a cookbook, the
+pagination, including photo decoding, runs in a process pool; the main
+process then streams the pages into one PDF, a recipe at a time, behind a
+cover and a linked table of contents.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+import cairo
+import gi
+gi.require_version("Pango", "1.0")
+gi.require_version("PangoCairo", "1.0")
+from gi.repository import GLib, Pango, PangoCairo
+
+from makebread.i18n import _
+from makebread.models.database import get_connection, get_connection_path
+from makebread.models.recipe import Recipe, RecipeStore
+from makebread.utils.thumbnails import ThumbnailCache
+
+# Page sizes in points
+PAPER_SIZES = {"a4": (595.28, 841.89), "letter": (612.0, 792.0)}
+MARGIN = 56.0
+
+# Photos: thumbnail size in pixels, and the largest share of the text
+# area height a photo may take
+IMAGE_PIXELS = 800
+IMAGE_MAX_HEIGHT = 0.35
+
+# Recipes per task sent to a worker process
+BATCH_SIZE = 8
+
+BODY_FONT = "Serif 10"
+HEADING_FONT = "Sans Bold 12"
+TITLE_FONT = "Sans Bold 20"
+SMALL_FONT = "Sans 8"
+
+
+@dataclass(frozen=True)
+class PageGeometry:
+    width: float
+    height: float
+    margin: float = MARGIN
+
+    @property
+    def text_width(self) -> float:
+        return self.width - 2 * self.margin
+
+    @property
+    def text_height(self) -> float:
+        return self.height - 2 * self.margin
+
+    @classmethod
+    def for_paper(cls, paper: str) -> "PageGeometry":
+        return cls(*PAPER_SIZES[paper])
+
+
+@dataclass(frozen=True)
+class Block:
+    """A paragraph of Pango markup, or a photo when image is set."""
+    markup: str = ""
+    font: str = BODY_FONT
+    indent: float = 0.0
+    pad_right: float = 0.0
+    space_before: float = 0.0
+    keep_with_next: bool = False
+    image: str = ""
+    image_height: float = 0.0
+
+
+# A placed piece of a block on a page: (block index, first line, end line,
+# top of the piece on the page, layout offset of the first line, height)
+Placement = tuple[int, int, int, float, float, float]
+
+
+def _escape(text: str) -> str:
+    return GLib.markup_escape_text(text)
+
+
+def recipe_blocks(recipe: Recipe, image_png: str = "", image_height: float = 0.0) -> list[Block]:
+    """The printable blocks of a recipe."""
+    blocks = [Block(_escape(recipe.name), TITLE_FONT, keep_with_next=True)]
+    meta = []
+    if recipe.loaf_size:
+        meta.append(f"{_('Loaf Size')}: {recipe.loaf_size}")
+    if recipe.machine_program:
+        meta.append(f"{_('Program')}: {recipe.machine_program}")
+    if recipe.crust_setting:
+        meta.append(f"{_('Crust')}: {recipe.crust_setting}")
+    if recipe.category:
+        meta.append(f"{_('Category')}: {recipe.category}")
+    if meta:
+        blocks.append(Block(_escape("  |  ".join(meta)), SMALL_FONT, space_before=4))
+    if recipe.description:
+        blocks.append(Block(f"<i>{_escape(recipe.description)}</i>", space_before=6))
+    if image_png:
+        blocks.append(Block(image=image_png, image_height=image_height, space_before=10))
+
+    if recipe.ingredients:
+        blocks.append(Block(_escape(_("Ingredients")), HEADING_FONT, space_before=14,
+                            keep_with_next=True))
+        group = None
+        for ing in recipe.ingredients:
+            if ing.group_name and ing.group_name != group:
+                group = ing.group_name
+                blocks.append(Block(f"<b>{_escape(group)}</b>", space_before=4,
+                                    keep_with_next=True))
+            measure = f"{ing.amount} {ing.unit}".strip()
+            text = f"• <b>{_escape(measure)}</b>  {_escape(ing.name)}" if measure \
+                else f"• {_escape(ing.name)}"
+            blocks.append(Block(text, indent=8, space_before=2))
+
+    if recipe.instructions:
+        blocks.append(Block(_escape(_("Instructions")), HEADING_FONT, space_before=14,
+                            keep_with_next=True))
+        for inst in recipe.instructions:
+            blocks.append(Block(f"<b>{inst.step_number}.</b> {_escape(inst.text)}",
+                                indent=8, space_before=4))
+
+    if recipe.notes:
+        blocks.append(Block(_escape(_("Notes")), HEADING_FONT, space_before=14,
+                            keep_with_next=True))
+        for para in recipe.notes.split("\n\n"):
+            blocks.append(Block(_escape(para.strip()), space_before=4))
+
+    if recipe.source_url or recipe.source_name:
+        source = recipe.source_name or recipe.source_url
+        blocks.append(Block(f"{_escape(_('Source'))}: {_escape(source)}", SMALL_FONT,
+                            space_before=12))
+    return blocks
+
+
+def _font_options() -> cairo.FontOptions:
+    # Unhinted metrics, so measuring and drawing agree on any surface
+    options = cairo.FontOptions()
+    options.set_hint_metrics(cairo.HINT_METRICS_OFF)
+    options.set_hint_style(cairo.HINT_STYLE_NONE)
+    return options
+
+
+def measuring_context() -> Pango.Context:
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1)
+    context = PangoCairo.create_context(cairo.Context(surface))
+    PangoCairo.context_set_font_options(context, _font_options())
+    return context
+
+
+class Layouter:
+    """Creates Pango layouts for blocks and paginates block lists."""
+
+    def __init__(self, context: Pango.Context, page: PageGeometry):
+        self.context = context
+        self.page = page
+        self._fonts: dict[str, Pango.FontDescription] = {}
+
+    def layout(self, block: Block) -> Pango.Layout:
+        font = self._fonts.get(block.font)
+        if font is None:
+            font = self._fonts[block.font] = Pango.FontDescription.from_string(block.font)
+        layout = Pango.Layout.new(self.context)
+        layout.set_font_description(font)
+        width = self.page.text_width - block.indent - block.pad_right
+        layout.set_width(int(width * Pango.SCALE))
+        layout.set_wrap(Pango.WrapMode.WORD_CHAR)
+        layout.set_markup(block.markup, -1)
+        return layout
+
+    @staticmethod
+    def line_extents(layout: Pango.Layout) -> list[tuple[float, float]]:
+        """(top, bottom) of each line, in points from the top of the layout."""
+        extents = []
+        it = layout.get_iter()
+        while True:
+            top, bottom = it.get_line_yrange()
+            extents.append((top / Pango.SCALE, bottom / Pango.SCALE))
+            if not it.next_line():
+                break
+        return extents
+
+    def _first_line_height(self, block: Block) -> float:
+        if block.image:
+            return block.image_height
+        top, bottom = self.line_extents(self.layout(block))[0]
+        return bottom - top
+
+    def paginate(self, blocks: list[Block]) -> list[list[Placement]]:
+        """Split blocks over pages; long paragraphs break between lines."""
+        height = self.page.text_height
+        pages: list[list[Placement]] = [[]]
+        y = 0.0
+
+        def new_page():
+            nonlocal y
+            pages.append([])
+            y = 0.0
+
+        for i, block in enumerate(blocks):
+            space = block.space_before if y > 0 else 0.0
+            if block.image:
+                if y > 0 and y + space + block.image_height > height:
+                    new_page()
+                    space = 0.0
+                y += space
+                pages[-1].append((i, 0, 0, y, 0.0, block.image_height))
+                y += block.image_height
+                continue
+
+            lines = self.line_extents(self.layout(block))
+            needed = lines[0][1] - lines[0][0]
+            if block.keep_with_next and i + 1 < len(blocks):
+                # Headings stay with the start of what follows them
+                nxt = blocks[i + 1]
+                needed = lines[-1][1] + nxt.space_before + self._first_line_height(nxt)
+            if y > 0 and y + space + needed > height:
+                new_page()
+                space = 0.0
+            y += space
+
+            start = 0
+            while start < len(lines):
+                base = lines[start][0]
+                end = start
+                while end < len(lines) and y + lines[end][1] - base <= height:
+                    end += 1
+                if end == start:
+                    if y == 0:
+                        end = start + 1    # a single line taller than the page
+                    else:
+                        new_page()
+                        continue
+                piece = lines[end - 1][1] - base
+                pages[-1].append((i, start, end, y, base, piece))
+                y += piece
+                start = end
+                if start < len(lines):
+                    new_page()
+        return pages
+
+
+class Renderer:
+    """Draws paginated blocks onto a cairo context."""
+
+    def __init__(self, cr: cairo.Context, page: PageGeometry):
+        self.cr = cr
+        self.page = page
+        context = PangoCairo.create_context(cr)
+        PangoCairo.context_set_font_options(context, _font_options())
+        self.layouter = Layouter(context, page)
+
+    def draw_page(self, blocks: list[Block], placements: list[Placement]) -> None:
+        cr = self.cr
+        left, top = self.page.margin, self.page.margin
+        for index, start, end, y, base, piece in placements:
+            block = blocks[index]
+            if block.image:
+                self._draw_image(block, top + y)
+                continue
+            layout = self.layouter.layout(block)
+            cr.save()
+            cr.rectangle(left + block.indent, top + y, self.page.text_width, piece)
+            cr.clip()
+            cr.move_to(left + block.indent, top + y - base)
+            PangoCairo.update_layout(cr, layout)
+            PangoCairo.show_layout(cr, layout)
+            cr.restore()
+
+    def _draw_image(self, block: Block, y: float) -> None:
+        try:
+            image = cairo.ImageSurface.create_from_png(block.image)
+        except (cairo.Error, OSError):
+            return
+        scale = block.image_height / image.get_height()
+        x = self.page.margin + (self.page.text_width - image.get_width() * scale) / 2
+        cr = self.cr
+        cr.save()
+        cr.translate(x, y)
+        cr.scale(scale, scale)
+        cr.set_source_surface(image, 0, 0)
+        cr.paint()
+        cr.restore()
+
+    def draw_footer(self, left_text: str, page_number: int) -> None:
+        block = Block(_escape(left_text), SMALL_FONT)
+        layout = self.layouter.layout(block)
+        layout.set_ellipsize(Pango.EllipsizeMode.END)
+        layout.set_width(int(self.page.text_width * 0.75 * Pango.SCALE))
+        y = self.page.height - self.page.margin * 0.6
+        cr = self.cr
+        cr.set_source_rgb(0.4, 0.4, 0.4)
+        cr.move_to(self.page.margin, y)
+        PangoCairo.show_layout(cr, layout)
+        number = self.layouter.layout(Block(str(page_number), SMALL_FONT))
+        number.set_alignment(Pango.Alignment.RIGHT)
+        cr.move_to(self.page.margin, y)
+        PangoCairo.show_layout(cr, number)
+        cr.set_source_rgb(0, 0, 0)
+
+
+# --- pagination, in worker processes or in-process ---
+
+class Paginator:
+    """Loads recipes, makes their photo thumbnails and paginates them."""
+
+    def __init__(self, store: Optional[RecipeStore], page: PageGeometry,
+                 thumbnails: Optional[ThumbnailCache] = None):
+        self.store = store
+        self.page = page
+        self.layouter = Layouter(measuring_context(), page)
+        self.thumbnails = thumbnails
+
+    def _photo(self, recipe: Recipe) -> tuple[str, float]:
+        if not recipe.image_path or self.thumbnails is None:
+            return "", 0.0
+        path = self.thumbnails.get(recipe.image_path, IMAGE_PIXELS)
+        if path is None:
+            return "", 0.0
+        try:
+            image = cairo.ImageSurface.create_from_png(str(path))
+        except (cairo.Error, OSError):
+            return "", 0.0
+        width, height = image.get_width(), image.get_height()
+        scale = min(self.page.text_width / width,
+                    self.page.text_height * IMAGE_MAX_HEIGHT / height)
+        return str(path), height * scale
+
+    def blocks(self, recipe: Recipe) -> list[Block]:
+        """The blocks of a recipe, with its photo thumbnail if it has one."""
+        return recipe_blocks(recipe, *self._photo(recipe))
+
+    def run(self, recipe_ids: list[int]) -> list[tuple]:
+        """(id, name, blocks, pages) for each recipe that still exists."""
+        results = []
+        for recipe_id in recipe_ids:
+            recipe = self.store.get(recipe_id)
+            if recipe is None:
+                continue
+            blocks = self.blocks(recipe)
+            results.append((recipe.id, recipe.name, blocks, self.layouter.paginate(blocks)))
+        return results
+
+
+_worker: Optional[Paginator] = None
+
+
+def _init_worker(db_path: str, page: PageGeometry) -> None:
+    global _worker
+    _worker = Paginator(RecipeStore(get_connection(Path(db_path))), page, ThumbnailCache())
+
+
+def _paginate_batch(recipe_ids: list[int]) -> list[tuple]:
+    return _worker.run(recipe_ids)
+
+
+def _paginated(store: RecipeStore, ids: list[int], page: PageGeometry,
+               processes: Optional[int]) -> Iterable[list[tuple]]:
+    db_path = get_connection_path(store.conn)
+    batches = [ids[i:i + BATCH_SIZE] for i in range(0, len(ids), BATCH_SIZE)]
+    if db_path is None or len(batches) < 2:
+        # In-memory databases can't be opened by workers, and small jobs
+        # aren't worth starting processes for
+        paginator = Paginator(store, page, ThumbnailCache())
+        for batch in batches:
+            yield paginator.run(batch)
+        return
+    # spawn, not fork: forking a process that runs GTK threads isn't safe
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=ctx,
+                             initializer=_init_worker, initargs=(str(db_path), page)) as pool:
+        yield from pool.map(_paginate_batch, batches)
+
+
+# --- export ---
+
+def _dest(recipe_id: int) -> str:
+    return f"recipe-{recipe_id}"
+
+
+def export_recipe(recipe: Recipe, path: Path, paper: str = "a4") -> int:
+    """Write one recipe to a PDF file. Returns the number of pages."""
+    page = PageGeometry.for_paper(paper)
+    surface = cairo.PDFSurface(str(path), page.width, page.height)
+    surface.set_metadata(cairo.PDF_METADATA_TITLE, recipe.name)
+    renderer = Renderer(cairo.Context(surface), page)
+    paginator = Paginator(None, page, ThumbnailCache())
+    blocks = paginator.blocks(recipe)
+    pages = paginator.layouter.paginate(blocks)
+    for number, placements in enumerate(pages, 1):
+        renderer.draw_page(blocks, placements)
+        renderer.draw_footer(recipe.name, number)
+        renderer.cr.show_page()
+    surface.finish()
+    return len(pages)
+
+
+def export_cookbook(store: RecipeStore, recipe_ids: Iterable[int], path: Path,
+                    title: str = "", paper: str = "a4",
+                    progress: Optional[Callable[[int, int], None]] = None,
+                    processes: Optional[int] = None) -> int:
+    """
+    Write recipes, in the given order, to one PDF cookbook with a cover and
+    a linked table of contents. progress(done, total) is called from the
+    calling thread as work completes. Returns the number of pages.
+    """
+    ids = list(recipe_ids)
+    page = PageGeometry.for_paper(paper)
+    title = title or _("Cookbook")
+    total = 2 * len(ids)
+    done = 0
+
+    # Pagination (the slow part) runs in the pool; the results only hold
+    # markup and placements, never rendered pages
+    entries = []
+    for batch in _paginated(store, ids, page, processes):
+        entries.extend(batch)
+        done += BATCH_SIZE
+        if progress:
+            progress(min(done, len(ids)), total)
+    done = len(ids)
+
+    surface = cairo.PDFSurface(str(path), page.width, page.height)
+    surface.set_metadata(cairo.PDF_METADATA_TITLE, title)
+    cr = cairo.Context(surface)
+    renderer = Renderer(cr, page)
+    layouter = renderer.layouter
+
+    # Cover
+    cover = [Block(_escape(title), TITLE_FONT),
+             Block(_escape(_("{count} recipes").format(count=len(entries))), space_before=8)]
+    renderer.draw_page(cover, layouter.paginate(cover)[0])
+    cr.show_page()
+
+    # Table of contents; its length decides where the recipes start
+    toc = [Block(_escape(_("Contents")), TITLE_FONT)]
+    # Names leave room for the page numbers drawn beside them
+    toc += [Block(_escape(name), space_before=3, pad_right=48)
+            for _id, name, _b, _p in entries]
+    toc_pages = layouter.paginate(toc)
+    first_page = 2 + len(toc_pages)
+    start_pages = []
+    number = first_page
+    for entry in entries:
+        start_pages.append(number)
+        number += len(entry[3])
+    page_count = number - 1
+
+    for placements in toc_pages:
+        for placement in placements:
+            index, y = placement[0], placement[3]
+            if index == 0:
+                renderer.draw_page(toc, [placement])
+                continue
+            # Each line links to its recipe, with the page number on the right
+            cr.tag_begin(cairo.TAG_LINK, f"dest='{_dest(entries[index - 1][0])}'")
+            renderer.draw_page(toc, [placement])
+            label = layouter.layout(Block(str(start_pages[index - 1])))
+            label.set_alignment(Pango.Alignment.RIGHT)
+            cr.move_to(page.margin, page.margin + y)
+            PangoCairo.show_layout(cr, label)
+            cr.tag_end(cairo.TAG_LINK)
+        cr.show_page()
+
+    # Recipes, streamed page by page; each entry is dropped once drawn
+    for i, entry in enumerate(entries):
+        recipe_id, name, blocks, pages = entry
+        entries[i] = None
+        number = start_pages[i]
+        surface.add_outline(cairo.PDF_OUTLINE_ROOT, name, f"dest='{_dest(recipe_id)}'", 0)
+        for n, placements in enumerate(pages):
+            if n == 0:
+                cr.tag_begin(cairo.TAG_DEST, f"name='{_dest(recipe_id)}'")
+                cr.tag_end(cairo.TAG_DEST)
+            renderer.draw_page(blocks, placements)
+            renderer.draw_footer(name, number + n)
+            cr.show_page()
+        done += 1
+        if progress:
+            progress(done, total)
+
+    surface.finish()
+    return page_count
@@ -0,0 +1,175 @@
+"""Recipe scaling with baker's percentages and hydration.
+
+Used by ``makebread scale``. Results are frozen, so cached ones can be
+shared between callers.
+"""
+
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from makebread.models.recipe import Recipe
+from makebread.utils.amounts import parse_range
+from makebread.utils.units import (
+    SYSTEM_METRIC, SYSTEM_US, TO_GRAMS, WATER_CONTENT, convert_range,
+    ingredient_grams, lookup_ingredient, normalize_ingredient_name,
+    parse_amount,
+)
+
+GRAMS_PER_LB = 453.592
+GRAMS_PER_OZ = 28.3495
+
+# Scaled results, keyed by (recipe id, revision, target, unit system)
+_CACHE_SIZE = 256
+_cache: "OrderedDict[tuple, ScaledRecipe]" = OrderedDict()
+
+
+@dataclass(frozen=True)
+class ScaledIngredient:
+    name: str
+    amount: str
+    unit: str
+    grams: Optional[float] = None
+    percent: Optional[float] = None
+    group_name: str = ""
+
+
+@dataclass(frozen=True)
+class ScaledRecipe:
+    loaf_size: str
+    factor: float
+    flour_grams: float = 0.0
+    hydration: Optional[float] = None
+    ingredients: tuple[ScaledIngredient, ...] = ()
+
+
+def loaf_pounds(loaf_size: str) -> Optional[float]:
+    """Parse a loaf size label like '1.5lb' to pounds."""
+    m = re.match(r"\s*(\d+(?:\.\d+)?)\s*(lb|lbs|kg|g)?\s*$", loaf_size or "", re.I)
+    if not m:
+        return None
+    value = float(m.group(1))
+    unit = (m.group(2) or "lb").lower()
+    if unit == "kg":
+        return value * 1000 / GRAMS_PER_LB
+    if unit == "g":
+        return value / GRAMS_PER_LB
+    return value
+
+
+def is_flour(name: str) -> bool:
+    name = normalize_ingredient_name(name)
+    return "flour" in name or name.endswith("meal")
+
+
+def ingredient_weights(recipe: Recipe) -> list[Optional[float]]:
+    """Weight in grams of each ingredient, or None where unknown."""
+    return [ingredient_grams(parse_amount(ing.amount), ing.unit, ing.name)
+            if ing.amount else None
+            for ing in recipe.ingredients]
+
+
+def bakers_percentages(recipe: Recipe) -> tuple[float, list[Optional[float]], Optional[float]]:
+    """
+    Compute baker's percentages for a recipe.
+    Returns (flour_grams, percent per ingredient, hydration percent).
+    """
+    weights = ingredient_weights(recipe)
+    flour = sum(w for w, ing in zip(weights, recipe.ingredients)
+                if w is not None and is_flour(ing.name))
+    if flour <= 0:
+        return 0.0, [None] * len(weights), None
+
+    percents = [w / flour * 100 if w is not None else None for w in weights]
+    water = 0.0
+    for w, ing in zip(weights, recipe.ingredients):
+        if w is None:
+            continue
+        content = lookup_ingredient(WATER_CONTENT, ing.name)
+        if content:
+            water += w * content
+    return flour, percents, water / flour * 100 if water else None
+
+
+def _ounces(grams: float) -> str:
+    return f"{grams / GRAMS_PER_OZ:.2f}".rstrip("0").rstrip(".")
+
+
+def scale_amount(low: float, high: float, unit: str, system: str) -> tuple[str, str]:
+    """
+    Display an already scaled amount or range in a unit system.
+    Weights stay in ounces to two decimals in US and imperial units:
+    cooking fractions are too coarse for baker's percentages.
+    """
+    unit_lower = unit.lower().strip()
+    if unit_lower in TO_GRAMS and system != SYSTEM_METRIC:
+        grams = TO_GRAMS[unit_lower]
+        if low == high:
+            return _ounces(high * grams), "oz"
+        return f"{_ounces(low * grams)}–{_ounces(high * grams)}", "oz"
+    return convert_range(low, high, unit, system)
+
+
+def scale_recipe(recipe: Recipe, target_size: Optional[str] = None,
+                 flour_grams: Optional[float] = None,
+                 system: str = SYSTEM_US) -> ScaledRecipe:
+    """
+    Scale a recipe to a target loaf size or flour weight.
+    With neither given the recipe is converted at its own size.
+    Amounts are converted to the given unit system and rounded for display.
+    Raises ValueError if a target size is given and it, or the recipe's
+    own size, isn't a size like '1.5lb' or '900g'.
+    """
+    if flour_grams is None and target_size:
+        if not loaf_pounds(target_size):
+            raise ValueError(f"unknown loaf size '{target_size}'")
+        if not loaf_pounds(recipe.loaf_size):
+            raise ValueError(f"the recipe's loaf size '{recipe.loaf_size}' is unknown")
+    if flour_grams is not None:
+        target = ("flour", round(flour_grams, 1))
+    else:
+        target = ("size", target_size or recipe.loaf_size)
+    key = (recipe.id, recipe.revision, target, system)
+    if recipe.id is not None and key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    flour, percents, hydration = bakers_percentages(recipe)
+    factor = 1.0
+    loaf_size = recipe.loaf_size
+    if flour_grams is not None:
+        if flour > 0:
+            factor = flour_grams / flour
+        source_lb = loaf_pounds(recipe.loaf_size)
+        if source_lb:
+            loaf_size = f"{round(source_lb * factor, 2):g}lb"
+    elif target_size:
+        factor = loaf_pounds(target_size) / loaf_pounds(recipe.loaf_size)
+        loaf_size = target_size
+
+    ingredients = []
+    for ing, pct in zip(recipe.ingredients, percents):
+        parsed = parse_range(ing.amount) if ing.amount else None
+        if parsed is None or parsed[1] == 0:
+            amount_str, unit, grams = ing.amount, ing.unit, None
+        else:
+            low, high = parsed
+            amount_str, unit = scale_amount(low * factor, high * factor, ing.unit, system)
+            grams = ingredient_grams(parse_amount(ing.amount) * factor, ing.unit, ing.name)
+        ingredients.append(ScaledIngredient(
+            name=ing.name, amount=amount_str, unit=unit, grams=grams,
+            percent=pct, group_name=ing.group_name,
+        ))
+    result = ScaledRecipe(loaf_size=loaf_size, factor=factor, flour_grams=flour * factor,
+                          hydration=hydration, ingredients=tuple(ingredients))
+
+    if recipe.id is not None:
+        _cache[key] = result
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def clear_cache() -> None:
+    _cache.clear()
@@ -0,0 +1,86 @@
+"""Shopping lists aggregated over several recipes, used by ``makebread shopping``."""
+
+from dataclasses import dataclass, field
+
+from makebread.models.recipe import RecipeStore
+from makebread.utils.units import (
+    PIECE_UNITS, QTY_EMPTY, QTY_UNPARSED, SYSTEM_US, TO_GRAMS, TO_ML, convert_unit,
+    format_amount, normalize_ingredient_name, parse_amount,
+)
+
+# Aggregation kinds: canonical volume, canonical weight, a count of pieces
+# ('2 large eggs'), "#unit" for a count of some other unit ('3 cloves'), or
+# "" for amounts that couldn't be read
+_VOLUME = "ml"
+_WEIGHT = "g"
+_PIECES = "#"
+
+
+@dataclass
+class ShoppingItem:
+    name: str
+    amount: str = ""
+    unit: str = ""
+    recipe_ids: list[int] = field(default_factory=list)
+
+
+def merge_key(name: str) -> str:
+    """Key used to merge ingredient names ('Eggs ' and 'egg' are the same)."""
+    name = normalize_ingredient_name(name)
+    if len(name) > 3 and name.endswith("s") and not name.endswith("ss"):
+        name = name[:-1]
+    return name
+
+
+def build_shopping_list(store: RecipeStore, multipliers: dict[int, float],
+                        system: str = SYSTEM_US) -> list[ShoppingItem]:
+    """
+    Sum the ingredients of several recipes, each scaled by a multiplier.
+    Weights and volumes are summed by weight wherever one is known (from
+    the ingredient's density for volumes), else volumes with volumes.
+    Counted items ('2 large eggs', '1 egg') are summed as pieces, and
+    other units ('3 cloves') per unit. Amounts are converted to the given
+    unit system.
+    """
+    rows = store.get_ingredient_rows(list(multipliers))
+
+    # One pass over all rows: (key, kind) -> [display name, total, recipe ids, unit]
+    totals: dict[tuple[str, str], list] = {}
+    for row in rows:
+        factor = multipliers[row["recipe_id"]]
+        unit = row["unit"].lower().strip()
+        if row["parse_status"] in (QTY_EMPTY, QTY_UNPARSED):
+            kind, value = "", 0.0
+        elif unit in TO_GRAMS or (unit in TO_ML and row["grams"] is not None):
+            kind, value = _WEIGHT, row["grams"] * factor
+        elif unit in TO_ML:
+            kind, value = _VOLUME, row["ml"] * factor
+        elif not unit or unit in PIECE_UNITS:
+            # Only a real weight or volume unit makes a weight; an egg's
+            # estimated grams don't
+            kind, value = _PIECES, parse_amount(row["amount"]) * factor
+        else:
+            kind, value = _PIECES + merge_key(unit), parse_amount(row["amount"]) * factor
+
+        key = (merge_key(row["name"]), kind)
+        entry = totals.get(key)
+        if entry is None:
+            totals[key] = [row["name"], value, [row["recipe_id"]], row["unit"].strip()]
+        else:
+            entry[1] += value
+            if entry[2][-1] != row["recipe_id"]:
+                entry[2].append(row["recipe_id"])
+
+    items = []
+    for (_key, kind), (name, total, recipe_ids, first_unit) in totals.items():
+        if kind == _VOLUME:
+            amount, unit = convert_unit(total, "ml", system)
+        elif kind == _WEIGHT:
+            amount, unit = convert_unit(total, "g", system)
+        elif kind == _PIECES or not kind:
+            amount, unit = total, ""
+        else:
+            amount, unit = total, first_unit
+        items.append(ShoppingItem(name, format_amount(amount), unit, recipe_ids))
+    items.sort(key=lambda item: merge_key(item.name))
+    return items
@@ -0,0 +1,264 @@
+"""Similar-recipe recommendations from ingredient profiles.
+
+Each recipe becomes a sparse vector over ingredient keys. A weight is
+the square root of the ingredient's share of the recipe's weight (using
+the canonical grams/ml stored for every ingredient) times its inverse
+document frequency, so flour and water count for less than caraway.
+Vectors are normalized, and similarity is their dot product.
+
+The top neighbours of every recipe are stored in similar_recipes, so
+showing them is one indexed lookup. A signature of each recipe's
+ingredient profile is kept alongside; refresh() only recomputes the
+recipes whose signature changed, plus those whose lists they enter or
+leave, and only looks at recipes whose ingredients the change log shows
+changed since its last run: a new rating or favorite costs nothing. With NumPy installed, scores are computed a block of recipes at
+a time against per-ingredient arrays, never as a dense matrix of every
+recipe and ingredient.
+"""
+
+import hashlib
+import json
+import math
+import sqlite3
+from typing import Iterable, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from makebread.models.changes import ChangeLog
+from makebread.utils.units import ingredient_key
+
+TOP_K = 6
+MIN_SCORE = 0.2
+# A full rebuild is cheaper than incremental updates past this share of changed recipes
+FULL_REFRESH_SHARE = 0.25
+_BLOCK_ROWS = 512
+
+
+def ingredient_profiles(conn: sqlite3.Connection,
+                        recipe_ids: Optional[Iterable[int]] = None) -> dict[int, dict[str, float]]:
+    """
+    Share of each ingredient key in every live recipe, or in the given
+    ones, by weight where known.
+    """
+    sql = """
+        SELECT i.recipe_id, i.name, COALESCE(i.grams, i.ml) FROM ingredients i
+        JOIN recipes r ON r.id = i.recipe_id
+        WHERE r.deleted_at IS NULL
+    """
+    if recipe_ids is None:
+        rows = conn.execute(sql).fetchall()
+    else:
+        rows = conn.execute(sql + " AND i.recipe_id IN (SELECT value FROM json_each(?))",
+                            (json.dumps(sorted(recipe_ids)),)).fetchall()
+    items: dict[int, list[tuple[str, Optional[float]]]] = {}
+    for rid, name, quantity in rows:
+        key = ingredient_key(name)
+        if key:
+            items.setdefault(rid, []).append((key, quantity))
+    profiles = {}
+    for rid, entries in items.items():
+        n = len(entries)
+        known = [q for _k, q in entries if q]
+        total = sum(known)
+        profile: dict[str, float] = {}
+        for key, quantity in entries:
+            # Unmeasured ingredients get an even share; measured ones split
+            # the rest by weight
+            share = quantity / total * len(known) / n if quantity and total else 1 / n
+            profile[key] = profile.get(key, 0.0) + share
+        profiles[rid] = profile
+    return profiles
+
+
+def signature(profile: dict[str, float]) -> str:
+    data = json.dumps(sorted((k, round(v, 4)) for k, v in profile.items()))
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+class _Vectors:
+    """Normalized weighted vectors for a set of profiles, with dot products."""
+
+    def __init__(self, profiles: dict[int, dict[str, float]]):
+        self.ids = sorted(profiles)
+        self.row = {rid: i for i, rid in enumerate(self.ids)}
+        df: dict[str, int] = {}
+        for profile in profiles.values():
+            for key in profile:
+                df[key] = df.get(key, 0) + 1
+        n = len(self.ids)
+        # Keys in a single recipe can't make two recipes alike; they only
+        # count towards the norm
+        self.columns = {k: j for j, k in enumerate(sorted(k for k, c in df.items() if c > 1))}
+        self.sparse: list[dict[int, float]] = []
+        for rid in self.ids:
+            weights = {k: math.sqrt(s) * math.log(1 + n / df[k])
+                       for k, s in profiles[rid].items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            self.sparse.append({self.columns[k]: w / norm for k, w in weights.items()
+                                if k in self.columns})
+        self.postings: dict[int, list[tuple[int, float]]] = {}
+        for i, vec in enumerate(self.sparse):
+            for j, w in vec.items():
+                self.postings.setdefault(j, []).append((i, w))
+        # Per column: the rows using it and their weights, as arrays
+        self.arrays = None
+        if np is not None and n:
+            self.arrays = {j: (np.array([i for i, _w in p], dtype=np.intp),
+                               np.array([w for _i, w in p], dtype=np.float32))
+                           for j, p in self.postings.items()}
+
+    def top(self, rows: list[int], k: int) -> dict[int, list[tuple[int, float]]]:
+        """The k most similar recipes to each given row, as (recipe id, score)."""
+        result = {}
+        if self.arrays is not None:
+            n = len(self.ids)
+            for start in range(0, len(rows), _BLOCK_ROWS):
+                block = rows[start:start + _BLOCK_ROWS]
+                # The block's rows that use each column, and their weights
+                used: dict[int, tuple[list[int], list[float]]] = {}
+                for b, r in enumerate(block):
+                    for j, w in self.sparse[r].items():
+                        entry = used.setdefault(j, ([], []))
+                        entry[0].append(b)
+                        entry[1].append(w)
+                scores = np.zeros((len(block), n), dtype=np.float32)
+                for j, (hits, weights) in used.items():
+                    others, values = self.arrays[j]
+                    scores[np.ix_(hits, others)] += np.outer(
+                        np.array(weights, dtype=np.float32), values)
+                scores[np.arange(len(block)), block] = -1.0
+                for r, row_scores in zip(block, scores):
+                    count = min(k, len(row_scores) - 1)
+                    if count <= 0:
+                        result[self.ids[r]] = []
+                        continue
+                    best = np.argpartition(-row_scores, count - 1)[:count]
+                    best = best[np.argsort(-row_scores[best], kind="stable")]
+                    result[self.ids[r]] = [(self.ids[j], float(row_scores[j])) for j in best
+                                           if row_scores[j] >= MIN_SCORE]
+            return result
+        for r in rows:
+            scores: dict[int, float] = {}
+            for j, w in self.sparse[r].items():
+                for i, v in self.postings[j]:
+                    if i != r:
+                        scores[i] = scores.get(i, 0.0) + w * v
+            best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+            result[self.ids[r]] = [(self.ids[i], s) for i, s in best if s >= MIN_SCORE]
+        return result
+
+    def score(self, a: int, b: int) -> float:
+        va, vb = self.sparse[self.row[a]], self.sparse[self.row[b]]
+        if len(va) > len(vb):
+            va, vb = vb, va
+        return sum(w * vb.get(j, 0.0) for j, w in va.items())
+
+
+class SimilarRecipes:
+    """The similar_recipes table: lookups and incremental refreshes."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def neighbours(self, recipe_id: int) -> list[tuple[int, str, float]]:
+        """(id, name, score) of the stored neighbours of a recipe, best first."""
+        return [tuple(r) for r in self.conn.execute("""
+            SELECT s.similar_id, r.name, s.score FROM similar_recipes s
+            JOIN recipes r ON r.id = s.similar_id
+            WHERE s.recipe_id=? AND r.deleted_at IS NULL
+            ORDER BY s.rank
+        """, (recipe_id,)).fetchall()]
+
+    def _last_seq(self) -> Optional[int]:
+        row = self.conn.execute(
+            "SELECT value FROM sync_meta WHERE key='similar_seq'").fetchone()
+        return row[0] if row else None
+
+    def _candidates(self, seq: int) -> set[int]:
+        """Recipes whose ingredients changed, or that left or came back from the trash."""
+        return {rid for (rid,) in self.conn.execute("""
+            SELECT DISTINCT recipe_id FROM changes
+            WHERE seq > ? AND (table_name='ingredients'
+                               OR (table_name='recipes' AND op IN ('delete', 'restore', 'purge')))
+        """, (seq,))}
+
+    def refresh(self, full: bool = False) -> int:
+        """
+        Bring neighbour lists up to date with the recipes' ingredients.
+        Only recipes the change log shows as changed since the last refresh
+        are compared, unless full is set (or there was no last refresh).
+        Returns the number of lists recomputed.
+        """
+        # Read first: changes made while we compute are seen next time
+        seq = ChangeLog(self.conn).latest_seq()
+        last = None if full else self._last_seq()
+        stored = dict(self.conn.execute("SELECT recipe_id, signature FROM recipe_signatures"))
+        if last is None:
+            profiles = ingredient_profiles(self.conn)
+            candidates = set(profiles) | set(stored)
+        else:
+            candidates = self._candidates(last)
+            profiles = ingredient_profiles(self.conn, candidates) if candidates else {}
+        signatures = {rid: signature(p) for rid, p in profiles.items()}
+        changed = {rid for rid, sig in signatures.items() if stored.get(rid) != sig}
+        removed = {rid for rid in candidates if rid in stored and rid not in signatures}
+        if not changed and not removed:
+            with self.conn:
+                self._set_last_seq(seq)
+            return 0
+        if last is not None:
+            # Weights depend on every recipe, so scoring needs them all
+            profiles = ingredient_profiles(self.conn)
+        vectors = _Vectors(profiles)
+        if full or not stored or len(changed) + len(removed) > FULL_REFRESH_SHARE * len(profiles):
+            todo = set(profiles)
+        else:
+            todo = self._affected(vectors, changed, removed)
+        lists = vectors.top([vectors.row[rid] for rid in sorted(todo)], TOP_K)
+
+        with self.conn:
+            self.conn.executemany("DELETE FROM similar_recipes WHERE recipe_id=?",
+                                  [(rid,) for rid in (*todo, *removed)])
+            self.conn.executemany(
+                "INSERT INTO similar_recipes (recipe_id, rank, similar_id, score) "
+                "VALUES (?, ?, ?, ?)",
+                [(rid, rank, other, round(score, 4))
+                 for rid, neighbours in lists.items()
+                 for rank, (other, score) in enumerate(neighbours)],
+            )
+            self.conn.executemany("DELETE FROM recipe_signatures WHERE recipe_id=?",
+                                  [(rid,) for rid in removed])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO recipe_signatures (recipe_id, signature) VALUES (?, ?)",
+                [(rid, signatures[rid]) for rid in changed],
+            )
+            self._set_last_seq(seq)
+        return len(lists)
+
+    def _set_last_seq(self, seq: int) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sync_meta (key, value) VALUES ('similar_seq', ?)", (seq,))
+
+    def _affected(self, vectors: _Vectors, changed: set[int], removed: set[int]) -> set[int]:
+        """Changed recipes, plus the lists they were in or might now enter."""
+        todo = set(changed)
+        gone = changed | removed
+        lists: dict[int, list[tuple[int, float]]] = {}
+        for rid, other, score in self.conn.execute(
+                "SELECT recipe_id, similar_id, score FROM similar_recipes ORDER BY recipe_id, rank"):
+            lists.setdefault(rid, []).append((other, score))
+        for rid in vectors.ids:
+            if rid in todo:
+                continue
+            entries = lists.get(rid, [])
+            if any(other in gone for other, _s in entries):
+                todo.add(rid)
+                continue
+            # Enters the list if it beats the weakest entry of a full list
+            floor = entries[-1][1] if len(entries) >= TOP_K else MIN_SCORE
+            if any(vectors.score(rid, c) > floor for c in changed):
+                todo.add(rid)
+        return todo
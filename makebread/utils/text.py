@@ -0,0 +1,45 @@
+"""Text folding, LIKE patterns and edit distance for search."""
+
+import unicodedata
+
+
+def fold_text(text: str) -> str:
+    """Lowercase and strip diacritics ('Rågbröd' -> 'ragbrod')."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def like_pattern(text: str) -> str:
+    """A LIKE pattern matching text anywhere, with wildcards escaped (ESCAPE '\\')."""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def edit_distance(a: str, b: str, limit: int = 3) -> int:
+    """
+    Damerau-Levenshtein distance (adjacent swaps count as one edit),
+    or limit + 1 as soon as it is known to exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: list[int] = []
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return min(prev[-1], limit + 1)
+
+
+def word_distance(query_word: str, word: str, limit: int = 3) -> int:
+    """Edit distance to a word or to its start, so 'sourdo' is close to 'sourdough'."""
+    whole = edit_distance(query_word, word, limit)
+    if len(word) <= len(query_word) or whole == 0:
+        return whole
+    return min(whole, edit_distance(query_word, word[:len(query_word)], limit))
@@ -0,0 +1,127 @@
+"""Downsampled recipe photos in a size-bounded disk cache."""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import gi
+gi.require_version("GdkPixbuf", "2.0")
+from gi.repository import GdkPixbuf, GLib
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def get_thumbnail_dir() -> Path:
+    """Get the thumbnail cache directory (XDG-compatible)."""
+    cache_home = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    cache_dir = cache_home / "makebread" / "thumbnails"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+class ThumbnailCache:
+    """
+    PNG thumbnails keyed by the source image's content hash and the
+    requested size, evicted least-recently-used once the cache grows past
+    max_bytes. Thread-safe: decoding is meant to run on worker threads.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or get_thumbnail_dir()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # (path, mtime, size) -> content hash, so unchanged files aren't re-read
+        self._hashes: dict[tuple, str] = {}
+        # Cached file name -> size in bytes, oldest use first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._scan()
+
+    def _scan(self) -> None:
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".png") and entry.is_file():
+                st = entry.stat()
+                files.append((st.st_mtime, entry.name, st.st_size))
+        for _mtime, name, size in sorted(files):
+            self._entries[name] = size
+            self._total += size
+
+    def _content_hash(self, image_path: str) -> Optional[str]:
+        try:
+            st = os.stat(image_path)
+        except OSError:
+            return None
+        key = (image_path, st.st_mtime_ns, st.st_size)
+        digest = self._hashes.get(key)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(image_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            digest = h.hexdigest()
+            self._hashes[key] = digest
+        return digest
+
+    def get(self, image_path: str, size: int) -> Optional[Path]:
+        """
+        Path of a PNG thumbnail at most size pixels on its longest side,
+        decoding and caching it on a miss. Returns None if the image is
+        missing or can't be decoded. Slow on a miss: call off the UI thread.
+        """
+        if not image_path:
+            return None
+        try:
+            digest = self._content_hash(image_path)
+        except OSError:
+            return None
+        if digest is None:
+            return None
+        name = f"{digest}-{size}.png"
+        path = self.cache_dir / name
+
+        with self._lock:
+            if name in self._entries and path.exists():
+                self._entries.move_to_end(name)
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                return path
+
+        try:
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(image_path, size, size, True)
+            pixbuf = pixbuf.apply_embedded_orientation() or pixbuf
+            tmp = path.with_name(f".{name}.{threading.get_ident()}.tmp")
+            pixbuf.savev(str(tmp), "png", [], [])
+            os.replace(tmp, path)
+        except (GLib.Error, OSError):
+            return None
+
+        written = path.stat().st_size
+        with self._lock:
+            self._total += written - self._entries.pop(name, 0)
+            self._entries[name] = written
+            self._evict()
+        return path
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(self.cache_dir / name)
+            except OSError:
+                pass
+
+    def set_max_bytes(self, max_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
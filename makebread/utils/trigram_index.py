@@ -0,0 +1,221 @@
+"""In-memory trigram index for instant type-ahead filtering."""
+
+import heapq
+import json
+import os
+import re
+import sqlite3
+from pathlib import Path
+from typing import Optional
+
+from makebread.models.recipe import Recipe, RecipeStore, RecipeSummary
+from makebread.models.sync import current_seq, library_id
+from makebread.utils.text import fold_text
+
+# Queries using search syntax are left to the SQL search
+_COMPLEX = re.compile(r'["*:()^]|\b(?:AND|OR|NOT|NEAR)\b')
+_MAX_TERMS = 6
+# Share of trigrams a fuzzy match must have in common with the query
+_FUZZY_THRESHOLD = 0.5
+
+
+def trigrams(word: str) -> set[str]:
+    """Trigrams of a word padded with spaces, so short prefixes can match."""
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def get_cache_path() -> Path:
+    cache_dir = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "makebread"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir / "trigram-index.json"
+
+
+def library_signature(conn: sqlite3.Connection) -> list:
+    """
+    Fingerprint that changes whenever any recipe is saved or deleted: the
+    library's id and its change sequence, which every such change bumps.
+    """
+    return [library_id(conn), current_seq(conn)]
+
+
+class TrigramIndex:
+    """
+    Trigram postings over recipe names, tags and ingredient names.
+
+    Answers substring and typo-tolerant queries without touching the
+    database. search() returns None for queries it can't answer well
+    (search syntax, single characters), and callers should then fall back
+    to RecipeStore.search.
+    """
+
+    def __init__(self):
+        self._summaries: dict[int, RecipeSummary] = {}
+        self._names: dict[int, str] = {}
+        self._texts: dict[int, str] = {}
+        self._postings: dict[str, set[int]] = {}
+        self.signature: Optional[list] = None
+        self.dirty = False
+
+    def __len__(self):
+        return len(self._summaries)
+
+    # --- building ---
+
+    @classmethod
+    def build(cls, store: RecipeStore) -> "TrigramIndex":
+        """Build the index from the database in two queries."""
+        index = cls()
+        ingredients: dict[int, list[str]] = {}
+        for rid, name in store.conn.execute("SELECT recipe_id, name FROM ingredients"):
+            ingredients.setdefault(rid, []).append(name)
+        rows = store.conn.execute(
+            "SELECT id, name, favorite, rating, version, image_path, change_seq, tags "
+            "FROM recipes WHERE deleted_at IS NULL"
+        ).fetchall()
+        for row in rows:
+            summary = RecipeSummary(row[0], row[1], bool(row[2]), row[3], row[4], row[5] or "",
+                                    row[6])
+            tags = json.loads(row[7]) if row[7] else []
+            index.add(summary, tags, ingredients.get(row[0], []))
+        index.signature = library_signature(store.conn)
+        index.dirty = True
+        return index
+
+    @classmethod
+    def load_or_build(cls, store: RecipeStore, path: Optional[Path] = None) -> "TrigramIndex":
+        """Load the cached index if it matches the library, else rebuild it."""
+        path = path or get_cache_path()
+        signature = library_signature(store.conn)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("signature") == signature:
+                return cls._from_dict(data)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return cls.build(store)
+
+    def save(self, path: Optional[Path] = None) -> None:
+        """Write the index to the cache file."""
+        path = path or get_cache_path()
+        data = {
+            "signature": self.signature,
+            "recipes": [[s.id, s.name, s.favorite, s.rating, s.version, s.image_path,
+                         s.revision, self._texts[s.id]]
+                        for s in self._summaries.values()],
+            "postings": {gram: sorted(ids) for gram, ids in self._postings.items()},
+        }
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+        self.dirty = False
+
+    @classmethod
+    def _from_dict(cls, data: dict) -> "TrigramIndex":
+        index = cls()
+        for rid, name, favorite, rating, version, image_path, revision, text in data["recipes"]:
+            index._summaries[rid] = RecipeSummary(rid, name, favorite, rating, version,
+                                                  image_path, revision)
+            index._names[rid] = fold_text(name)
+            index._texts[rid] = text
+        index._postings = {gram: set(ids) for gram, ids in data["postings"].items()}
+        index.signature = data["signature"]
+        return index
+
+    # --- incremental updates ---
+
+    def add(self, summary: RecipeSummary, tags: list[str], ingredient_names: list[str]) -> None:
+        self.remove(summary.id)
+        text = fold_text(" ".join([summary.name, *tags, *ingredient_names]))
+        self._summaries[summary.id] = summary
+        self._names[summary.id] = fold_text(summary.name)
+        self._texts[summary.id] = text
+        for word in set(text.split()):
+            for gram in trigrams(word):
+                self._postings.setdefault(gram, set()).add(summary.id)
+        self.dirty = True
+
+    def update_recipe(self, recipe: Recipe) -> None:
+        """Re-index a saved recipe."""
+        summary = RecipeSummary(recipe.id, recipe.name, recipe.favorite, recipe.rating,
+                                recipe.version, recipe.image_path, recipe.revision)
+        self.add(summary, recipe.tags, [i.name for i in recipe.ingredients])
+
+    def remove(self, recipe_id: int) -> None:
+        text = self._texts.pop(recipe_id, None)
+        if text is None:
+            return
+        del self._summaries[recipe_id]
+        del self._names[recipe_id]
+        for word in set(text.split()):
+            for gram in trigrams(word):
+                ids = self._postings.get(gram)
+                if ids is not None:
+                    ids.discard(recipe_id)
+                    if not ids:
+                        del self._postings[gram]
+        self.dirty = True
+
+    # --- queries ---
+
+    def search(self, query: str, limit: int = 500) -> Optional[list[RecipeSummary]]:
+        """
+        Recipes matching every word of the query as a substring, or, if
+        nothing matches exactly, recipes sharing most of the query's
+        trigrams. Returns None if the query should go to the SQL search.
+        """
+        if _COMPLEX.search(query):
+            return None
+        words = fold_text(query).split()
+        if not words or len(words) > _MAX_TERMS or any(len(w) < 2 for w in words):
+            return None
+
+        candidates = None
+        for word in words:
+            grams = trigrams(word)
+            # Inner trigrams only: the query word may sit inside a longer word
+            inner = {g for g in grams if " " not in g} or {f" {word}"}
+            sets = sorted((self._postings.get(g, set()) for g in inner), key=len)
+            found = sets[0].intersection(*sets[1:])
+            candidates = found if candidates is None else candidates & found
+            if not candidates:
+                break
+        texts = self._texts
+        exact = [rid for rid in candidates or ()
+                 if all(w in texts[rid] for w in words)]
+        if exact:
+            return self._rank(exact, words, limit)
+        return self._fuzzy(words, limit)
+
+    def _fuzzy(self, words: list[str], limit: int) -> list[RecipeSummary]:
+        scores: dict[int, float] = {}
+        for word in words:
+            grams = trigrams(word)
+            hits: dict[int, int] = {}
+            for gram in grams:
+                for rid in self._postings.get(gram, ()):
+                    hits[rid] = hits.get(rid, 0) + 1
+            for rid, count in hits.items():
+                share = count / len(grams)
+                if share >= _FUZZY_THRESHOLD:
+                    scores[rid] = scores.get(rid, 0.0) + share
+        # Every word must have matched approximately
+        needed = len(words) * _FUZZY_THRESHOLD
+        matches = [rid for rid, score in scores.items() if score >= needed]
+        top = heapq.nsmallest(limit, matches, key=lambda rid: (-scores[rid], self._names[rid]))
+        return [self._summaries[rid] for rid in top]
+
+    def _rank(self, ids: list[int], words: list[str], limit: int) -> list[RecipeSummary]:
+        # Matches in the name first, then matches in tags or ingredients;
+        # alphabetical within each group
+        names = self._names
+        in_name, elsewhere = [], []
+        for rid in ids:
+            name = names[rid]
+            (in_name if all(w in name for w in words) else elsewhere).append(rid)
+        top = heapq.nsmallest(limit, in_name, key=names.__getitem__)
+        if len(top) < limit:
+            top += heapq.nsmallest(limit - len(top), elsewhere, key=names.__getitem__)
+        return [self._summaries[rid] for rid in top]
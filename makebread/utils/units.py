@@ -1,7 +1,10 @@
 """Unit conversion for recipe measurements."""
 
-from fractions import Fraction
+import re
+from functools import lru_cache
+from typing import Optional
 from makebread.i18n import _
+from makebread.utils.amounts import parse_range, parse_value
 
 # Unit systems
 SYSTEM_US = "us"
@@ -56,34 +59,83 @@ TO_GRAMS = {
 KEEP_UNITS = {"tsp", "teaspoon", "teaspoons", "tbsp", "tbs", "tablespoon", "tablespoons",
               "pinch", "dash", "piece", "pieces", "slice", "slices",
               "clove", "cloves", "packet", "packets", "package", "packages",
-              "envelope", "envelopes", "can", "cans"}
+              "envelope", "envelopes", "sachet", "sachets", "can", "cans",
+              "jar", "jars", "stick", "sticks", "sprig", "sprigs", "bunch", "bunches"}
+
+# Approximate densities (g per ml) used to put volume measures on a weight
+# basis. Matched against the ingredient name, longest key first.
+INGREDIENT_DENSITY = {
+    "flour": 0.53, "bread flour": 0.54, "whole wheat flour": 0.51,
+    "rye flour": 0.43, "spelt flour": 0.5, "cornmeal": 0.58, "oats": 0.38,
+    "water": 1.0, "milk": 1.03, "buttermilk": 1.03, "dry milk": 0.45,
+    "beer": 1.0, "juice": 1.04, "yogurt": 1.03, "cream": 1.0,
+    "butter": 0.96, "oil": 0.92, "honey": 1.42, "molasses": 1.4,
+    "syrup": 1.33, "sugar": 0.85, "brown sugar": 0.93,
+    "salt": 1.2, "yeast": 0.6, "gluten": 0.6, "cocoa": 0.42,
+}
+
+# Units that only describe a counted item ('2 large eggs' is two eggs)
+PIECE_UNITS = {"piece", "pieces", "whole", "large", "medium", "small"}
+
+# Typical weight of countable ingredients (g per piece)
+PIECE_GRAMS = {"egg": 50.0, "yolk": 18.0, "egg white": 32.0}
+
+# Water content of liquid ingredients, for hydration figures
+WATER_CONTENT = {
+    "water": 1.0, "milk": 0.87, "buttermilk": 0.9, "beer": 0.92,
+    "juice": 0.88, "yogurt": 0.85, "cream": 0.6, "egg": 0.75,
+    "yolk": 0.5, "egg white": 0.88,
+}
+
+
+def normalize_ingredient_name(name: str) -> str:
+    """Normalize an ingredient name for matching ('Bread  Flour' -> 'bread flour')."""
+    return " ".join(name.lower().split())
+
+
+_QUALIFIER = re.compile(r"\s*[,(].*$")
+
+
+def ingredient_key(name: str) -> str:
+    """The matching key of an ingredient: 'Butter, softened' -> 'butter'."""
+    return normalize_ingredient_name(_QUALIFIER.sub("", name))
+
+
+def lookup_ingredient(table: dict, name: str):
+    """Look up the longest key of *table* contained in an ingredient name."""
+    name = normalize_ingredient_name(name)
+    best = None
+    for key in table:
+        if key in name and (best is None or len(key) > len(best)):
+            best = key
+    return table[best] if best is not None else None
+
+
+def try_parse_amount(amount_str: str) -> Optional[float]:
+    """Parse an amount string like '1 1/2' or '2/3'. Returns None if unparseable."""
+    return parse_value(amount_str)
 
 
 def parse_amount(amount_str: str) -> float:
     """Parse an amount string like '1 1/2' or '2/3' to a float."""
-    if not amount_str or not amount_str.strip():
-        return 0.0
-    parts = amount_str.strip().split()
-    total = 0.0
-    for part in parts:
-        try:
-            total += float(Fraction(part))
-        except (ValueError, ZeroDivisionError):
-            try:
-                total += float(part)
-            except ValueError:
-                return 0.0
-    return total
+    value = parse_value(amount_str)
+    return 0.0 if value is None else value
 
 
 def format_amount(value: float) -> str:
     """Format a float to a nice display string (fractions for small values)."""
+    # Round the cache key so near-identical converted values share an entry
+    return _format_amount(round(value, 4))
+
+
+@lru_cache(maxsize=2048)
+def _format_amount(value: float) -> str:
     if value == 0:
         return ""
     if value == int(value):
         return str(int(value))
     # Try common fractions
-    for denom in [2, 3, 4, 8]:
+    for denom in (2, 3, 4, 8):
         numer = round(value * denom)
         if abs(numer / denom - value) < 0.01:
             whole = numer // denom
@@ -97,6 +149,17 @@ def format_amount(value: float) -> str:
     return f"{value:.1f}"
 
 
+def format_range(low: float, high: float) -> str:
+    """
+    Format a range ('1 1/2–2'). Both ends follow the same rule: if either
+    one is only shown as a decimal, both are.
+    """
+    low_str, high_str = format_amount(low) or "0", format_amount(high)
+    if "." in low_str + high_str and "/" in low_str + high_str:
+        low_str, high_str = f"{low:.1f}", f"{high:.1f}"
+    return f"{low_str}–{high_str}"
+
+
 def convert_unit(amount: float, from_unit: str, to_system: str) -> tuple[float, str]:
     """
     Convert an amount from one unit to the target system.
@@ -146,14 +209,74 @@ def convert_unit(amount: float, from_unit: str, to_system: str) -> tuple[float,
     return amount, from_unit
 
 
+# Parse status of normalized ingredient quantities
+QTY_EMPTY = 0       # no amount given
+QTY_OK = 1          # measured by weight or volume
+QTY_UNPARSED = 2    # amount could not be parsed
+QTY_NO_BASIS = 3    # amount parsed, but no weight or volume is known
+QTY_ESTIMATED = 4   # measured by volume or count, grams estimated from density
+
+
+def normalize_quantity(amount_str: str, unit: str,
+                       name: str = "") -> tuple[Optional[float], Optional[float], int]:
+    """
+    Normalize an ingredient measure to canonical units.
+    Returns (grams, ml, status). ml is set for volume units; grams for weight
+    units, or estimated from the ingredient density when one is known.
+    """
+    if not amount_str or not amount_str.strip():
+        return None, None, QTY_EMPTY
+    amount = try_parse_amount(amount_str)
+    if amount is None:
+        return None, None, QTY_UNPARSED
+    unit_lower = unit.lower().strip()
+    if unit_lower in TO_GRAMS:
+        return amount * TO_GRAMS[unit_lower], None, QTY_OK
+    grams = ingredient_grams(amount, unit, name) if name else None
+    if unit_lower in TO_ML:
+        ml = amount * TO_ML[unit_lower]
+        return grams, ml, QTY_OK if grams is None else QTY_ESTIMATED
+    if grams is not None:
+        return grams, None, QTY_ESTIMATED
+    return None, None, QTY_NO_BASIS
+
+
+def ingredient_grams(amount: float, unit: str, name: str) -> Optional[float]:
+    """
+    Estimate the weight in grams of an ingredient measure.
+    Returns None if the unit or ingredient has no known weight basis.
+    """
+    unit_lower = unit.lower().strip()
+    if unit_lower in TO_GRAMS:
+        return amount * TO_GRAMS[unit_lower]
+    if unit_lower in TO_ML:
+        density = lookup_ingredient(INGREDIENT_DENSITY, name)
+        if density is None:
+            return None
+        return amount * TO_ML[unit_lower] * density
+    if not unit_lower or unit_lower in PIECE_UNITS:
+        piece = lookup_ingredient(PIECE_GRAMS, name)
+        if piece is not None:
+            return amount * piece
+    return None
+
+
 def convert_ingredient(amount_str: str, unit: str, to_system: str) -> tuple[str, str]:
     """
     Convert an ingredient's amount and unit to the target system.
     Returns (new_amount_str, new_unit).
     """
-    amount = parse_amount(amount_str)
-    if amount == 0:
+    parsed = parse_range(amount_str) if amount_str else None
+    if parsed is None or parsed[1] == 0:
         return amount_str, unit
+    return convert_range(*parsed, unit, to_system)
+
 
-    new_amount, new_unit = convert_unit(amount, unit, to_system)
-    return format_amount(new_amount), new_unit
+def convert_range(low: float, high: float, unit: str, to_system: str) -> tuple[str, str]:
+    """Convert an amount or range (low == high for a single amount) for display."""
+    new_high, new_unit = convert_unit(high, unit, to_system)
+    if low == high:
+        return format_amount(new_high), new_unit
+    # Convert both ends of a range into the unit picked for the upper bound
+    new_low = low * new_high / high
+    return format_range(new_low, new_high), new_unit
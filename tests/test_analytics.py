@@ -0,0 +1,47 @@
+"""Ingredient analytics: normalized names, per-loaf totals, index use."""
+
+import pytest
+
+from makebread.models.database import get_connection, init_db
+from makebread.models.recipe import Ingredient, Recipe, RecipeStore
+
+
+@pytest.fixture
+def store():
+    conn = get_connection(":memory:")
+    init_db(conn)
+    store = RecipeStore(conn)
+    store.save(Recipe(name="Salted", ingredients=[
+        Ingredient(amount="6", unit="g", name="Salt"),
+        Ingredient(amount="2", unit="g", name="salt, flaky"),
+        Ingredient(amount="50", unit="g", name="Salted butter")]))
+    store.save(Recipe(name="Plain", ingredients=[
+        Ingredient(amount="10", unit="g", name="salt flakes")]))
+    trashed = store.save(Recipe(name="Gone", ingredients=[
+        Ingredient(amount="100", unit="g", name="salt")]))
+    store.delete(trashed)
+    return store
+
+
+def test_stats_average_per_loaf(store):
+    stats = store.ingredient_stats("salt")
+    assert stats["recipes"] == 2
+    assert stats["avg_grams"] == pytest.approx(9)
+    assert stats["min_grams"] == pytest.approx(8)
+    assert stats["max_grams"] == pytest.approx(10)
+
+
+def test_amount_search_matches_the_name_and_its_longer_forms(store):
+    found = {r.name for r in store.find_by_ingredient_amount("SALT", min_grams=5)}
+    assert found == {"Salted", "Plain"}
+
+
+@pytest.mark.parametrize("method", ["ingredient_stats", "find_by_ingredient_amount"])
+def test_queries_use_a_name_index(store, method):
+    traced = []
+    store.conn.set_trace_callback(traced.append)
+    getattr(store, method)("salt")
+    store.conn.set_trace_callback(None)
+    sql = next(s for s in traced if "name_key" in s)
+    plan = " ".join(str(tuple(row)) for row in store.conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+    assert "idx_ingredients_name_" in plan
@@ -0,0 +1,122 @@
+"""The change log: what the triggers record, and compaction."""
+
+import pytest
+
+from makebread.models.changes import ChangeLog
+from makebread.models.database import get_connection, init_db
+from makebread.models.recipe import Ingredient, Instruction, Recipe, RecipeStore
+
+
+@pytest.fixture
+def store():
+    conn = get_connection(":memory:")
+    init_db(conn)
+    return RecipeStore(conn)
+
+
+@pytest.fixture
+def log(store):
+    return ChangeLog(store.conn)
+
+
+def ops(log: ChangeLog, seq: int) -> list[tuple[str, str]]:
+    return [(c.table, c.op) for c in log.since(seq)]
+
+
+def test_insert(store, log):
+    rid = store.save(Recipe(name="Rye", tags=["sour"], instructions=[Instruction(1, "Bake")],
+                            ingredients=[Ingredient(amount="500", unit="g", name="rye flour")]))
+    changes = list(log.since(0))
+    assert {c.recipe_id for c in changes} == {rid}
+    assert (changes[0].table, changes[0].op) == ("recipes", "insert")
+    assert {(c.table, c.op) for c in changes[1:]} >= {("ingredients", "insert"),
+                                                     ("instructions", "insert")}
+    assert log.latest_seq() == changes[-1].seq
+    assert log.changed_recipes(0) == {rid: "live"}
+
+
+def test_update_logs_the_rows_that_changed(store, log):
+    rid = store.save(Recipe(name="Rye", ingredients=[Ingredient(name="rye flour")]))
+    seq = log.latest_seq()
+    recipe = store.get(rid)
+    recipe.description = "Dense"
+    store.save(recipe)
+    assert ("recipes", "update") in ops(log, seq)
+
+    seq = log.latest_seq()
+    store.set_rating(rid, 4)
+    assert ops(log, seq) == [("recipes", "update")]
+
+
+def test_trash_restore_and_purge(store, log):
+    rid = store.save(Recipe(name="Rye"))
+    seq = log.latest_seq()
+
+    store.delete(rid)
+    assert ops(log, seq) == [("recipes", "delete")]
+    assert log.changed_recipes(seq) == {rid: "deleted"}
+
+    store.restore(rid)
+    assert ops(log, seq)[-1] == ("recipes", "restore")
+    assert log.changed_recipes(seq) == {rid: "live"}
+
+    store.conn.execute("DELETE FROM recipes WHERE id=?", (rid,))
+    store.conn.commit()
+    assert ops(log, seq)[-1] == ("recipes", "purge")
+    assert log.changed_recipes(seq) == {rid: "purged"}
+
+
+def test_tag_changes_carry_what_was_added_and_removed(store, log):
+    rid = store.save(Recipe(name="Rye", tags=["sour", "dark"]))
+    seq = log.latest_seq()
+    recipe = store.get(rid)
+    recipe.tags = ["dark", "seeded"]
+    store.save(recipe)
+    tags = [c for c in log.since(seq) if c.table == "tags"]
+    assert len(tags) == 1
+    assert tags[0].op == "update" and tags[0].recipe_id == rid
+    assert tags[0].data == {"added": ["seeded"], "removed": ["sour"]}
+
+    seq = log.latest_seq()
+    recipe.description = "Unchanged tags"
+    store.save(recipe)
+    assert not [c for c in log.since(seq) if c.table == "tags"]
+
+
+def test_since_pages_in_order(store, log):
+    for name in ("A", "B", "C"):
+        store.save(Recipe(name=name))
+    first = list(log.since(0, limit=2))
+    rest = list(log.since(first[-1].seq))
+    assert [c.seq for c in first + rest] == sorted(c.seq for c in log.since(0))
+
+
+def test_compact_keeps_changed_recipes_stable(store, log):
+    rye = store.save(Recipe(name="Rye", ingredients=[Ingredient(name="rye flour")]))
+    spelt = store.save(Recipe(name="Spelt", ingredients=[Ingredient(name="spelt flour")]))
+    store.set_rating(rye, 3)
+    store.delete(spelt)
+    white = store.save(Recipe(name="White"))
+    store.set_favorite(rye, True)
+    store.conn.execute("DELETE FROM recipes WHERE id=?", (white,))
+    store.conn.commit()
+
+    latest = log.latest_seq()
+    before = {seq: list(log.changed_recipes(seq).items()) for seq in range(latest + 1)}
+    store.conn.execute("UPDATE changes SET changed_at=datetime('now', '-60 days')")
+    store.conn.commit()
+
+    removed = log.compact(30)
+    assert removed > 0
+    assert log.latest_seq() == latest
+    assert len(list(log.since(0))) == 3
+    after = {seq: list(log.changed_recipes(seq).items()) for seq in range(latest + 1)}
+    assert after == before
+
+
+def test_compact_leaves_recent_changes(store, log):
+    rid = store.save(Recipe(name="Rye", ingredients=[Ingredient(name="rye flour")]))
+    store.set_rating(rid, 3)
+    count = len(list(log.since(0)))
+    assert log.compact(30) == 0
+    assert len(list(log.since(0))) == count
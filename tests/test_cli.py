@@ -0,0 +1,117 @@
+"""The headless CLI, run as a user would: JSON lines out, and no GTK."""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Runs the entry point, then reports on stderr whether GTK was imported
+_SCRIPT = """
+import atexit, sys
+atexit.register(lambda: sys.stderr.write(
+    "GTK LOADED\\n" if "gi" in sys.modules or "makebread.ui" in sys.modules else ""))
+from makebread.__main__ import main
+sys.argv[0] = "makebread"
+main()
+"""
+
+WHITE = {"name": "White", "loaf_size": "1.5lb", "category": "white", "ingredients": [
+    {"amount": "500", "unit": "g", "name": "bread flour"},
+    {"amount": "320", "unit": "g", "name": "water"},
+    {"amount": "1", "unit": "large", "name": "egg"},
+    {"amount": "10", "unit": "g", "name": "salt"}]}
+RYE = {"name": "Rye", "loaf_size": "2lb", "category": "rye", "ingredients": [
+    {"amount": "400", "unit": "g", "name": "rye flour"},
+    {"amount": "300", "unit": "g", "name": "water"},
+    {"amount": "2", "unit": "", "name": "eggs"},
+    {"amount": "8", "unit": "g", "name": "salt"}]}
+
+
+def run(tmp_path: Path, *args: str, code: int = 0) -> list[dict]:
+    env = {**os.environ, "PYTHONPATH": str(ROOT), "HOME": str(tmp_path)}
+    result = subprocess.run(
+        [sys.executable, "-c", _SCRIPT, "--db", str(tmp_path / "recipes.db"), *args],
+        capture_output=True, text=True, env=env, timeout=60)
+    assert "GTK LOADED" not in result.stderr
+    assert result.returncode == code, result.stderr
+    stream = result.stdout if code == 0 else result.stderr
+    return [json.loads(line) for line in stream.splitlines() if line.startswith("{")]
+
+
+@pytest.fixture
+def library(tmp_path):
+    path = tmp_path / "recipes.json"
+    path.write_text(json.dumps([WHITE, RYE]))
+    assert run(tmp_path, "import", str(path)) == [{"file": str(path), "imported": 2}]
+    return tmp_path
+
+
+def test_export_since_streams_only_new_changes(library):
+    *recipes, last = run(library, "export", "--since", "0")
+    assert sorted(r["name"] for r in recipes) == ["Rye", "White"]
+    assert all(isinstance(r["id"], int) for r in recipes)
+
+    spelt = library / "spelt.json"
+    spelt.write_text(json.dumps([{"name": "Spelt", "ingredients": []}]))
+    run(library, "import", str(spelt))
+    lines = run(library, "export", "--since", str(last["seq"]))
+    assert [line.get("name") for line in lines[:-1]] == ["Spelt"]
+    assert lines[-1]["seq"] > last["seq"]
+
+
+def test_search(library):
+    assert [(r["name"], r["favorite"], r["rating"]) for r in run(library, "search", "rye")] == [
+        ("Rye", False, 0)]
+
+
+def test_stats(library):
+    stats, = run(library, "stats")
+    assert stats["recipes"] == 2 and stats["ingredients"] == 8
+    assert stats["categories"] == {"rye": 1, "white": 1}
+    salt, = run(library, "stats", "--ingredient", "salt")
+    assert salt["recipes"] == 2 and salt["avg_grams"] == pytest.approx(9)
+
+
+def test_pantry(library):
+    lines = run(library, "pantry", "bread flour", "water", "egg", "salt")
+    assert lines[0]["name"] == "White" and lines[0]["missing"] == []
+    assert set(lines[0]) == {"id", "name", "have", "missing"}
+
+
+def test_scale(library):
+    white = next(r for r in run(library, "search", "white"))
+    scaled, = run(library, "scale", str(white["id"]), "--size", "900g")
+    assert scaled["name"] == "White" and scaled["factor"] > 1
+    assert {i["name"] for i in scaled["ingredients"]} >= {"bread flour", "water"}
+
+
+def test_shopping(library):
+    ids = [r["id"] for r in run(library, "export", "--since", "0")[:-1]]
+    items = {i["name"]: i for i in run(library, "shopping", f"{ids[0]}x2", str(ids[1]))}
+    assert items["egg"]["amount"] == "4" and items["egg"]["unit"] == ""
+    assert items["salt"]["unit"] == "g" and sorted(items["salt"]["recipe_ids"]) == sorted(ids)
+
+
+def test_errors_go_to_stderr(library):
+    assert run(library, "scale", "999", code=1) == [{"error": "no such recipe", "id": 999}]
+
+
+@pytest.mark.parametrize("flag", ["-h", "--help"])
+def test_help_is_the_cli_help(tmp_path, flag):
+    env = {**os.environ, "PYTHONPATH": str(ROOT), "HOME": str(tmp_path)}
+    result = subprocess.run([sys.executable, "-c", _SCRIPT, flag],
+                            capture_output=True, text=True, env=env, timeout=60)
+    assert result.returncode == 0
+    assert "GTK LOADED" not in result.stderr
+    assert "usage: makebread" in result.stdout
+
+
+def test_unreadable_size_is_an_error(library):
+    white = next(r for r in run(library, "search", "white"))
+    assert run(library, "scale", str(white["id"]), "--size", "huge", code=1) == [
+        {"error": "unknown loaf size 'huge'", "id": white["id"]}]
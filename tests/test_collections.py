@@ -0,0 +1,131 @@
+"""Smart collections: the filter expression parser and stored membership."""
+
+import pytest
+
+from makebread.models.collection import CollectionError, CollectionStore, compile_filter
+from makebread.models.database import get_connection, init_db
+from makebread.models.recipe import Ingredient, Recipe, RecipeStore
+
+
+@pytest.fixture
+def store():
+    conn = get_connection(":memory:")
+    init_db(conn)
+    store = RecipeStore(conn)
+    for recipe in (
+        Recipe(name="Quick white", category="white", total_time_min=60, rating=4,
+               tags=["everyday"], ingredients=[Ingredient(name="bread flour")]),
+        Recipe(name="Dark rye", category="rye", total_time_min=210, rating=5,
+               favorite=True, tags=["Sourdough"], ingredients=[Ingredient(name="rye flour")]),
+        Recipe(name="Brioche", category="sweet", total_time_min=180, rating=3,
+               tags=["sweet"], ingredients=[Ingredient(name="butter"),
+                                            Ingredient(name="bread flour")]),
+        Recipe(name="50% spelt", category="wheat", total_time_min=120,
+               ingredients=[Ingredient(name="spelt flour")]),
+    ):
+        store.save(recipe)
+    return store
+
+
+def names(store: RecipeStore, expression: str) -> list[str]:
+    where, params = compile_filter(expression)
+    return [row[0] for row in store.conn.execute(
+        f"SELECT name FROM recipes WHERE {where} ORDER BY name", params)]
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("rye", ["Dark rye"]),
+    ("category:rye", ["Dark rye"]),
+    ("time<=90", ["Quick white"]),
+    ("time>100 rating>=4", ["Dark rye"]),
+    ("favorite", ["Dark rye"]),
+    ("favourite=no time<200", ["50% spelt", "Brioche", "Quick white"]),
+    ("tag:sourdough", ["Dark rye"]),
+    ("tag!=sweet rating>0", ["Dark rye", "Quick white"]),
+    ('ingredient:"bread flour"', ["Brioche", "Quick white"]),
+    ("ingredient=flour", []),
+    ("name:rye or ingredient:butter", ["Brioche", "Dark rye"]),
+    ("not (rye or tag:sweet) and time>=60", ["50% spelt", "Quick white"]),
+    ("(category:white or category:wheat) and not quick", ["50% spelt"]),
+    ("50%", ["50% spelt"]),
+    ("name:_", []),
+])
+def test_expressions(store, expression, expected):
+    assert names(store, expression) == expected
+
+
+@pytest.mark.parametrize("expression", [
+    "", "(rye", "rye)", "time<=soon", "category<3", "color:red", "favorite:maybe",
+    "name:", "rye or", "rye and",
+])
+def test_bad_expressions(expression):
+    with pytest.raises(CollectionError):
+        compile_filter(expression)
+
+
+def test_membership_follows_saves(store):
+    collections = CollectionStore(store.conn)
+    quick = collections.save("Quick", "time<=90")
+    assert store.count(collection_id=quick.id) == 1
+
+    spelt = store.get(4)
+    spelt.total_time_min = 80
+    store.save(spelt)
+    assert collections.contains(quick.id, 4)
+    spelt.total_time_min = 100
+    store.save(spelt)
+    assert not collections.contains(quick.id, 4)
+
+    new_id = store.save(Recipe(name="Rapid", total_time_min=58))
+    assert collections.contains(quick.id, new_id)
+    assert [s.name for s in store.list_summaries(collection_id=quick.id)] == [
+        "Quick white", "Rapid"]
+
+
+def test_membership_follows_favorites_and_ratings(store):
+    collections = CollectionStore(store.conn)
+    best = collections.save("Best", "favorite rating>=4")
+    assert collections.contains(best.id, 2)
+
+    store.set_favorite(1, True)
+    assert collections.contains(best.id, 1)
+    store.set_rating(1, 2)
+    assert not collections.contains(best.id, 1)
+
+
+def test_trash_hides_members_without_dropping_them(store):
+    collections = CollectionStore(store.conn)
+    rye = collections.save("Rye", "category:rye")
+    store.delete(2)
+    assert store.count(collection_id=rye.id) == 0
+    assert collections.all()[0].count == 0
+    store.restore(2)
+    assert store.count(collection_id=rye.id) == 1
+
+
+def test_changing_the_filter_refills(store):
+    collections = CollectionStore(store.conn)
+    c = collections.save("Flour", 'ingredient:"rye flour"')
+    assert store.count(collection_id=c.id) == 1
+    c = collections.save("Flour", "ingredient:flour", c.id)
+    assert store.count(collection_id=c.id) == 4
+
+
+def test_names_are_unique(store):
+    collections = CollectionStore(store.conn)
+    collections.save("Rye", "rye")
+    with pytest.raises(CollectionError):
+        collections.save("rye", "category:rye")
+    with pytest.raises(CollectionError):
+        collections.save("  ", "rye")
+    assert [c.name for c in collections.all()] == ["Rye"]
+
+
+def test_many_collections_update_in_one_save(store):
+    collections = CollectionStore(store.conn)
+    ids = [collections.save(f"Up to {m} min", f"time<={m}").id for m in range(0, 250)]
+    spelt = store.get(4)
+    spelt.total_time_min = 30
+    store.save(spelt)
+    member_of = {cid for cid in ids if collections.contains(cid, 4)}
+    assert member_of == set(ids[30:])
@@ -0,0 +1,55 @@
+"""Parsing pasted ingredient lists, and the JSON round trip."""
+
+import pytest
+
+from makebread.models.recipe import Ingredient, Instruction, Recipe
+from makebread.utils.importer import parse_ingredient_lines, recipe_from_dict, recipe_to_dict
+from makebread.utils.units import ingredient_key
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("1 1/2 cups bread flour", ("1 1/2", "cups", "bread flour")),
+    ("500g water", ("500", "g", "water")),
+    ("1½tsp salt", ("1½", "tsp", "salt")),
+    ("2-3 tbsp. honey", ("2-3", "tbsp", "honey")),
+    ("1 fl oz of milk", ("1", "fl oz", "milk")),
+    ("2 large eggs", ("2", "large", "eggs")),
+    ("1 medium onion", ("1", "medium", "onion")),
+    ("3 cloves garlic, minced", ("3", "cloves", "garlic, minced")),
+    ("1 (0.25 oz) packet yeast", ("1", "packet", "yeast (0.25 oz)")),
+    ("1 can (14 oz) tomatoes", ("1", "can", "tomatoes (14 oz)")),
+    ("2 sticks butter", ("2", "sticks", "butter")),
+    ("3 eggs", ("3", "", "eggs")),
+    ("Salt to taste", ("", "", "Salt to taste")),
+    ("- 1 tsp sugar", ("1", "tsp", "sugar")),
+])
+def test_lines(line, expected):
+    ing, = parse_ingredient_lines(line)
+    assert (ing.amount, ing.unit, ing.name) == expected
+
+
+def test_notes_dont_change_the_matching_key():
+    ing, = parse_ingredient_lines("1 (0.25 oz) packet active dry yeast")
+    assert ingredient_key(ing.name) == "active dry yeast"
+
+
+def test_groups_and_blank_lines():
+    ingredients = parse_ingredient_lines("""
+        500 g bread flour
+
+        For the topping:
+        2 tbsp seeds
+        1 egg
+    """)
+    assert [(i.name, i.group_name, i.sort_order) for i in ingredients] == [
+        ("bread flour", "", 0), ("seeds", "For the topping", 1), ("egg", "For the topping", 2)]
+
+
+def test_round_trip():
+    recipe = Recipe(name="Rye", tags=["sour"], loaf_size="1.5lb",
+                    ingredients=[Ingredient(name="rye flour", amount="400", unit="g")],
+                    instructions=[Instruction(1, "Mix"), Instruction(2, "Bake")])
+    again = recipe_from_dict(recipe_to_dict(recipe))
+    assert (again.name, again.tags, again.loaf_size) == ("Rye", ["sour"], "1.5lb")
+    assert [(i.amount, i.unit, i.name) for i in again.ingredients] == [("400", "g", "rye flour")]
+    assert [(s.step_number, s.text) for s in again.instructions] == [(1, "Mix"), (2, "Bake")]
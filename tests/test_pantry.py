@@ -0,0 +1,92 @@
+"""The pantry index: matching, and catching up from its cache file."""
+
+import json
+
+import pytest
+
+from makebread.models.changes import ChangeLog
+from makebread.models.database import get_connection, init_db
+from makebread.models.recipe import Ingredient, Recipe, RecipeStore
+from makebread.utils.pantry import PantryIndex
+
+
+def _recipe(name: str, *ingredients: str) -> Recipe:
+    return Recipe(name=name, ingredients=[Ingredient(name=i) for i in ingredients])
+
+
+@pytest.fixture
+def store():
+    conn = get_connection(":memory:")
+    init_db(conn)
+    store = RecipeStore(conn)
+    for recipe in (
+        _recipe("White", "Bread flour", "water", "salt", "yeast"),
+        _recipe("Rye", "rye flour", "water", "salt", "caraway"),
+        _recipe("Brioche", "bread flour", "butter, softened", "eggs", "sugar", "yeast"),
+        _recipe("Flatbread", "bread flour", "water"),
+    ):
+        store.save(recipe)
+    return store
+
+
+def contents(index: PantryIndex) -> tuple:
+    return (index._keys, index._names,
+            {key: list(ids) for key, ids in index._postings.items()})
+
+
+def test_makeable_first_then_missing_one(store):
+    index = PantryIndex.build(store)
+    matches = index.match(["flour", "water", "salt", "yeast"], max_missing=1)
+    assert [(m.name, m.missing) for m in matches] == [
+        ("White", ()), ("Flatbread", ()), ("Rye", ("caraway",))]
+    assert [m.have for m in matches] == [4, 2, 3]
+    assert index.match(["bread flour", "water"]) == [matches[1]]
+
+
+def test_an_item_covers_longer_names(store):
+    index = PantryIndex.build(store)
+    assert index.covered_keys(["flour"]) == {"bread flour", "rye flour"}
+    assert index.covered_keys(["rye flour"]) == {"rye flour"}
+    assert index.covered_keys(["Butter"]) == {"butter"}
+
+
+def test_replay_equals_a_rebuild(store, tmp_path):
+    path = tmp_path / "pantry.json"
+    PantryIndex.load_or_build(store, path)
+
+    brioche = store.get(3)
+    brioche.ingredients.append(Ingredient(name="milk"))
+    brioche.name = "Milk brioche"
+    store.save(brioche)
+    store.delete(1)
+    store.save(_recipe("Spelt", "spelt flour", "water", "salt"))
+    store.delete(4)
+    store.restore(4)
+    store.conn.execute("DELETE FROM recipes WHERE id=2")
+    store.conn.commit()
+
+    index = PantryIndex.load_or_build(store, path)
+    assert contents(index) == contents(PantryIndex.build(store))
+    assert index.seq == ChangeLog(store.conn).latest_seq()
+
+
+def test_watermark_is_saved_with_the_cache(store, tmp_path):
+    path = tmp_path / "pantry.json"
+    index = PantryIndex.load_or_build(store, path)
+    assert json.loads(path.read_text())["seq"] == index.seq
+
+    store.set_rating(1, 5)
+    again = PantryIndex.load_or_build(store, path)
+    assert again.seq > index.seq
+    assert json.loads(path.read_text())["seq"] == again.seq
+    # Nothing new since: the cache is used as it is
+    assert PantryIndex.load_or_build(store, path).catch_up(store) == 0
+
+
+@pytest.mark.parametrize("text", ["not json", '{"version": 0, "seq": 1, "recipes": []}'])
+def test_a_bad_cache_is_rebuilt(store, tmp_path, text):
+    path = tmp_path / "pantry.json"
+    path.write_text(text)
+    index = PantryIndex.load_or_build(store, path)
+    assert contents(index) == contents(PantryIndex.build(store))
+    assert json.loads(path.read_text())["seq"] == index.seq
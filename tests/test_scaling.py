@@ -0,0 +1,64 @@
+"""Scaling recipes by loaf size or flour weight."""
+
+import pytest
+
+from makebread.models.recipe import Ingredient, Recipe
+from makebread.utils import scaling
+from makebread.utils.scaling import bakers_percentages, loaf_pounds, scale_recipe
+from makebread.utils.units import SYSTEM_METRIC, SYSTEM_US
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    scaling.clear_cache()
+    yield
+    scaling.clear_cache()
+
+
+def _white(loaf_size: str = "1lb") -> Recipe:
+    return Recipe(name="White", loaf_size=loaf_size, ingredients=[
+        Ingredient(amount="500", unit="g", name="bread flour"),
+        Ingredient(amount="300", unit="g", name="water"),
+        Ingredient(amount="1-2", unit="tsp", name="salt"),
+        Ingredient(amount="a pinch", unit="", name="sugar"),
+    ])
+
+
+@pytest.mark.parametrize("label, pounds", [
+    ("1.5lb", 1.5), ("2", 2), ("900g", 900 / 453.592), ("1 kg", 1000 / 453.592),
+    ("large", None), ("", None),
+])
+def test_loaf_pounds(label, pounds):
+    assert loaf_pounds(label) == (pytest.approx(pounds) if pounds else None)
+
+
+def test_bakers_percentages():
+    flour, percents, hydration = bakers_percentages(_white())
+    assert flour == 500
+    assert percents[:2] == [100, 60]
+    assert hydration == pytest.approx(60)
+
+
+def test_scale_by_size():
+    scaled = scale_recipe(_white(), "2lb", system=SYSTEM_METRIC)
+    assert scaled.factor == 2 and scaled.loaf_size == "2lb"
+    assert [(i.amount, i.unit) for i in scaled.ingredients] == [
+        ("1", "kg"), ("600", "g"), ("2–4", "tsp"), ("a pinch", "")]
+    assert scaled.flour_grams == 1000
+
+
+def test_scale_by_flour():
+    scaled = scale_recipe(_white(), flour_grams=250, system=SYSTEM_US)
+    assert scaled.factor == 0.5 and scaled.loaf_size == "0.5lb"
+    assert scaled.ingredients[0].amount == "8.82" and scaled.ingredients[0].unit == "oz"
+
+
+@pytest.mark.parametrize("target, own", [("huge", "1lb"), ("0lb", "1lb"), ("2lb", "large")])
+def test_unreadable_sizes_raise(target, own):
+    with pytest.raises(ValueError):
+        scale_recipe(_white(own), target)
+
+
+def test_no_target_keeps_an_unreadable_size():
+    scaled = scale_recipe(_white("large"), system=SYSTEM_METRIC)
+    assert scaled.factor == 1 and scaled.loaf_size == "large"
@@ -0,0 +1,81 @@
+"""The read-only HTTP API: conditional requests and request bodies."""
+
+import asyncio
+import json
+
+import pytest
+
+from makebread.models.database import get_connection, init_db
+from makebread.models.recipe import Recipe, RecipeStore
+from makebread.server import RecipeServer
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "recipes.db"
+    conn = get_connection(path)
+    init_db(conn)
+    RecipeStore(conn).save(Recipe(name="Rye"))
+    conn.close()
+    return path
+
+
+def exchange(db_path, *requests: bytes) -> list[tuple[int, dict, bytes]]:
+    """Send raw requests on one connection; (status, headers, body) per response."""
+    async def run():
+        server = RecipeServer(db_path, port=0, connections=2)
+        await server.start()
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        responses = []
+        try:
+            for request in requests:
+                writer.write(request)
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+                responses.append((int(lines[0].split()[1]), headers, body))
+                if headers.get("connection") == "close":
+                    break
+        finally:
+            writer.close()
+            await server.close()
+        return responses
+    return asyncio.run(run())
+
+
+def test_etags_answer_304(db_path):
+    (status, headers, body), = exchange(db_path, b"GET /recipes/1 HTTP/1.1\r\n\r\n")
+    assert status == 200 and json.loads(body)["name"] == "Rye"
+    etag = headers["etag"]
+    first, second = exchange(
+        db_path,
+        f"GET /recipes/1 HTTP/1.1\r\nIf-None-Match: {etag}\r\n\r\n".encode(),
+        b"GET /recipes/1 HTTP/1.1\r\n\r\n")
+    assert first[0] == 304
+    assert second[0] == 200 and second[1]["etag"] == etag
+
+
+@pytest.mark.parametrize("header, status", [
+    ("Content-Length: 1000000000", 413),
+    ("Content-Length: 5", 413),
+    ("Transfer-Encoding: chunked", 413),
+    ("Content-Length: -5", 400),
+    ("Content-Length: lots", 400),
+])
+def test_request_bodies_are_refused(db_path, header, status):
+    responses = exchange(db_path, f"GET /facets HTTP/1.1\r\n{header}\r\n\r\n".encode(),
+                         b"GET /facets HTTP/1.1\r\n\r\n")
+    assert [r[0] for r in responses] == [status]
+    assert responses[0][1]["connection"] == "close"
+
+
+def test_empty_body_keeps_the_connection(db_path):
+    responses = exchange(db_path, b"GET /facets HTTP/1.1\r\nContent-Length: 0\r\n\r\n",
+                         b"GET /facets HTTP/1.1\r\n\r\n")
+    assert [r[0] for r in responses] == [200, 200]
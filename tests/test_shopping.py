@@ -0,0 +1,63 @@
+"""Shopping lists: which amounts are summed together, and from which recipes."""
+
+import pytest
+
+from makebread.models.database import get_connection, init_db
+from makebread.models.recipe import Ingredient, Recipe, RecipeStore
+from makebread.utils.shopping import build_shopping_list
+from makebread.utils.units import SYSTEM_METRIC, parse_amount
+
+
+@pytest.fixture
+def store():
+    conn = get_connection(":memory:")
+    init_db(conn)
+    return RecipeStore(conn)
+
+
+def _save(store: RecipeStore, *ingredients: tuple[str, str, str]) -> int:
+    return store.save(Recipe(name="Loaf", ingredients=[
+        Ingredient(amount=amount, unit=unit, name=name) for amount, unit, name in ingredients]))
+
+
+def shopping(store: RecipeStore, multipliers: dict[int, float]) -> dict[str, tuple[str, str]]:
+    return {item.name: (item.amount, item.unit)
+            for item in build_shopping_list(store, multipliers, SYSTEM_METRIC)}
+
+
+def test_volume_with_a_density_joins_the_weight(store):
+    a = _save(store, ("500", "g", "bread flour"), ("1", "cup", "vanilla extract"))
+    b = _save(store, ("1", "cup", "Bread flour"), ("10", "g", "vanilla extract"))
+    items = build_shopping_list(store, {a: 1, b: 1}, SYSTEM_METRIC)
+    flour = [i for i in items if i.name.lower() == "bread flour"]
+    assert len(flour) == 1
+    assert flour[0].unit == "g" and parse_amount(flour[0].amount) == pytest.approx(628, abs=1)
+    assert flour[0].recipe_ids == [a, b]
+    # No density for vanilla: its volume and weight stay apart
+    vanilla = sorted(i.unit for i in items if i.name == "vanilla extract")
+    assert len(vanilla) == 2 and "g" in vanilla
+
+
+def test_eggs_are_counted_whatever_their_size(store):
+    a = _save(store, ("1", "large", "egg"), ("2", "", "eggs"))
+    b = _save(store, ("1", "small", "egg"), ("3", "cloves", "garlic"))
+    c = _save(store, ("1", "clove", "garlic"))
+    assert shopping(store, {a: 2, b: 1, c: 1}) == {
+        "egg": ("7", ""),
+        "garlic": ("4", "cloves"),
+    }
+
+
+def test_unparsed_amounts_stay_separate(store):
+    a = _save(store, ("a handful", "", "raisins"), ("", "", "salt"))
+    b = _save(store, ("100", "g", "raisins"))
+    items = build_shopping_list(store, {a: 1, b: 1}, SYSTEM_METRIC)
+    assert sorted((i.name, i.amount, i.unit) for i in items) == [
+        ("raisins", "", ""), ("raisins", "100", "g"), ("salt", "", "")]
+
+
+def test_trashed_recipes_are_left_out(store):
+    a = _save(store, ("300", "g", "rye flour"))
+    b = _save(store, ("200", "g", "rye flour"))
+    store.delete(b)
+    assert shopping(store, {a: 1, b: 1}) == {"rye flour": ("300", "g")}
@@ -0,0 +1,106 @@
+"""Similar recipes: incremental refreshes driven by the change log."""
+
+import pytest
+
+from makebread.models.database import get_connection, init_db
+from makebread.models.recipe import Ingredient, Recipe, RecipeStore
+from makebread.utils import similarity
+from makebread.utils.similarity import SimilarRecipes
+
+
+def _loaf(name: str, *ingredients: tuple[str, str]) -> Recipe:
+    return Recipe(name=name, ingredients=[Ingredient(amount=amount, unit="g", name=item)
+                                          for item, amount in ingredients])
+
+
+@pytest.fixture
+def store():
+    conn = get_connection(":memory:")
+    init_db(conn)
+    store = RecipeStore(conn)
+    for recipe in (
+        _loaf("White", ("bread flour", "500"), ("water", "320"), ("salt", "10")),
+        _loaf("Milk loaf", ("bread flour", "500"), ("milk", "300"), ("salt", "9")),
+        _loaf("Rye", ("rye flour", "400"), ("water", "300"), ("caraway", "5")),
+        _loaf("Light rye", ("rye flour", "200"), ("bread flour", "300"), ("caraway", "4")),
+        _loaf("Brioche", ("bread flour", "400"), ("butter", "200"), ("egg", "150")),
+    ):
+        store.save(recipe)
+    return store
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """The recipe ids every ingredient_profiles call loaded; None for all."""
+    calls = []
+    real = similarity.ingredient_profiles
+
+    def counted(conn, recipe_ids=None):
+        calls.append(None if recipe_ids is None else set(recipe_ids))
+        return real(conn, recipe_ids)
+
+    monkeypatch.setattr(similarity, "ingredient_profiles", counted)
+    return calls
+
+
+def stored_lists(store: RecipeStore) -> dict[int, list[int]]:
+    lists: dict[int, list[int]] = {}
+    for rid, other in store.conn.execute(
+            "SELECT recipe_id, similar_id FROM similar_recipes ORDER BY recipe_id, rank"):
+        lists.setdefault(rid, []).append(other)
+    return lists
+
+
+def test_rating_and_favorite_recompute_nothing(store, loads):
+    similar = SimilarRecipes(store.conn)
+    similar.refresh()
+    loads.clear()
+
+    store.set_rating(1, 5)
+    store.set_favorite(2, True)
+    assert similar.refresh() == 0
+    assert loads == []
+
+
+def test_unchanged_save_compares_only_that_recipe(store, loads):
+    similar = SimilarRecipes(store.conn)
+    similar.refresh()
+    loads.clear()
+
+    recipe = store.get(3)
+    recipe.description = "Dark and dense"
+    store.save(recipe)
+    assert similar.refresh() == 0
+    assert loads == [{3}]
+
+
+def test_incremental_refresh_matches_a_rebuild(store):
+    similar = SimilarRecipes(store.conn)
+    similar.refresh()
+
+    recipe = store.get(2)
+    recipe.ingredients = [Ingredient(amount="400", unit="g", name="rye flour"),
+                          Ingredient(amount="5", unit="g", name="caraway")]
+    store.save(recipe)
+    store.save(_loaf("Caraway white", ("bread flour", "500"), ("caraway", "6")))
+    store.delete(1)
+    assert similar.refresh() > 0
+    incremental = stored_lists(store)
+
+    similar.refresh(full=True)
+    store.conn.execute("DELETE FROM similar_recipes")
+    store.conn.execute("DELETE FROM recipe_signatures")
+    similar.refresh(full=True)
+    assert incremental == stored_lists(store)
+    assert 1 not in incremental
+
+
+def test_restore_brings_a_recipe_back(store):
+    similar = SimilarRecipes(store.conn)
+    store.delete(3)
+    similar.refresh()
+    assert 3 not in stored_lists(store)
+
+    store.restore(3)
+    assert similar.refresh() > 0
+    assert 4 in stored_lists(store)[3]
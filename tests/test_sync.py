@@ -0,0 +1,223 @@
+"""Sync between two in-memory libraries: conflict rules, watermarks, tombstones."""
+
+import io
+import json
+
+import pytest
+
+from makebread.models.database import get_connection, init_db
+from makebread.models.recipe import Ingredient, Recipe, RecipeStore
+from makebread.models.sync import SyncEngine, library_id
+
+
+def _library() -> SyncEngine:
+    conn = get_connection(":memory:")
+    init_db(conn)
+    return SyncEngine(RecipeStore(conn))
+
+
+@pytest.fixture
+def a():
+    return _library()
+
+
+@pytest.fixture
+def b():
+    return _library()
+
+
+def send(src: SyncEngine, dst: SyncEngine):
+    """Write src's changes for dst and apply them; returns dst's stats."""
+    out = io.StringIO()
+    src.write_batch(out, peer_id=library_id(dst.conn))
+    return dst.read_batch(out.getvalue().splitlines())[1]
+
+
+def by_uuid(engine: SyncEngine, uuid: str):
+    return engine.conn.execute("SELECT * FROM recipes WHERE uuid=?", (uuid,)).fetchone()
+
+
+def uuid_of(engine: SyncEngine, recipe_id: int) -> str:
+    return engine.conn.execute("SELECT uuid FROM recipes WHERE id=?", (recipe_id,)).fetchone()[0]
+
+
+def shared_recipe(a: SyncEngine, b: SyncEngine, name: str = "Rye") -> str:
+    rid = a.store.save(Recipe(name=name, ingredients=[
+        Ingredient(amount="500", unit="g", name="rye flour")]))
+    send(a, b)
+    return uuid_of(a, rid)
+
+
+def set_description(engine: SyncEngine, uuid: str, description: str) -> None:
+    recipe = engine.store.get(by_uuid(engine, uuid)["id"])
+    recipe.description = description
+    engine.store.save(recipe)
+
+
+def test_new_recipe_arrives_with_the_same_identity(a, b):
+    uuid = shared_recipe(a, b)
+    row = by_uuid(b, uuid)
+    assert row is not None
+    assert row["version"] == by_uuid(a, uuid)["version"]
+    assert b.store.get(row["id"]).ingredients[0].name == "rye flour"
+
+
+def test_higher_version_wins(a, b):
+    uuid = shared_recipe(a, b)
+    set_description(a, uuid, "once")
+    set_description(a, uuid, "twice")
+    set_description(b, uuid, "here")
+
+    assert send(b, a).kept == 1
+    assert by_uuid(a, uuid)["description"] == "twice"
+    assert send(a, b).applied == 1
+    assert by_uuid(b, uuid)["description"] == "twice"
+
+
+def test_equal_versions_converge(a, b):
+    uuid = shared_recipe(a, b)
+    set_description(a, uuid, "from a")
+    set_description(b, uuid, "from b")
+    for engine in (a, b):
+        engine.conn.execute("UPDATE recipes SET updated_at='2026-01-01 00:00:00'")
+        engine.conn.commit()
+
+    send(a, b)
+    send(b, a)
+    assert by_uuid(a, uuid)["description"] == by_uuid(b, uuid)["description"]
+
+
+def test_later_update_wins_at_equal_versions(a, b):
+    uuid = shared_recipe(a, b)
+    set_description(a, uuid, "earlier")
+    set_description(b, uuid, "later")
+    a.conn.execute("UPDATE recipes SET updated_at='2026-01-01 00:00:00'")
+    b.conn.execute("UPDATE recipes SET updated_at='2026-01-02 00:00:00'")
+    a.conn.commit()
+    b.conn.commit()
+
+    assert send(a, b).kept == 1
+    assert send(b, a).applied == 1
+    assert by_uuid(a, uuid)["description"] == "later"
+
+
+def test_conflict_at_equal_version_changes_the_revision(a, b):
+    uuid = shared_recipe(a, b)
+    set_description(a, uuid, "earlier")
+    set_description(b, uuid, "later")
+    a.conn.execute("UPDATE recipes SET updated_at='2026-01-01 00:00:00'")
+    a.conn.commit()
+    local = a.store.get(by_uuid(a, uuid)["id"])
+
+    send(b, a)
+    synced = a.store.get(local.id)
+    # Same version, different content: caches must not mistake one for the other
+    assert synced.version == local.version
+    assert synced.description == "later"
+    assert synced.revision > local.revision
+    assert a.store.get_summary(local.id).revision == synced.revision
+
+
+def test_watermarks_only_resend_new_changes(a, b):
+    shared_recipe(a, b)
+    peer = library_id(b.conn)
+    assert a.peer(peer)[1] > 0
+    assert b.peer(library_id(a.conn))[0] == a.peer(peer)[1]
+
+    assert send(a, b).received == 0
+    a.store.save(Recipe(name="Spelt"))
+    assert send(a, b).received == 1
+
+
+def test_interrupted_batch_is_resent(a, b):
+    a.store.save(Recipe(name="Spelt"))
+    out = io.StringIO()
+    a.write_batch(out)
+    lines = out.getvalue().splitlines()
+
+    stats = b.read_batch(lines[:-1])[1]
+    assert stats.applied == 1
+    assert b.peer(library_id(a.conn))[0] == 0
+    b.read_batch(lines)
+    assert b.peer(library_id(a.conn))[0] == json.loads(lines[0])["seq"]
+
+
+def test_purge_leaves_a_tombstone_that_propagates(a, b):
+    uuid = shared_recipe(a, b)
+    a.conn.execute("DELETE FROM recipes WHERE uuid=?", (uuid,))
+    a.conn.commit()
+
+    assert send(a, b).purged == 1
+    assert by_uuid(b, uuid) is None
+    assert b.conn.execute("SELECT 1 FROM tombstones WHERE uuid=?", (uuid,)).fetchone()
+
+
+def test_tombstone_stops_an_old_copy_coming_back(a, b):
+    c = _library()
+    uuid = shared_recipe(a, b)
+    send(a, c)
+    a.conn.execute("DELETE FROM recipes WHERE uuid=?", (uuid,))
+    a.conn.commit()
+    send(a, b)
+
+    # c still has the recipe at the version that was purged
+    assert send(c, b).kept == 1
+    assert by_uuid(b, uuid) is None
+
+
+def test_purge_of_an_unknown_recipe_is_remembered(a, b):
+    c = _library()
+    rid = c.store.save(Recipe(name="Einkorn"))
+    uuid = uuid_of(c, rid)
+    send(c, a)
+    c.conn.execute("DELETE FROM recipes WHERE id=?", (rid,))
+    c.conn.commit()
+
+    send(c, b)
+    assert b.conn.execute("SELECT version FROM tombstones WHERE uuid=?", (uuid,)).fetchone()
+    # ...so the copy a still has can't bring it back to b
+    assert send(a, b).kept == 1
+    assert by_uuid(b, uuid) is None
+
+
+def test_edit_after_a_peer_purged_wins(a, b):
+    uuid = shared_recipe(a, b)
+    set_description(b, uuid, "still baking this")
+    a.conn.execute("DELETE FROM recipes WHERE uuid=?", (uuid,))
+    a.conn.commit()
+
+    assert send(a, b).kept == 1
+    assert by_uuid(b, uuid)["description"] == "still baking this"
+
+
+class _FailingConnection:
+    """A connection that fails when sync takes over a record's identity."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, sql, *args):
+        if "SET uuid=" in sql:
+            raise RuntimeError("crashed")
+        return self._conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def test_failed_apply_leaves_nothing_to_duplicate(a, b):
+    a.store.save(Recipe(name="Spelt"))
+    out = io.StringIO()
+    a.write_batch(out)
+    lines = out.getvalue().splitlines()
+
+    real = b.conn
+    b.conn = _FailingConnection(real)
+    with pytest.raises(RuntimeError):
+        b.read_batch(lines)
+    b.conn = real
+    assert real.execute("SELECT COUNT(*) FROM recipes").fetchone()[0] == 0
+
+    b.read_batch(lines)
+    b.read_batch(lines)
+    assert real.execute("SELECT COUNT(*) FROM recipes").fetchone()[0] == 1
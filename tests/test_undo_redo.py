@@ -0,0 +1,116 @@
+"""Undo/redo of recipe commands kept in the command log."""
+
+import pytest
+
+from makebread.models import command_log
+from makebread.models.command_log import CONTENT, FAVORITE, RATING, CommandLog
+from makebread.models.database import get_connection, init_db
+from makebread.models.recipe import Ingredient, Recipe, RecipeStore
+from makebread.ui import undo_redo
+from makebread.ui.undo_redo import UndoRedoManager
+
+
+@pytest.fixture
+def store():
+    conn = get_connection(":memory:")
+    init_db(conn)
+    store = RecipeStore(conn)
+    store.save(Recipe(name="Rye", ingredients=[Ingredient(amount="500", unit="g",
+                                                          name="rye flour")]))
+    return store
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A monotonic clock the test moves by hand."""
+    now = [1000.0]
+    monkeypatch.setattr(undo_redo.time, "monotonic", lambda: now[0])
+    return now
+
+
+def rate(store: RecipeStore, history: UndoRedoManager, rating: int) -> None:
+    old = store.get_summary(1).rating
+    store.set_rating(1, rating)
+    history.record(RATING, 1, "Rate", {"rating": old}, {"rating": rating})
+
+
+def rating(store: RecipeStore) -> int:
+    return store.get(1, include_deleted=True).rating
+
+
+def test_quick_edits_coalesce(store, clock):
+    history = UndoRedoManager(store=store)
+    rate(store, history, 2)
+    clock[0] += 1
+    rate(store, history, 4)
+    clock[0] += undo_redo.COALESCE_SECONDS + 1
+    rate(store, history, 5)
+
+    assert len(CommandLog(store.conn).load()) == 2
+    assert history.undo() and rating(store) == 4
+    assert history.undo() and rating(store) == 0
+    assert not history.can_undo()
+
+
+def test_an_undone_step_never_coalesces(store, clock):
+    history = UndoRedoManager(store=store)
+    rate(store, history, 2)
+    history.undo()
+    rate(store, history, 3)
+    assert history.undo() and rating(store) == 0
+
+
+def test_byte_cap_drops_the_oldest(store, clock):
+    recipe = store.get(1)
+    one = len(str(command_log.content_payload(recipe))) * 2
+    history = UndoRedoManager(store=store, max_bytes=int(one * 2.5))
+    for n in range(4):
+        clock[0] += 10
+        before = command_log.content_payload(store.get(1))
+        recipe = store.get(1)
+        recipe.description = f"Edit {n}"
+        store.save(recipe)
+        history.record(CONTENT, 1, "Edit", before, command_log.content_payload(recipe))
+
+    commands = CommandLog(store.conn).load()
+    assert len(commands) == 2
+    assert sum(c.size for c in commands) <= one * 2.5
+    while history.undo():
+        pass
+    assert store.get(1).description == "Edit 1"
+
+
+def test_redo_order_survives_a_reload(store, clock):
+    history = UndoRedoManager(store=store)
+    for value in (1, 2, 3):
+        clock[0] += 10
+        rate(store, history, value)
+    history.undo()
+    history.undo()
+    assert rating(store) == 1
+
+    reloaded = UndoRedoManager(store=store)
+    assert reloaded.redo() and rating(store) == 2
+    assert reloaded.redo() and rating(store) == 3
+    assert not reloaded.can_redo()
+    assert reloaded.undo() and rating(store) == 2
+
+
+@pytest.mark.parametrize("kind, undo, redo, field", [
+    (FAVORITE, {"favorite": False}, {"favorite": True}, "favorite"),
+    (RATING, {"rating": 0}, {"rating": 5}, "rating"),
+])
+def test_undo_leaves_a_trashed_recipe_alone(store, kind, undo, redo, field):
+    applied = []
+    history = UndoRedoManager(store=store, on_applied=applied.append)
+    command_log.apply_payload(store, kind, 1, redo)
+    history.record(kind, 1, "Change", undo, redo)
+    store.delete(1)
+    version = store.conn.execute("SELECT version FROM recipes WHERE id=1").fetchone()[0]
+
+    assert not history.undo()
+    recipe = store.get(1, include_deleted=True)
+    assert getattr(recipe, field) == redo[field]
+    assert recipe.version == version
+    assert applied == []
+    assert CommandLog(store.conn).load() == []
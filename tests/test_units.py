@@ -0,0 +1,82 @@
+"""Amount parsing, unit conversion and display formatting."""
+
+import pytest
+
+from makebread.utils.amounts import parse_range, parse_value
+from makebread.utils.units import (
+    SYSTEM_METRIC, SYSTEM_US, convert_range, convert_unit, format_amount,
+    format_range, normalize_quantity, QTY_NO_BASIS, QTY_OK, QTY_UNPARSED,
+)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2", (2, 2)),
+    ("1 1/2", (1.5, 1.5)),
+    ("1-1/2", (1.5, 1.5)),
+    ("1½", (1.5, 1.5)),
+    ("2/3", (2 / 3, 2 / 3)),
+    ("1,5", (1.5, 1.5)),
+    ("1,000", (1000, 1000)),
+    (".5", (0.5, 0.5)),
+    ("1-2", (1, 2)),
+    ("2 – 3", (2, 3)),
+    ("1 to 2", (1, 2)),
+    ("3-1", (1, 3)),
+])
+def test_parse_range(text, expected):
+    assert parse_range(text) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("text", [
+    "", "-1", "- 1", "-1-2", "to 2", "1-", "+1", "1e3", "nan", "inf", "1/0", "a pinch",
+])
+def test_unparseable_amounts(text):
+    assert parse_range(text) is None
+    assert parse_value(text) is None
+
+
+def test_parse_value_takes_the_midpoint():
+    assert parse_value("1-2") == 1.5
+
+
+@pytest.mark.parametrize("value, expected", [
+    (0, ""), (3, "3"), (0.5, "1/2"), (2.375, "2 3/8"), (1 / 3, "1/3"), (4.7, "4.7"),
+])
+def test_format_amount(value, expected):
+    assert format_amount(value) == expected
+
+
+@pytest.mark.parametrize("low, high, expected", [
+    (1.5, 2, "1 1/2–2"),
+    (0, 0.5, "0–1/2"),
+    (2.375, 4.7, "2.4–4.7"),
+    (0.3, 0.5, "0.3–0.5"),
+])
+def test_range_ends_share_a_rule(low, high, expected):
+    assert format_range(low, high) == expected
+
+
+def test_convert_range_uses_the_upper_unit():
+    assert convert_range(1, 2, "cups", SYSTEM_METRIC) == ("2.4–4.7", "dl")
+    assert convert_range(2, 2, "cups", SYSTEM_METRIC) == ("4.7", "dl")
+
+
+@pytest.mark.parametrize("amount, unit, system, expected", [
+    (500, "g", SYSTEM_US, (500 / 453.592, "lb")),
+    (100, "g", SYSTEM_US, (100 / 28.3495, "oz")),
+    (1500, "g", SYSTEM_METRIC, (1.5, "kg")),
+    (1, "cup", SYSTEM_METRIC, (2.36588, "dl")),
+    (2, "tsp", SYSTEM_METRIC, (2, "tsp")),
+    (3, "", SYSTEM_METRIC, (3, "")),
+])
+def test_convert_unit(amount, unit, system, expected):
+    value, new_unit = convert_unit(amount, unit, system)
+    assert (value, new_unit) == (pytest.approx(expected[0]), expected[1])
+
+
+def test_normalize_quantity():
+    assert normalize_quantity("1", "kg") == (1000, None, QTY_OK)
+    grams, ml, _status = normalize_quantity("1", "cup", "water")
+    assert ml == pytest.approx(236.588) and grams == pytest.approx(236.588)
+    assert normalize_quantity("-1", "g") == (None, None, QTY_UNPARSED)
+    assert normalize_quantity("2", "sprigs", "rosemary") == (None, None, QTY_NO_BASIS)